@@ -0,0 +1,193 @@
+"""Fan one subagent out over a JSONL batch of tasks.
+
+Each input line is a JSON object with a ``prompt`` and optionally a
+``context`` (or a ``context_file`` streamed into the prompt), an ``id`` and
+the ``files`` the task reads. Results are appended to an output JSONL file in
+completion order, each tagged with the ``index`` of its input line, so a run
+that stops part way can be resumed by skipping indices already written.
+"""
+
+import asyncio
+import json
+from pathlib import Path
+from typing import IO, Any, Callable, Dict, Iterable, Iterator, NamedTuple, Optional, Set, Tuple
+
+from config import SubagentsConfig, get_config
+from invocation import InvocationResult, PreparedSubagent
+from resultcache import ResultCache, result_cache_key
+from runlog import new_run_log
+
+class MapTask(NamedTuple):
+    """One input line of a batch."""
+    
+    # Position among the non-empty input lines, starting at 0
+    index: int
+    prompt: str
+    context: Optional[str] = None
+    id: Any = None
+    # Why the input line cannot be run, if it is invalid
+    error: Optional[str] = None
+    # Files the task reads, part of the result cache key
+    files: Tuple[str, ...] = ()
+    # File streamed into the prompt as context instead of ``context``
+    context_file: Optional[str] = None
+
+def read_tasks(input_path: Path) -> Iterator[MapTask]:
+    """Lazily read tasks from a JSONL file; invalid lines become tasks with an error.
+    
+    Raises:
+        OSError: If the input file cannot be read
+    """
+    with open(input_path, encoding='utf-8') as input_file:
+        index = 0
+        for line in input_file:
+            if not line.strip():
+                continue
+            try:
+                data = json.loads(line)
+            except ValueError as e:
+                yield MapTask(index, '', error=f"Invalid JSON: {e}")
+            else:
+                if not isinstance(data, dict) or not isinstance(data.get('prompt'), str) or not data['prompt']:
+                    yield MapTask(index, '', error="Missing 'prompt' field")
+                elif not isinstance(data.get('files', []), list):
+                    yield MapTask(index, '', error="'files' must be a list of paths")
+                elif not isinstance(data.get('context_file', ''), str):
+                    yield MapTask(index, '', error="'context_file' must be a path")
+                else:
+                    context = data.get('context')
+                    if context is not None and not isinstance(context, str):
+                        context = json.dumps(context)
+                    files = tuple(str(path) for path in data.get('files', []))
+                    yield MapTask(index, data['prompt'], context, data.get('id'), files=files,
+                                  context_file=data.get('context_file'))
+            index += 1
+
+def completed_indices(output_path: Path) -> Set[int]:
+    """Indices of the results already present in an output file (empty if it does not exist)."""
+    indices: Set[int] = set()
+    try:
+        with open(output_path, encoding='utf-8') as output_file:
+            for line in output_file:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # A line cut short by an interrupted run
+                    continue
+                if isinstance(record, dict) and isinstance(record.get('index'), int):
+                    indices.add(record['index'])
+    except FileNotFoundError:
+        pass
+    return indices
+
+class ResultWriter:
+    """Write result records to a JSONL file, one flushed line per result."""
+    
+    def __init__(self, output_path: Path, append: bool = True):
+        self.output_path = Path(output_path)
+        self.output_path.parent.mkdir(parents=True, exist_ok=True)
+        self._file: IO[str] = open(self.output_path, 'a' if append else 'w', encoding='utf-8')
+        if append and self._file.tell() and not self._ends_with_newline():
+            # Terminate a record cut short by an interrupted run
+            self._file.write('\n')
+    
+    def __enter__(self) -> 'ResultWriter':
+        return self
+    
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+    
+    def _ends_with_newline(self) -> bool:
+        with open(self.output_path, 'rb') as output_file:
+            output_file.seek(-1, 2)
+            return output_file.read(1) == b'\n'
+    
+    def write(self, record: Dict[str, Any]) -> None:
+        self._file.write(json.dumps(record, ensure_ascii=False) + '\n')
+        self._file.flush()
+    
+    def close(self) -> None:
+        self._file.close()
+
+def result_record(task: MapTask, result: Optional[InvocationResult] = None,
+                  error: Optional[str] = None) -> Dict[str, Any]:
+    """Build the output record of a task from its invocation result or error."""
+    record: Dict[str, Any] = {'index': task.index}
+    if task.id is not None:
+        record['id'] = task.id
+    if result is None:
+        record.update(success=False, error=error or task.error)
+        return record
+    
+    record.update(
+        success=result.success,
+        returncode=result.returncode,
+        duration=round(result.duration, 3),
+        first_output=round(result.first_output, 3) if result.first_output is not None else None,
+        output=result.stdout,
+        stderr=result.stderr,
+        log=str(result.log_path) if result.log_path is not None else None,
+        cached=result.cached,
+        timed_out=result.timed_out
+    )
+    return record
+
+async def run_map(agent: PreparedSubagent, tasks: Iterable[MapTask], subagents_dir: Path,
+                  on_result: Callable[[Dict[str, Any]], None], concurrency: int = 4,
+                  skip: Optional[Set[int]] = None, config: Optional[SubagentsConfig] = None,
+                  cache: Optional[ResultCache] = None) -> Dict[str, int]:
+    """Run a prepared subagent over tasks with at most ``concurrency`` backends at a time.
+    
+    Tasks are pulled from ``tasks`` as workers free up, so large inputs are
+    never loaded at once. ``on_result`` is called with each record as soon as
+    its task finishes.
+    
+    Args:
+        agent: Subagent prepared once for the whole batch
+        tasks: Tasks to run, usually from :func:`read_tasks`
+        subagents_dir: Subagents directory whose state directory holds the run logs
+        on_result: Called with each result record in completion order
+        concurrency: Maximum number of backends running at the same time
+        skip: Indices to skip, e.g. results already in the output file
+        config: Configuration to use instead of the process configuration
+        cache: Result cache to reuse identical invocations from
+        
+    Returns:
+        Counts of 'succeeded', 'failed' and 'skipped' tasks
+    """
+    config = config or get_config()
+    skip = skip or set()
+    env = config.subprocess_env()
+    counts = {'succeeded': 0, 'failed': 0, 'skipped': 0}
+    pending = iter(tasks)
+    
+    async def run_task(task: MapTask) -> Dict[str, Any]:
+        if task.error:
+            return result_record(task)
+        try:
+            context_file = Path(task.context_file) if task.context_file else None
+            command = agent.command(task.prompt, task.context, context_file)
+        except (OSError, ValueError) as e:
+            return result_record(task, error=str(e))
+        try:
+            key = result_cache_key(agent.subagent, command.cache_parts(), task.files) if cache is not None else None
+            log = new_run_log(subagents_dir, f"{agent.name}-{task.index}", config)
+            result = await command.run(env=env, log=log, cache=cache, cache_key=key)
+        except OSError as e:
+            return result_record(task, error=str(e))
+        finally:
+            command.cleanup()
+        return result_record(task, result)
+    
+    async def worker() -> None:
+        # Workers share one iterator; asyncio never switches tasks inside next()
+        for task in pending:
+            if task.index in skip:
+                counts['skipped'] += 1
+                continue
+            record = await run_task(task)
+            counts['succeeded' if record['success'] else 'failed'] += 1
+            on_result(record)
+    
+    await asyncio.gather(*(worker() for _ in range(max(concurrency, 1))))
+    return counts
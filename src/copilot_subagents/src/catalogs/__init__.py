@@ -0,0 +1 @@
+"""Packaged tool catalogs, one JSON file per supported AI tool."""
@@ -0,0 +1,150 @@
+"""Append-only checkpoints of plan execution.
+
+Every time a plan step finishes, one JSON line is appended to
+``<plan>.checkpoint.jsonl`` next to the plan file, recording the step's outcome
+and a digest of its inputs: the step's subagent, prompt and context, the
+subagent definition, and the digests of the steps it depends on. When the plan
+is run again, a step whose latest checkpoint is COMPLETED with the same digest
+is not executed again, even if the plan file was regenerated. A step whose
+inputs changed runs again, and so do the steps that depend on it.
+"""
+
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+from typing import IO, Any, Callable, Dict, List, Optional
+
+from plan import COMPLETED, PENDING, Plan, PlanStep
+
+CHECKPOINT_SUFFIX = '.checkpoint.jsonl'
+
+def get_checkpoint_path(plan_file: Path) -> Path:
+    """Checkpoint file of a plan: ``plan.md`` checkpoints to ``plan.checkpoint.jsonl``."""
+    plan_file = Path(plan_file)
+    return plan_file.with_name(plan_file.stem + CHECKPOINT_SUFFIX)
+
+def step_digests(plan: Plan, salt: Optional[Callable[[PlanStep], str]] = None) -> Dict[int, str]:
+    """Digest of each step's inputs, including the digests of its dependencies.
+    
+    Args:
+        plan: Validated plan, so the dependencies form a DAG
+        salt: Extra input of a step, e.g. a hash of its subagent definition
+    """
+    steps = plan.by_number
+    digests: Dict[int, str] = {}
+    
+    def digest(number: int) -> str:
+        if number not in digests:
+            step = steps[number]
+            payload = [step.subagent, step.prompt, step.context, salt(step) if salt else '',
+                       [digest(dependency) for dependency in sorted(step.dependencies)]]
+            digests[number] = hashlib.sha256(json.dumps(payload).encode()).hexdigest()
+        return digests[number]
+    
+    for step in plan.steps:
+        digest(step.number)
+    return digests
+
+class Checkpoint:
+    """Journal of step outcomes for one plan, appended to as steps finish."""
+    
+    def __init__(self, path: Path, digests: Dict[int, str]):
+        self.path = Path(path)
+        self.digests = digests
+        self._file: Optional[IO[str]] = None
+    
+    def __enter__(self) -> 'Checkpoint':
+        return self
+    
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+    
+    @property
+    def exists(self) -> bool:
+        return self.path.exists()
+    
+    def load(self) -> Dict[int, Dict[str, Any]]:
+        """Latest record of each step; lines cut short by an interrupted run are ignored."""
+        records: Dict[int, Dict[str, Any]] = {}
+        try:
+            with open(self.path, encoding='utf-8') as journal:
+                for line in journal:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue
+                    if isinstance(record, dict) and isinstance(record.get('step'), int):
+                        records[record['step']] = record
+        except FileNotFoundError:
+            pass
+        return records
+    
+    def apply(self, plan: Plan) -> List[PlanStep]:
+        """Set step states from the journal.
+        
+        Steps checkpointed as COMPLETED with unchanged inputs are marked
+        COMPLETED with their duration and log. Steps the plan file marks
+        COMPLETED but whose inputs changed since are reset to PENDING.
+        
+        Returns:
+            The steps that are complete and will not run again
+        """
+        records = self.load()
+        done = []
+        for step in plan.steps:
+            record = records.get(step.number)
+            if record is None:
+                if step.status == COMPLETED:
+                    done.append(step)
+                continue
+            if record.get('status') == COMPLETED and record.get('digest') == self.digests.get(step.number):
+                step.status, step.error = COMPLETED, None
+                step.duration, step.log = record.get('duration'), record.get('log')
+                done.append(step)
+            elif step.status == COMPLETED:
+                # Completed with different inputs: the plan or an agent changed since
+                step.status, step.duration, step.log = PENDING, None, None
+        return done
+    
+    def record(self, step: PlanStep) -> None:
+        """Append a step's outcome and flush it to disk."""
+        record = {
+            'step': step.number,
+            'subagent': step.subagent,
+            'status': step.status,
+            'digest': self.digests.get(step.number),
+            'attempts': step.attempts,
+            'duration': round(step.duration, 3) if step.duration is not None else None,
+            'log': step.log,
+            'error': step.error,
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        }
+        if self._file is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._file = open(self.path, 'a', encoding='utf-8')
+            if self._file.tell() and not self._ends_with_newline():
+                # Terminate a record cut short by an interrupted run
+                self._file.write('\n')
+        self._file.write(json.dumps(record) + '\n')
+        self._file.flush()
+        os.fsync(self._file.fileno())
+    
+    def _ends_with_newline(self) -> bool:
+        with open(self.path, 'rb') as journal:
+            journal.seek(-1, 2)
+            return journal.read(1) == b'\n'
+    
+    def reset(self) -> None:
+        """Forget all recorded outcomes."""
+        self.close()
+        try:
+            self.path.unlink()
+        except FileNotFoundError:
+            pass
+    
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
@@ -1,33 +1,101 @@
 """Main CLI module for copilot subagents."""
 
+import importlib
+import sys
+from typing import Dict, List, Optional, Tuple
+
 import click
-from rich.console import Console
-from rich.table import Table
-from rich.panel import Panel
-from rich.text import Text
 
-from commands import verify, invoke, list
+from daemon import run_via_daemon
+
+# Subcommands resolved on dispatch: name -> (module:attribute, short help)
+LAZY_COMMANDS: Dict[str, Tuple[str, str]] = {
+    'verify-allowed-tools': ('commands.verify:verify_allowed_tools', 'Verify allowed tools for a subagent.'),
+    'verify-denied-tools': ('commands.verify:verify_denied_tools', 'Verify denied tools for a subagent.'),
+    'verify': ('commands.verify:verify', 'Verify tools of many subagents with machine-readable output.'),
+    'invoke': ('commands.invoke:invoke', 'Invoke a subagent using GitHub Copilot CLI.'),
+    'run-plan': ('commands.plan:run_plan', 'Run the steps of a plan in dependency order.'),
+    'resume': ('commands.plan:resume', 'Continue a checkpointed plan from its first incomplete step.'),
+    'map': ('commands.map:map_subagent', 'Run a subagent over a JSONL batch of prompts.'),
+    'enqueue': ('commands.queue:enqueue', 'Queue a subagent invocation for the workers.'),
+    'worker': ('commands.queue:worker', 'Run queued subagent jobs.'),
+    'status': ('commands.queue:status', 'Show the jobs in the queue.'),
+    'cancel': ('commands.queue:cancel', 'Cancel queued or running jobs.'),
+    'list': ('commands.list:list_subagents', 'List all available subagents.'),
+    'show-tools': ('commands.list:show_tools', 'Show all valid tools for a specific AI tool.'),
+    'index': ('commands.index:index', 'Manage the persisted subagents registry index.'),
+    'daemon': ('commands.daemon:daemon', 'Manage the resident registry daemon.'),
+}
+
+class LazyGroup(click.Group):
+    """Click group that imports a command's module only when that command is dispatched.
+    
+    Help output uses the short help registered in ``LAZY_COMMANDS`` so that
+    ``--help`` and ``--version`` never import rich, yaml or the command modules.
+    """
+    
+    def __init__(self, *args, lazy_commands: Optional[Dict[str, Tuple[str, str]]] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.lazy_commands = lazy_commands or {}
+    
+    def list_commands(self, ctx: click.Context) -> List[str]:
+        return sorted(set(super().list_commands(ctx)) | set(self.lazy_commands))
+    
+    def get_command(self, ctx: click.Context, cmd_name: str) -> Optional[click.Command]:
+        if cmd_name in self.lazy_commands and cmd_name not in self.commands:
+            import_path, _ = self.lazy_commands[cmd_name]
+            module_name, attribute = import_path.split(':')
+            command = getattr(importlib.import_module(module_name), attribute)
+            self.add_command(command, name=cmd_name)
+        return super().get_command(ctx, cmd_name)
+    
+    def format_commands(self, ctx: click.Context, formatter: click.HelpFormatter) -> None:
+        rows = []
+        for name in self.list_commands(ctx):
+            if name in self.commands:
+                command = self.commands[name]
+                if command.hidden:
+                    continue
+                short_help = command.get_short_help_str(formatter.width - 6 - len(name))
+            else:
+                short_help = self.lazy_commands[name][1]
+            rows.append((name, short_help))
+        
+        if rows:
+            with formatter.section("Commands"):
+                formatter.write_dl(rows)
 
-console = Console()
+_console = None
 
-@click.group()
+def get_console():
+    """Get the shared rich console, importing rich on first use."""
+    global _console
+    if _console is None:
+        from rich.console import Console
+        _console = Console()
+    return _console
+
+@click.group(cls=LazyGroup, lazy_commands=LAZY_COMMANDS)
 @click.version_option(version="0.1.0")
+@click.option('--yolo/--no-yolo', default=None,
+              help='Allow all tools for this run (overrides COPILOT_SUBAGENTS_YOLO_MODE)')
 @click.pass_context
-def cli(ctx):
+def cli(ctx, yolo):
     """Copilot Subagents - Manage GitHub Copilot subagents with tool verification."""
+    from config import configure
+    
     ctx.ensure_object(dict)
-    ctx.obj['console'] = console
-
-# Register subcommands
-cli.add_command(verify.verify_allowed_tools)
-cli.add_command(verify.verify_denied_tools)
-cli.add_command(invoke.invoke)
-cli.add_command(list.list_subagents, name="list")
-cli.add_command(list.show_tools, name="show-tools")
+    ctx.obj['config'] = configure(yolo_mode=yolo)
+    ctx.obj['console'] = get_console()
 
 @cli.command()
 def info():
     """Display information about the CLI tool and available commands."""
+    from rich.panel import Panel
+    from rich.table import Table
+    from rich.text import Text
+    
+    console = get_console()
     info_text = Text("Copilot Subagents CLI", style="bold blue")
     
     panel = Panel(
@@ -46,9 +114,19 @@ def info():
     
     table.add_row("verify-allowed-tools", "Verify allowed tools against valid tools list")
     table.add_row("verify-denied-tools", "Verify denied tools against valid tools list")
+    table.add_row("verify", "Verify allowed and denied tools of many subagents (--all, --format)")
     table.add_row("invoke", "Execute subagent using GitHub Copilot CLI")
+    table.add_row("run-plan", "Run plan.md steps in parallel as their dependencies complete")
+    table.add_row("resume", "Continue a plan from its checkpoint, skipping completed steps")
+    table.add_row("map", "Run one subagent over a JSONL batch of prompts with resume")
+    table.add_row("enqueue", "Queue a subagent job with a priority for the workers")
+    table.add_row("worker", "Drain the job queue with N concurrent invocations (--concurrency)")
+    table.add_row("status", "Show queued, running and finished jobs")
+    table.add_row("cancel", "Cancel queued or running jobs")
     table.add_row("list", "List all available subagents")
     table.add_row("show-tools", "Show valid tools for a specific AI tool")
+    table.add_row("index rebuild", "Rebuild the persisted subagents registry index")
+    table.add_row("daemon", "Start, stop or inspect the resident registry daemon")
     table.add_row("info", "Show this information message")
     
     console.print(table)
@@ -56,13 +134,16 @@ def info():
     # Usage examples
     usage_panel = Panel(
         """[bold cyan]Examples:[/bold cyan]
-
+        
 [yellow]# Verify allowed tools for a subagent[/yellow]
 subagents verify-allowed-tools code-reviewer
 
 [yellow]# Verify denied tools for a subagent[/yellow] 
 subagents verify-denied-tools security-scanner
 
+[yellow]# Verify every subagent and write a JUnit report for CI[/yellow]
+subagents verify --all --format junit --output verify.xml
+
 [yellow]# Invoke a subagent with custom prompt[/yellow]
 subagents invoke code-reviewer --prompt "Review this TypeScript file"
 
@@ -78,5 +159,12 @@ subagents show-tools copilot-cli""",
     
     console.print(usage_panel)
 
+def main():
+    """Entry point that answers through a running daemon when possible."""
+    exit_code = run_via_daemon(sys.argv[1:])
+    if exit_code is not None:
+        sys.exit(exit_code)
+    cli()
+
 if __name__ == "__main__":
-    cli()
\ No newline at end of file
+    main()
\ No newline at end of file
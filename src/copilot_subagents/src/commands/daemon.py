@@ -0,0 +1,96 @@
+"""Resident daemon commands."""
+
+import subprocess
+import sys
+from pathlib import Path
+
+import click
+from rich.console import Console
+from rich.table import Table
+
+from core import get_default_subagents_dir
+from daemon import (SubagentDaemon, daemon_status, ensure_private_dir, get_socket_path, send_request,
+                    wait_for_daemon)
+
+console = Console()
+
+@click.group()
+def daemon():
+    """Run a background daemon that keeps the subagent registry hot."""
+
+@daemon.command()
+@click.option('--foreground', is_flag=True,
+              help='Run the daemon in this process instead of detaching')
+@click.option('--poll-interval', type=click.FloatRange(min=0.1), default=1.0, show_default=True,
+              help='Seconds between change checks when inotify is unavailable')
+@click.option('--no-inotify', is_flag=True,
+              help='Always use the polling watcher')
+@click.pass_context
+def start(ctx, foreground, poll_interval, no_inotify):
+    """Start the daemon for the current working directory."""
+    socket_path = get_socket_path()
+    try:
+        ensure_private_dir(socket_path.parent)
+    except PermissionError as e:
+        console.print(f"❌ {e}", style="red")
+        ctx.exit(1)
+    
+    status = daemon_status(socket_path)
+    if status is not None:
+        console.print(f"✅ Daemon already running (pid {status['pid']})", style="green")
+        return
+    
+    if foreground:
+        server = SubagentDaemon(socket_path, get_default_subagents_dir(),
+                                poll_interval=poll_interval, use_inotify=not no_inotify)
+        console.print(f"🛰️  Serving on {socket_path}", style="cyan")
+        server.serve_forever()
+        return
+    
+    command = [sys.executable, str(Path(__file__).parent.parent / "cli.py"),
+               'daemon', 'start', '--foreground', '--poll-interval', str(poll_interval)]
+    if no_inotify:
+        command.append('--no-inotify')
+    
+    process = subprocess.Popen(command, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                               stderr=subprocess.DEVNULL, start_new_session=True)
+    
+    if wait_for_daemon(socket_path, is_alive=lambda: process.poll() is None):
+        console.print(f"✅ Daemon started (pid {process.pid}) on {socket_path}", style="green")
+    else:
+        console.print("❌ Daemon failed to start", style="red")
+        ctx.exit(1)
+
+@daemon.command()
+@click.pass_context
+def stop(ctx):
+    """Stop the daemon for the current working directory."""
+    try:
+        send_request({'command': 'shutdown'}, get_socket_path(), timeout=5.0)
+    except (OSError, ValueError):
+        console.print("📭 No daemon running", style="yellow")
+        return
+    console.print("✅ Daemon stopped", style="green")
+
+@daemon.command()
+@click.pass_context
+def status(ctx):
+    """Show the status of the daemon for the current working directory."""
+    status = daemon_status(get_socket_path())
+    if status is None:
+        console.print("📭 No daemon running", style="yellow")
+        ctx.exit(1)
+    
+    table = Table(title="Subagents Daemon", show_header=True, header_style="bold magenta")
+    table.add_column("Property", style="cyan")
+    table.add_column("Value", style="green")
+    
+    table.add_row("PID", str(status['pid']))
+    table.add_row("Working directory", status['cwd'])
+    table.add_row("Watching", status['watch_dir'])
+    table.add_row("Watcher", status['watcher'])
+    table.add_row("Uptime", f"{status['uptime']:.0f}s")
+    table.add_row("Requests served", str(status['requests_served']))
+    table.add_row("Invalidations", str(status['invalidations']))
+    
+    console.print(table)
@@ -0,0 +1,41 @@
+"""Registry index commands."""
+
+import click
+from pathlib import Path
+from rich.console import Console
+
+from core import get_default_subagents_dir
+from registry import SubagentIndex
+
+console = Console()
+
+@click.group()
+def index():
+    """Manage the persisted subagents registry index."""
+
+@index.command()
+@click.option('--subagents-dir', '-d',
+              type=click.Path(exists=True, path_type=Path),
+              help='Path to subagents directory (default from COPILOT_SUBAGENTS_SUBAGENTS_DIR env var or .github/subagents)')
+@click.option('--workers', '-w',
+              type=click.IntRange(min=1),
+              help='Number of threads used to parse subagent files (default from COPILOT_SUBAGENTS_WORKERS env var)')
+@click.pass_context
+def rebuild(ctx, subagents_dir, workers):
+    """Re-parse every subagent file and rewrite the registry index."""
+    try:
+        # Use provided directory or fall back to environment variable/default
+        if subagents_dir is None:
+            subagents_dir = get_default_subagents_dir()
+        registry_index = SubagentIndex(subagents_dir, workers=workers)
+        
+        entries = registry_index.rebuild()
+        errors = [entry for entry in entries if entry.error]
+        
+        console.print(f"✅ Indexed {len(entries)} subagent(s) into {registry_index.index_path}", style="green")
+        for entry in errors:
+            console.print(f"⚠️  {entry.name}: {entry.error}", style="yellow")
+    
+    except Exception as e:
+        console.print(f"❌ Error rebuilding index: {e}", style="red")
+        ctx.exit(1)
@@ -1,9 +1,10 @@
 """Subagent invocation command."""
 
-import subprocess
+import asyncio
 import sys
+from contextlib import contextmanager
 from pathlib import Path
-from typing import List, Optional
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
 import click
 from rich.console import Console
@@ -11,7 +12,14 @@ from rich.table import Table
 from rich.panel import Panel
 from rich.progress import Progress, SpinnerColumn, TextColumn
 
-from core import SubagentParser, ToolVerifier, format_copilot_tools, get_default_subagents_dir
+from context import (INCLUDED, ContextReport, assemble_context, expand_context_paths,
+                     get_context_budget)
+from core import SubagentParser, get_default_subagents_dir, get_state_dir, get_supported_ai_tools
+from invocation import (PROMPT_ARGV, PROMPTS_DIRNAME, STDERR, BackendCommand, OutputLine, ToolVerificationError,
+                        get_ai_tool, prepare_subagent_command, split_context_argument)
+from resultcache import ResultCache, is_result_cache_enabled, result_cache_key
+from runlog import RunLog, new_run_log
+from tracing import TRACE_FORMATS, Tracer, span, start_tracing, stop_tracing
 
 console = Console()
 
@@ -20,10 +28,26 @@ console = Console()
 @click.option('--prompt', '-p', 
               help='Custom prompt/task for the subagent')
 @click.option('--context', '-c',
-              help='Additional context for the subagent')
+              help='Additional context for the subagent; @FILE streams the file into the prompt')
+@click.option('--context-file', '-F', 'context_files',
+              multiple=True,
+              type=click.Path(exists=True, dir_okay=False, path_type=Path),
+              help='File to include in the context (repeatable)')
+@click.option('--context-glob', '-g', 'context_globs',
+              multiple=True,
+              help='Glob of files to include in the context, e.g. "src/**/*.py" (repeatable)')
+@click.option('--context-max-bytes',
+              type=click.IntRange(min=0),
+              help='Byte budget of the assembled context (default from COPILOT_SUBAGENTS_CONTEXT_MAX_BYTES or 256 KiB)')
+@click.option('--context-max-tokens',
+              type=click.IntRange(min=0),
+              help='Token budget of the assembled context, estimated at 4 bytes per token')
 @click.option('--subagents-dir', '-d',
               type=click.Path(exists=True, path_type=Path),
               help='Path to subagents directory (default from COPILOT_SUBAGENTS_SUBAGENTS_DIR env var or .github/subagents)')
+@click.option('--ai-tool', '-t',
+              type=click.Choice(get_supported_ai_tools()),
+              help='AI tool to verify against and run the subagent with (default from COPILOT_SUBAGENTS_AI_TOOL or copilot-cli)')
 @click.option('--valid-tools-file', '-v',
               type=click.Path(exists=True, path_type=Path),
               help='Path to file containing valid tools list')
@@ -33,14 +57,43 @@ console = Console()
 @click.option('--verify-tools/--skip-verification',
               default=True,
               help='Verify tools before execution (default: enabled)')
+@click.option('--cache/--no-cache',
+              default=None,
+              help='Reuse the result of an identical earlier invocation (default from COPILOT_SUBAGENTS_RESULT_CACHE)')
+@click.option('--input-file', '-f', 'input_files',
+              multiple=True,
+              type=click.Path(exists=True, dir_okay=False, path_type=Path),
+              help='File the task reads; its contents are part of the result cache key (repeatable)')
+@click.option('--profile',
+              is_flag=True,
+              help='Print how long each phase of the invocation took')
+@click.option('--trace', 'trace_file',
+              type=click.Path(dir_okay=False, path_type=Path),
+              help='Write the timed phases to this JSON file')
+@click.option('--trace-format',
+              type=click.Choice(TRACE_FORMATS),
+              help='Chrome trace events or OTLP JSON (default: otlp if the file name contains "otlp", else chrome)')
 @click.pass_context
-def invoke(ctx, subagent_name, prompt, context, subagents_dir, valid_tools_file, 
-           dry_run, verify_tools):
+def invoke(ctx, subagent_name, prompt, context, context_files, context_globs, context_max_bytes,
+           context_max_tokens, subagents_dir, ai_tool, valid_tools_file, dry_run, verify_tools, cache, input_files,
+           profile, trace_file, trace_format):
     """Invoke a subagent using GitHub Copilot CLI with proper tool restrictions."""
+    with _tracing(profile, trace_file, trace_format), span('invoke', subagent=subagent_name or ''):
+        _invoke(ctx, subagent_name, prompt, context, context_files, context_globs, context_max_bytes,
+                context_max_tokens, subagents_dir, ai_tool, valid_tools_file, dry_run, verify_tools, cache,
+                input_files)
+
+def _invoke(ctx, subagent_name, prompt, context, context_files, context_globs, context_max_bytes,
+            context_max_tokens, subagents_dir, ai_tool, valid_tools_file, dry_run, verify_tools, cache, input_files):
+    try:
+        ai_tool = get_ai_tool(ai_tool=ai_tool)
+    except ValueError as e:
+        console.print(f"❌ Error: {e}", style="red")
+        ctx.exit(1)
     
     # Use provided directory or fall back to environment variable/default
     if subagents_dir is None:
-        subagents_dir = get_default_subagents_dir()
+        subagents_dir = get_default_subagents_dir(ai_tool)
     parser = SubagentParser(subagents_dir)
     
     # Validate required arguments
@@ -56,42 +109,51 @@ def invoke(ctx, subagent_name, prompt, context, subagents_dir, valid_tools_file,
         # Verify subagent exists and parse it
         console.print(f"🔍 Loading subagent '{subagent_name}'...", style="cyan")
         
-        # Parse the full subagent data including model
-        subagent_data = parser.parse_file(f"{subagents_dir}/{subagent_name}.md")
-        allowed_tools = subagent_data['tools']['allowed']
-        denied_tools = subagent_data['tools']['denied']
-        subagent_prompt = subagent_data['prompt']
-        model = subagent_data.get('model', '')
-        
-        # Verify tools if requested
-        if verify_tools:
-            _verify_subagent_tools(subagent_name, allowed_tools, denied_tools, valid_tools_file)
-        
-        # Build the full prompt
-        full_prompt = _build_full_prompt(subagent_prompt, prompt, context)
-        
-        # Format tool flags and model
-        allowed_flags = format_copilot_tools(allowed_tools, "allow")
-        denied_flags = format_copilot_tools(denied_tools, "deny")
-        
-        # Format model flags using the AI verifier
-        from core import get_ai_tool_verifier
-        verifier = get_ai_tool_verifier("copilot-cli")
-        model_flags = verifier.format_model(model)
-        
-        # Build copilot command
-        copilot_cmd = _build_copilot_command(full_prompt, allowed_flags, denied_flags, model_flags)
-        
-        # Display execution info
-        _display_execution_info(subagent_name, allowed_tools, denied_tools, model, full_prompt, copilot_cmd)
+        context_report = None
+        keep_prompt_file = False
+        if context_files or context_globs:
+            with span('context'):
+                context_report = _assemble_context(subagents_dir, context, context_files, context_globs,
+                                                   context_max_bytes, context_max_tokens)
+            context = f"@{context_report.path}"
         
-        if dry_run:
-            console.print("\n🏃 [yellow]Dry run mode - command would be:[/yellow]")
-            console.print(f"[dim]{copilot_cmd}[/dim]")
-            return
-        
-        # Execute copilot command
-        _execute_copilot_command(copilot_cmd)
+        copilot_cmd = None
+        try:
+            copilot_cmd, subagent_data = prepare_copilot_command(
+                parser, subagents_dir, subagent_name, prompt, context, verify_tools, valid_tools_file, ai_tool)
+            
+            # Display execution info
+            with span('render'):
+                _display_execution_info(subagent_name, subagent_data['tools']['allowed'],
+                                        subagent_data['tools']['denied'], subagent_data.get('model', ''),
+                                        copilot_cmd.preview(), copilot_cmd.argv)
+                if copilot_cmd.transport != PROMPT_ARGV:
+                    console.print(f"📨 Prompt delivered via {copilot_cmd.transport}: {copilot_cmd.prompt_file}",
+                                  style="dim")
+            
+            if dry_run:
+                console.print("\n🏃 [yellow]Dry run mode - command would be:[/yellow]")
+                console.print(f"[dim]{copilot_cmd.argv}[/dim]")
+                if copilot_cmd.prompt_file is not None:
+                    # The command refers to the prompt file, so it is kept for inspection
+                    keep_prompt_file = True
+                    console.print(f"📄 Kept the prompt file {copilot_cmd.prompt_file}; delete it when done",
+                                  style="dim")
+                return
+            
+            # Execute copilot command, keeping the full output in a run log
+            result_cache, cache_key = None, None
+            if is_result_cache_enabled(cache):
+                with span('cache_key'):
+                    result_cache = ResultCache(subagents_dir)
+                    cache_key = result_cache_key(subagent_data, copilot_cmd.cache_parts(), input_files)
+            _execute_copilot_command(copilot_cmd, _open_run_log(subagents_dir, subagent_name),
+                                     result_cache, cache_key)
+        finally:
+            if copilot_cmd is not None and not keep_prompt_file:
+                copilot_cmd.cleanup()
+            if context_report is not None:
+                context_report.path.unlink(missing_ok=True)
         
     except FileNotFoundError as e:
         console.print(f"❌ Error: {e}", style="red")
@@ -104,73 +166,102 @@ def invoke(ctx, subagent_name, prompt, context, subagents_dir, valid_tools_file,
         console.print(f"❌ Unexpected error: {e}", style="red")
         ctx.exit(1)
 
+@contextmanager
+def _tracing(profile: bool, trace_file: Optional[Path], trace_format: Optional[str]) -> Iterator[None]:
+    """Record phases while the block runs, then print them and/or write them to ``trace_file``."""
+    if not profile and trace_file is None:
+        yield
+        return
+    start_tracing()
+    try:
+        yield
+    finally:
+        tracer = stop_tracing()
+        if profile:
+            _print_profile(tracer)
+        if trace_file is not None:
+            try:
+                console.print(f"🧭 Trace written to {tracer.write(trace_file, trace_format)}", style="dim")
+            except OSError as e:
+                console.print(f"⚠️  Could not write trace: {e}", style="yellow")
 
-def _verify_subagent_tools(subagent_name: str, allowed_tools: List[str], 
-                          denied_tools: List[str], valid_tools_file: Optional[Path]):
-    """Verify both allowed and denied tools."""
-    # For now, we default to copilot-cli (ignoring valid_tools_file parameter for now)
-    verifier = ToolVerifier("copilot-cli")
-    
-    all_issues = []
-    
-    # Verify allowed tools
-    if allowed_tools:
-        _, invalid_allowed = verifier.verify_tools(allowed_tools)
-        if invalid_allowed:
-            all_issues.extend([f"Invalid allowed tool: {tool}" for tool in invalid_allowed])
-    
-    # Verify denied tools
-    if denied_tools:
-        _, invalid_denied = verifier.verify_tools(denied_tools)
-        if invalid_denied:
-            all_issues.extend([f"Invalid denied tool: {tool}" for tool in invalid_denied])
-    
-    if all_issues:
+def _print_profile(tracer: Tracer) -> None:
+    phases = tracer.summary()
+    wall = sum(phase.total for phase in phases if phase.name == 'invoke')
+    profile_table = Table(title="Invocation Profile", show_header=True, header_style="bold magenta")
+    profile_table.add_column("Phase", style="cyan")
+    profile_table.add_column("Calls", justify="right")
+    profile_table.add_column("Total", justify="right")
+    profile_table.add_column("Own", justify="right", style="bold")
+    profile_table.add_column("Share", justify="right", style="dim")
+    for phase in phases:
+        share = f"{phase.own / wall:.0%}" if wall else "-"
+        profile_table.add_row(phase.name, str(phase.calls), f"{phase.total * 1000:.2f}ms",
+                              f"{phase.own * 1000:.2f}ms", share)
+    console.print(profile_table)
+
+def prepare_copilot_command(parser: SubagentParser, subagents_dir: Path, subagent_name: str,
+                            prompt: str, context: Optional[str] = None, verify_tools: bool = True,
+                            valid_tools_file: Optional[Path] = None,
+                            ai_tool: Optional[str] = None) -> Tuple[BackendCommand, Dict[str, Any]]:
+    """Load a subagent, verify its tools and build the copilot command that runs it.
+    
+    Verification results are reported on the console. A context of the form
+    ``@path`` is streamed from that file into the prompt.
+    
+    Returns:
+        Tuple of (copilot command, parsed subagent data); call the command's
+        ``cleanup()`` when it has run
+        
+    Raises:
+        FileNotFoundError: If the subagent or the context file does not exist
+        ValueError: If the subagent cannot be parsed, fails tool verification or
+            the prompt is too large for the backend
+    """
+    # valid_tools_file is accepted for compatibility; tools are verified against the ai_tool catalog
+    context, context_file = split_context_argument(context)
+    try:
+        prepared = prepare_subagent_command(parser, subagents_dir, subagent_name, prompt, context, verify_tools,
+                                            context_file, ai_tool)
+    except ToolVerificationError as e:
         error_panel = Panel(
             f"[red]Tool verification failed for '{subagent_name}':[/red]\n" +
-            "\n".join([f"• {issue}" for issue in all_issues]),
+            "\n".join([f"• {issue}" for issue in e.issues]),
             title="⚠️  Tool Verification Failed",
             border_style="red"
         )
         console.print(error_panel)
-        raise ValueError("Tool verification failed")
-    else:
+        raise ValueError("Tool verification failed") from e
+    
+    if prepared.verification == 'cached':
+        console.print("✅ All tools verified successfully (cached)", style="green")
+    elif prepared.verification == 'verified':
         console.print("✅ All tools verified successfully", style="green")
+    return prepared.command, prepared.subagent
 
-def _build_full_prompt(subagent_prompt: str, user_prompt: str, context: Optional[str] = None) -> str:
-    """Build the complete prompt for the subagent."""
-    full_prompt = subagent_prompt
-    
-    if context:
-        full_prompt += f"\n\nContext: {context}"
+def _assemble_context(subagents_dir: Path, context: Optional[str], context_files: Tuple[Path, ...],
+                      context_globs: Tuple[str, ...], max_bytes: Optional[int],
+                      max_tokens: Optional[int]) -> ContextReport:
+    """Assemble the context files into one file and report what was included.
     
-    full_prompt += f"\n\nTask: {user_prompt}"
+    Free-text context goes first; an ``@FILE`` context is treated as one more file.
+    """
+    text, context_file = split_context_argument(context)
+    paths = expand_context_paths(([context_file] if context_file else []) + list(context_files), context_globs)
+    report = assemble_context(paths, get_state_dir(subagents_dir) / PROMPTS_DIRNAME,
+                              get_context_budget(max_bytes, max_tokens), preamble=text)
     
-    return full_prompt
-
-def _build_copilot_command(prompt: str, allowed_flags: str, denied_flags: str, model_flags: str = "") -> List[str]:
-    """Build the copilot CLI command."""
-    cmd = ["copilot"]
-    
-    # Add model flag first if specified
-    if model_flags:
-        flags = model_flags.split()
-        cmd.extend(flags)
-    
-    # Add prompt
-    cmd.extend(["-p", prompt])
-    
-    if allowed_flags:
-        # Split and add each flag
-        flags = allowed_flags.split()
-        cmd.extend(flags)
-    
-    if denied_flags:
-        # Split and add each flag  
-        flags = denied_flags.split()
-        cmd.extend(flags)
-    
-    return cmd
+    left_out = [entry for entry in report.entries if entry.status != INCLUDED]
+    if left_out:
+        context_table = Table(title="Context Files Not Fully Included", show_header=True, header_style="bold cyan")
+        context_table.add_column("File", style="blue")
+        context_table.add_column("Status", style="yellow")
+        context_table.add_column("Reason", style="dim")
+        for entry in left_out:
+            context_table.add_row(str(entry.path), entry.status, entry.detail)
+        console.print(context_table)
+    console.print(f"📎 Context: {report.summary()}", style="cyan")
+    return report
 
 def _display_execution_info(subagent_name: str, allowed_tools: List[str], 
                            denied_tools: List[str], model: str, prompt: str, command: List[str]):
@@ -202,8 +293,19 @@ def _display_execution_info(subagent_name: str, allowed_tools: List[str],
     )
     console.print(prompt_panel)
 
-def _execute_copilot_command(command: List[str]):
-    """Execute the copilot CLI command."""
+def _open_run_log(subagents_dir: Path, subagent_name: str) -> Optional[RunLog]:
+    try:
+        return new_run_log(subagents_dir, subagent_name)
+    except OSError as e:
+        console.print(f"⚠️  Not writing a run log: {e}", style="yellow")
+        return None
+
+def _execute_copilot_command(command: BackendCommand, log: Optional[RunLog] = None,
+                             result_cache: Optional[ResultCache] = None, cache_key: Optional[str] = None):
+    """Execute the copilot CLI command, streaming its output and teeing it to ``log``.
+    
+    With a result cache, an identical earlier result is replayed instead.
+    """
     console.print("\n🚀 [bold green]Executing GitHub Copilot CLI...[/bold green]")
     
     with Progress(
@@ -214,26 +316,42 @@ def _execute_copilot_command(command: List[str]):
         task = progress.add_task("Running copilot command...", total=None)
         
         try:
-            # Execute the command
-            result = subprocess.run(
-                command,
-                capture_output=False,  # Let copilot handle its own output
-                text=True,
-                check=True
-            )
-            
-            progress.update(task, description="Complete!")
-            console.print("✅ [bold green]Copilot execution completed successfully![/bold green]")
-            
-        except subprocess.CalledProcessError as e:
-            progress.stop()
-            console.print(f"❌ [red]Copilot execution failed with exit code {e.returncode}[/red]")
-            sys.exit(e.returncode)
+            result = asyncio.run(command.run(on_output=_echo_output_line, log=log, capture=False,
+                                             cache=result_cache, cache_key=cache_key))
         except FileNotFoundError:
             progress.stop()
             console.print("❌ [red]GitHub Copilot CLI not found. Please ensure it's installed and in your PATH.[/red]")
             console.print("Install instructions: https://docs.github.com/en/copilot/github-copilot-in-the-cli")
             sys.exit(1)
+        except KeyboardInterrupt:
+            # asyncio.run cancelled the invocation, which terminated the backend's process group
+            progress.stop()
+            console.print("🛑 [yellow]Interrupted; the copilot process was stopped[/yellow]")
+            sys.exit(130)
+        
+        if result.cached:
+            console.print("♻️  Reused the cached result of an identical invocation", style="cyan")
+        if result.log_path is not None:
+            console.print(f"📝 Full output saved to {result.log_path}", style="dim")
+        
+        if result.timed_out:
+            progress.stop()
+            console.print(f"⏱️  [red]Copilot execution timed out after {command.limits.timeout:g}s[/red]")
+            sys.exit(124)
+        
+        if not result.success:
+            progress.stop()
+            console.print(f"❌ [red]Copilot execution failed with exit code {result.returncode}[/red]")
+            # Negative codes mean the process was killed by a signal
+            sys.exit(result.returncode if result.returncode > 0 else 1)
+        
+        progress.update(task, description="Complete!")
+        console.print("✅ [bold green]Copilot execution completed successfully![/bold green]")
+
+def _echo_output_line(line: OutputLine):
+    stream = sys.stderr if line.stream == STDERR else sys.stdout
+    stream.write(line.text + "\n")
+    stream.flush()
 
 def _suggest_available_subagents(parser: SubagentParser):
     """Suggest available subagents when one is not found."""
@@ -0,0 +1,110 @@
+"""Batch (map) invocation command."""
+
+import asyncio
+from pathlib import Path
+
+import click
+from rich.console import Console
+from rich.progress import BarColumn, MofNCompleteColumn, Progress, TextColumn, TimeElapsedColumn
+
+from batch import ResultWriter, completed_indices, read_tasks, run_map
+from core import SubagentParser, get_default_subagents_dir
+from invocation import ToolVerificationError, prepare_subagent
+from resultcache import ResultCache, is_result_cache_enabled
+
+console = Console()
+
+@click.command(name='map')
+@click.argument('subagent_name')
+@click.option('--input', '-i', 'input_file', required=True,
+              type=click.Path(exists=True, dir_okay=False, path_type=Path),
+              help='JSONL file with one {"prompt": ..., "context": ..., "context_file": ..., "files": [...]} object per line')
+@click.option('--output', '-o', 'output_file',
+              type=click.Path(dir_okay=False, path_type=Path),
+              help='JSONL file results are appended to (default: <input>.results.jsonl)')
+@click.option('--concurrency', '-j',
+              type=click.IntRange(min=1), default=4, show_default=True,
+              help='Maximum number of invocations running at the same time')
+@click.option('--resume/--overwrite',
+              default=True,
+              help='Skip inputs whose index is already in the output file (default) or start over')
+@click.option('--dry-run', '--dry',
+              is_flag=True,
+              help='Show how many tasks would run and the first copilot command without running anything')
+@click.option('--verify-tools/--skip-verification',
+              default=True,
+              help='Verify tools before execution (default: enabled)')
+@click.option('--cache/--no-cache',
+              default=None,
+              help='Reuse results of identical earlier invocations (default from COPILOT_SUBAGENTS_RESULT_CACHE)')
+@click.option('--subagents-dir', '-d',
+              type=click.Path(exists=True, path_type=Path),
+              help='Path to subagents directory (default from COPILOT_SUBAGENTS_SUBAGENTS_DIR env var or .github/subagents)')
+@click.pass_context
+def map_subagent(ctx, subagent_name, input_file, output_file, concurrency, resume, dry_run,
+                 verify_tools, cache, subagents_dir):
+    """Run SUBAGENT_NAME once per line of a JSONL batch of prompts.
+    
+    The subagent is parsed and verified once. Results are appended to the
+    output JSONL in completion order with the input line's index, so an
+    interrupted batch continues where it stopped when run again.
+    """
+    # Use provided directory or fall back to environment variable/default
+    if subagents_dir is None:
+        subagents_dir = get_default_subagents_dir()
+    output_file = output_file or input_file.with_name(f"{input_file.stem}.results.jsonl")
+    
+    try:
+        agent = prepare_subagent(SubagentParser(subagents_dir), subagents_dir, subagent_name, verify_tools)
+    except ToolVerificationError as e:
+        console.print(f"❌ {e}", style="red")
+        ctx.exit(1)
+    except (FileNotFoundError, ValueError) as e:
+        console.print(f"❌ Error loading subagent: {e}", style="red")
+        ctx.exit(1)
+    
+    skip = completed_indices(output_file) if resume else set()
+    if skip:
+        console.print(f"⏩ Resuming: {len(skip)} result(s) already in {output_file}", style="cyan")
+    
+    if dry_run:
+        tasks = [task for task in read_tasks(input_file) if task.index not in skip]
+        runnable = [task for task in tasks if not task.error]
+        console.print(f"🏃 [yellow]Dry run mode - {len(runnable)} task(s) would run, "
+                      f"{len(tasks) - len(runnable)} invalid[/yellow]")
+        if runnable:
+            first = runnable[0]
+            try:
+                command = agent.command(first.prompt, first.context,
+                                        Path(first.context_file) if first.context_file else None)
+            except (OSError, ValueError) as e:
+                console.print(f"❌ Task {first.index}: {e}", style="red")
+                ctx.exit(1)
+            console.print(f"[dim]{command.argv} (prompt via {command.transport})[/dim]")
+            command.cleanup()
+        return
+    
+    with ResultWriter(output_file, append=resume) as writer, Progress(
+        TextColumn("[progress.description]{task.description}"),
+        BarColumn(),
+        MofNCompleteColumn(),
+        TimeElapsedColumn(),
+        console=console
+    ) as progress:
+        progress_task = progress.add_task(f"Running {subagent_name}...", total=None)
+        
+        def on_result(record):
+            writer.write(record)
+            progress.advance(progress_task)
+            if not record['success']:
+                reason = record.get('error') or f"exit code {record['returncode']}"
+                progress.console.print(f"❌ Task {record['index']} failed: {reason}", style="red")
+        
+        counts = asyncio.run(run_map(agent, read_tasks(input_file), subagents_dir, on_result,
+                                     concurrency=concurrency, skip=skip,
+                                     cache=ResultCache(subagents_dir) if is_result_cache_enabled(cache) else None))
+    
+    console.print(f"✅ {counts['succeeded']} succeeded, ❌ {counts['failed']} failed, "
+                  f"⏩ {counts['skipped']} skipped - results in {output_file}")
+    if counts['failed']:
+        ctx.exit(1)
@@ -0,0 +1,209 @@
+"""Plan execution command."""
+
+import asyncio
+from pathlib import Path
+
+import click
+from rich.console import Console
+from rich.table import Table
+
+from checkpoint import Checkpoint, get_checkpoint_path, step_digests
+from config import get_config
+from core import SubagentParser, get_default_subagents_dir, get_state_dir
+from invocation import terminate_running_invocations
+from plan import (BLOCKED, CANCELLED, COMPLETED, FAILED, IN_PROGRESS, PENDING, PLAN_FILENAME, Plan, PlanExecutor,
+                  PlanStep)
+from resultcache import ResultCache, hash_file, is_result_cache_enabled, result_cache_key
+from retry import RetryPolicy
+from runlog import new_run_log
+
+console = Console()
+
+STATUS_STYLES = {
+    IN_PROGRESS: ("▶️ ", "cyan"),
+    COMPLETED: ("✅", "green"),
+    FAILED: ("❌", "red"),
+    BLOCKED: ("⏭️ ", "yellow"),
+    CANCELLED: ("⏹️ ", "yellow"),
+}
+
+def _plan_options(command):
+    """Options shared by run-plan and resume."""
+    options = [
+        click.argument('plan_file', required=False,
+                       type=click.Path(dir_okay=False, path_type=Path)),
+        click.option('--max-workers', '-j',
+                     type=click.IntRange(min=1), default=4, show_default=True,
+                     help='Maximum number of steps running at the same time'),
+        click.option('--fail-fast/--continue-on-error',
+                     default=False,
+                     help='Stop starting new steps after the first failure (default: keep running independent steps)'),
+        click.option('--retries',
+                     type=click.IntRange(min=0),
+                     help='Retries of a step after a transient failure (default from COPILOT_SUBAGENTS_RETRIES or 2)'),
+        click.option('--dry-run', '--dry',
+                     is_flag=True,
+                     help='Show the copilot commands without executing them or updating the plan'),
+        click.option('--verify-tools/--skip-verification',
+                     default=True,
+                     help='Verify tools before each step (default: enabled)'),
+        click.option('--cache/--no-cache',
+                     default=None,
+                     help='Reuse results of identical earlier invocations (default from COPILOT_SUBAGENTS_RESULT_CACHE)'),
+        click.option('--subagents-dir', '-d',
+                     type=click.Path(exists=True, path_type=Path),
+                     help='Path to subagents directory (default from COPILOT_SUBAGENTS_SUBAGENTS_DIR env var or .github/subagents)'),
+    ]
+    for option in reversed(options):
+        command = option(command)
+    return command
+
+@click.command()
+@_plan_options
+@click.option('--restart',
+              is_flag=True,
+              help='Forget the checkpoint and step statuses and run every step again')
+@click.pass_context
+def run_plan(ctx, plan_file, max_workers, fail_fast, retries, dry_run, verify_tools, cache, subagents_dir, restart):
+    """Run the steps of a plan, in parallel where dependencies allow.
+    
+    PLAN_FILE defaults to plan.md in the subagents state directory. Step status,
+    durations and the path of each step's output log are written back to the
+    plan as steps finish, and each outcome is appended to the plan's checkpoint.
+    Steps that completed with the same inputs are not run again.
+    """
+    _execute_plan(ctx, plan_file, max_workers, fail_fast, retries, dry_run, verify_tools, cache,
+                  subagents_dir, restart=restart)
+
+@click.command()
+@_plan_options
+@click.pass_context
+def resume(ctx, plan_file, max_workers, fail_fast, retries, dry_run, verify_tools, cache, subagents_dir):
+    """Continue a checkpointed plan from its first incomplete step.
+    
+    Completed steps are skipped unless their prompt, context, subagent or
+    dependencies changed since they ran. Failed, blocked and cancelled steps run again.
+    """
+    _execute_plan(ctx, plan_file, max_workers, fail_fast, retries, dry_run, verify_tools, cache,
+                  subagents_dir, resume=True)
+
+def _execute_plan(ctx, plan_file, max_workers, fail_fast, retries, dry_run, verify_tools, cache,
+                  subagents_dir, restart=False, resume=False):
+    from commands.invoke import prepare_copilot_command
+    
+    # Use provided directory or fall back to environment variable/default
+    if subagents_dir is None:
+        subagents_dir = get_default_subagents_dir()
+    plan_file = plan_file or get_state_dir(subagents_dir) / PLAN_FILENAME
+    parser = SubagentParser(subagents_dir)
+    
+    try:
+        plan = Plan.load(plan_file)
+    except (FileNotFoundError, ValueError) as e:
+        console.print(f"❌ Error loading plan: {e}", style="red")
+        ctx.exit(1)
+    
+    checkpoint = Checkpoint(get_checkpoint_path(plan_file),
+                            step_digests(plan, lambda step: _step_input_hash(subagents_dir, step)))
+    if resume and not checkpoint.exists:
+        console.print(f"❌ No checkpoint found for {plan_file}; start the plan with run-plan", style="red")
+        ctx.exit(1)
+    if restart:
+        if not dry_run:
+            checkpoint.reset()
+        for step in plan.steps:
+            step.status, step.duration, step.log = PENDING, None, None
+    
+    done = checkpoint.apply(plan)
+    remaining = [step for step in plan.steps if step not in done]
+    if done and remaining:
+        console.print(f"⏩ Skipping {len(done)} completed step(s); continuing from step {remaining[0].number}",
+                      style="cyan")
+    
+    result_cache = ResultCache(subagents_dir) if is_result_cache_enabled(cache) else None
+    
+    def run_step(step: PlanStep) -> int:
+        command, subagent_data = prepare_copilot_command(parser, subagents_dir, step.subagent, step.prompt,
+                                                         step.context, verify_tools)
+        try:
+            if dry_run:
+                console.print(f"[dim]Step {step.number}: {command.argv}[/dim]")
+                return 0
+            
+            # Output goes to a per-step run log; only the tail is kept in memory
+            log = new_run_log(subagents_dir, f"step{step.number}-{step.subagent}")
+            step.log = str(log.path)
+            key = result_cache_key(subagent_data, command.cache_parts()) if result_cache is not None else None
+            result = asyncio.run(command.run(env=get_config().subprocess_env(), log=log, cache=result_cache,
+                                             cache_key=key))
+        finally:
+            command.cleanup()
+        if result.timed_out:
+            step.error = f"Timed out after {command.limits.timeout:g}s"
+        elif not result.success:
+            step.stderr = result.stderr
+            last_line = (result.stderr or result.stdout).rsplit('\n', 1)[-1].strip()
+            step.error = f"Exited with code {result.returncode}" + (f": {last_line}" if last_line else "")
+        return result.returncode
+    
+    with checkpoint:
+        executor = PlanExecutor(plan, run_step, max_workers=max_workers, fail_fast=fail_fast,
+                                write_back=not dry_run, on_update=_print_step_update,
+                                retry=None if dry_run else RetryPolicy.from_config(retries),
+                                on_retry=_print_retry,
+                                on_finish=None if dry_run else checkpoint.record,
+                                on_interrupt=terminate_running_invocations)
+        console.print(f"📋 Running {len(remaining)} of {len(plan.steps)} step(s) from {plan_file} "
+                      f"with up to {max_workers} worker(s)", style="cyan")
+        success = executor.run()
+    
+    _print_summary(plan)
+    if not success:
+        ctx.exit(1)
+
+def _step_input_hash(subagents_dir: Path, step: PlanStep) -> str:
+    """Hash of the files a step reads besides the plan: its subagent and an @FILE context."""
+    paths = [Path(subagents_dir) / f"{step.subagent}.md"]
+    if step.context and step.context.startswith('@') and not step.context.startswith('@@'):
+        paths.append(Path(step.context[1:]).expanduser())
+    hashes = []
+    for path in paths:
+        try:
+            hashes.append(hash_file(path))
+        except OSError:
+            # A missing file fails the step when it runs
+            hashes.append('')
+    return ':'.join(hashes)
+
+def _print_retry(step: PlanStep, delay: float) -> None:
+    console.print(f"🔁 Step {step.number} ({step.subagent}): attempt {step.attempts} failed"
+                  f"{f' - {step.error}' if step.error else ''}; retrying in {delay:.1f}s", style="yellow")
+
+def _print_step_update(step: PlanStep) -> None:
+    icon, style = STATUS_STYLES.get(step.status, ("•", "white"))
+    message = f"{icon} Step {step.number} ({step.subagent}): {step.status}"
+    if step.duration is not None and step.status in (COMPLETED, FAILED):
+        message += f" in {step.duration:.1f}s"
+    if step.attempts > 1 and step.status in (COMPLETED, FAILED):
+        message += f" after {step.attempts} attempts"
+    if step.error:
+        message += f" - {step.error}"
+    if step.log and step.status in (COMPLETED, FAILED):
+        message += f" (log: {step.log})"
+    console.print(message, style=style)
+
+def _print_summary(plan: Plan) -> None:
+    table = Table(title="Plan Execution", show_header=True, header_style="bold magenta")
+    table.add_column("Step", style="cyan", justify="right")
+    table.add_column("Title")
+    table.add_column("Subagent", style="blue")
+    table.add_column("Status", style="bold")
+    table.add_column("Duration", justify="right")
+    
+    for step in plan.steps:
+        _, style = STATUS_STYLES.get(step.status, ("", "white"))
+        duration = f"{step.duration:.1f}s" if step.duration is not None else "-"
+        table.add_row(str(step.number), step.title, step.subagent,
+                      f"[{style}]{step.status}[/{style}]", duration)
+    
+    console.print(table)
@@ -0,0 +1,221 @@
+"""Job queue commands: enqueue, worker, status and cancel."""
+
+import asyncio
+import json
+import time
+from pathlib import Path
+
+import click
+from rich.console import Console
+from rich.table import Table
+
+from core import SubagentParser, get_default_subagents_dir
+from jobqueue import (CANCELLED, DEFAULT_LEASE_SECONDS, DEFAULT_MAX_ATTEMPTS, FAILED, JOB_STATUSES, QUEUED,
+                      RUNNING, SUCCEEDED, Job, JobQueue, JobWorker)
+from retry import RetryPolicy
+
+console = Console()
+
+STATUS_STYLES = {
+    QUEUED: "yellow",
+    RUNNING: "cyan",
+    SUCCEEDED: "green",
+    FAILED: "red",
+    CANCELLED: "dim",
+}
+
+_subagents_dir_option = click.option(
+    '--subagents-dir', '-d',
+    type=click.Path(exists=True, path_type=Path),
+    help='Path to subagents directory (default from COPILOT_SUBAGENTS_SUBAGENTS_DIR env var or .github/subagents)')
+
+@click.command()
+@click.argument('subagent_name')
+@click.option('--prompt', '-p', required=True,
+              help='The task for the subagent')
+@click.option('--context', '-c',
+              help='Additional context; @FILE streams a file into the prompt')
+@click.option('--priority', type=int, default=0, show_default=True,
+              help='Jobs with a higher priority are run first')
+@click.option('--max-attempts', type=click.IntRange(min=1), default=DEFAULT_MAX_ATTEMPTS, show_default=True,
+              help='Runs of the job before a transient failure or lost worker fails it')
+@click.option('--quiet', '-q', is_flag=True,
+              help='Print only the job ID')
+@_subagents_dir_option
+@click.pass_context
+def enqueue(ctx, subagent_name, prompt, context, priority, max_attempts, quiet, subagents_dir):
+    """Queue a SUBAGENT_NAME invocation for the workers to run."""
+    if subagents_dir is None:
+        subagents_dir = get_default_subagents_dir()
+    
+    if subagent_name not in SubagentParser(subagents_dir).list_subagents():
+        console.print(f"❌ Subagent '{subagent_name}' not found in {subagents_dir}", style="red")
+        ctx.exit(1)
+    if context and context.startswith('@') and not context.startswith('@@'):
+        # Workers may run in another directory
+        context_file = Path(context[1:]).expanduser()
+        if not context_file.is_file():
+            console.print(f"❌ Context file not found: {context_file}", style="red")
+            ctx.exit(1)
+        context = f"@{context_file.resolve()}"
+    
+    job_id = JobQueue.for_subagents_dir(subagents_dir).enqueue(subagent_name, prompt, context, priority,
+                                                               max_attempts)
+    if quiet:
+        click.echo(job_id)
+    else:
+        console.print(f"📥 Queued job {job_id} for {subagent_name} (priority {priority})", style="green")
+
+@click.command()
+@click.option('--concurrency', '-j', type=click.IntRange(min=1), default=1, show_default=True,
+              help='Maximum number of jobs running at the same time')
+@click.option('--drain', is_flag=True,
+              help='Exit once no job is ready instead of waiting for new ones')
+@click.option('--lease', type=click.FloatRange(min=1), default=DEFAULT_LEASE_SECONDS, show_default=True,
+              help='Seconds a job stays claimed without a heartbeat before another worker gets it')
+@click.option('--poll-interval', type=click.FloatRange(min=0.1), default=1.0, show_default=True,
+              help='Seconds between checks for new jobs while idle')
+@click.option('--verify-tools/--skip-verification', default=True,
+              help='Verify tools before execution (default: enabled)')
+@_subagents_dir_option
+@click.pass_context
+def worker(ctx, concurrency, drain, lease, poll_interval, verify_tools, subagents_dir):
+    """Run queued jobs, up to --concurrency at a time, until interrupted.
+    
+    Start as many workers as you like; each job is run by exactly one of them.
+    Jobs of a worker that crashes are run again once their lease expires.
+    """
+    if subagents_dir is None:
+        subagents_dir = get_default_subagents_dir()
+    
+    job_worker = JobWorker(JobQueue.for_subagents_dir(subagents_dir), subagents_dir, concurrency=concurrency,
+                           lease_seconds=lease, poll_interval=poll_interval, verify_tools=verify_tools,
+                           retry=RetryPolicy.from_config(), on_event=_print_job_event)
+    console.print(f"👷 Worker {job_worker.worker} running up to {concurrency} job(s)"
+                  f"{' until the queue is empty' if drain else '; press Ctrl-C to stop'}", style="cyan")
+    try:
+        counts = asyncio.run(job_worker.run(drain=drain))
+    except KeyboardInterrupt:
+        console.print("🛑 Worker stopped; its running jobs were returned to the queue", style="yellow")
+        ctx.exit(130)
+    
+    console.print(f"✅ {counts[SUCCEEDED]} succeeded, ❌ {counts[FAILED]} failed, "
+                  f"🚫 {counts[CANCELLED]} cancelled")
+    if counts[FAILED]:
+        ctx.exit(1)
+
+def _print_job_event(event: str, job: Job) -> None:
+    if event == 'started':
+        attempt = f" (attempt {job.attempts} of {job.max_attempts})" if job.attempts > 1 else ""
+        console.print(f"▶️  Job {job.id} ({job.agent}) started{attempt}", style="cyan")
+        return
+    style = STATUS_STYLES.get(event, "yellow")
+    message = f"Job {job.id} ({job.agent}): {event}"
+    if job.error:
+        message += f" - {job.error}"
+    if job.log:
+        message += f" (log: {job.log})"
+    console.print(message, style=style)
+
+@click.command()
+@click.argument('job_id', type=int, required=False)
+@click.option('--status', '-s', 'status_filter', type=click.Choice(JOB_STATUSES, case_sensitive=False),
+              help='Only show jobs with this status')
+@click.option('--limit', '-n', type=click.IntRange(min=1), default=50, show_default=True,
+              help='Show at most this many of the most recent jobs')
+@click.option('--json', 'as_json', is_flag=True,
+              help='Print jobs as JSON lines')
+@_subagents_dir_option
+@click.pass_context
+def status(ctx, job_id, status_filter, limit, as_json, subagents_dir):
+    """Show queued, running and finished jobs, or the details of JOB_ID."""
+    if subagents_dir is None:
+        subagents_dir = get_default_subagents_dir()
+    queue = JobQueue.for_subagents_dir(subagents_dir)
+    
+    if job_id is not None:
+        job = queue.get(job_id)
+        if job is None:
+            console.print(f"❌ No job {job_id}", style="red")
+            ctx.exit(1)
+        jobs = [job]
+    else:
+        jobs = queue.jobs(status_filter.upper() if status_filter else None, limit)
+    
+    if as_json:
+        for job in jobs:
+            click.echo(json.dumps(job.as_dict()))
+        return
+    
+    if job_id is not None:
+        _print_job(jobs[0])
+        return
+    
+    table = Table(title="Subagent Jobs", show_header=True, header_style="bold magenta")
+    table.add_column("Job", style="cyan", justify="right")
+    table.add_column("Subagent", style="blue")
+    table.add_column("Priority", justify="right")
+    table.add_column("Status")
+    table.add_column("Attempts", justify="right")
+    table.add_column("Age", justify="right")
+    table.add_column("Prompt", overflow="ellipsis", no_wrap=True, max_width=40)
+    now = time.time()
+    for job in jobs:
+        table.add_row(str(job.id), job.agent, str(job.priority),
+                      f"[{STATUS_STYLES[job.status]}]{job.status}[/{STATUS_STYLES[job.status]}]",
+                      f"{job.attempts}/{job.max_attempts}", _format_age(now - job.created), job.prompt)
+    console.print(table)
+    
+    counts = queue.counts()
+    console.print("  ".join(f"{name}: {counts[name]}" for name in JOB_STATUSES), style="dim")
+
+def _print_job(job: Job) -> None:
+    table = Table(title=f"Job {job.id}", show_header=True, header_style="bold magenta")
+    table.add_column("Property", style="cyan")
+    table.add_column("Value")
+    rows = [("Subagent", job.agent), ("Status", job.status), ("Priority", str(job.priority)),
+            ("Attempts", f"{job.attempts}/{job.max_attempts}"), ("Prompt", job.prompt),
+            ("Context", job.context), ("Worker", job.worker), ("Exit code", job.returncode),
+            ("Error", job.error), ("Log", job.log)]
+    if job.cancel_requested and job.status == RUNNING:
+        rows.append(("Cancel", "requested"))
+    for name, value in rows:
+        if value is not None:
+            table.add_row(name, str(value))
+    console.print(table)
+
+def _format_age(seconds: float) -> str:
+    if seconds < 60:
+        return f"{seconds:.0f}s"
+    if seconds < 3600:
+        return f"{seconds / 60:.0f}m"
+    return f"{seconds / 3600:.1f}h"
+
+@click.command()
+@click.argument('job_ids', type=int, nargs=-1, required=True)
+@_subagents_dir_option
+@click.pass_context
+def cancel(ctx, job_ids, subagents_dir):
+    """Cancel queued or running jobs by JOB_IDS.
+    
+    Queued jobs are cancelled at once. Running jobs are stopped by their worker
+    at its next heartbeat.
+    """
+    if subagents_dir is None:
+        subagents_dir = get_default_subagents_dir()
+    queue = JobQueue.for_subagents_dir(subagents_dir)
+    
+    missing = False
+    for job_id in job_ids:
+        result = queue.cancel(job_id)
+        if result is None:
+            console.print(f"❌ No job {job_id}", style="red")
+            missing = True
+        elif result == QUEUED:
+            console.print(f"🚫 Job {job_id} cancelled", style="green")
+        elif result == RUNNING:
+            console.print(f"⏹️  Job {job_id} is running; its worker will stop it", style="yellow")
+        else:
+            console.print(f"Job {job_id} already {result}", style="dim")
+    if missing:
+        ctx.exit(1)
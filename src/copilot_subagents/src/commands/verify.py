@@ -7,10 +7,13 @@ from rich.table import Table
 from rich.panel import Panel
 from rich.text import Text
 
-from core import SubagentParser, ToolVerifier, get_default_subagents_dir
+from core import SubagentParser, ToolVerifier, get_default_subagents_dir, get_supported_ai_tools
+from invocation import get_ai_tool
 
 console = Console()
 
+REPORT_FORMATS = ('table', 'json', 'jsonl', 'junit')
+
 @click.command()
 @click.argument('subagent_name')
 @click.option('--valid-tools-file', '-v', 
@@ -151,4 +154,150 @@ def verify_denied_tools(ctx, subagent_name, valid_tools_file, subagents_dir):
         ctx.exit(1)
     except Exception as e:
         console.print(f"❌ Unexpected error: {e}", style="red")
-        ctx.exit(1)
\ No newline at end of file
+        ctx.exit(1)
+
+@click.command()
+@click.argument('subagent_names', nargs=-1)
+@click.option('--all', 'verify_all', is_flag=True,
+              help='Verify every subagent in the registry')
+@click.option('--format', '-f', 'report_format',
+              type=click.Choice(REPORT_FORMATS), default='table', show_default=True,
+              help='Report format')
+@click.option('--output', '-o',
+              type=click.Path(dir_okay=False, path_type=Path),
+              help='Write the report to a file instead of stdout')
+@click.option('--ai-tool', '-t',
+              type=click.Choice(get_supported_ai_tools()),
+              help='AI tool whose tool catalog to verify against (default from COPILOT_SUBAGENTS_AI_TOOL or copilot-cli)')
+@click.option('--subagents-dir', '-d',
+              type=click.Path(exists=True, path_type=Path),
+              help='Path to subagents directory (default from COPILOT_SUBAGENTS_SUBAGENTS_DIR env var or .github/subagents)')
+@click.option('--workers', '-w',
+              type=click.IntRange(min=1),
+              help='Number of threads used to parse subagent files (default from COPILOT_SUBAGENTS_WORKERS env var)')
+@click.pass_context
+def verify(ctx, subagent_names, verify_all, report_format, output, ai_tool, subagents_dir, workers):
+    """Verify allowed and denied tools of several subagents in one pass.
+    
+    Exits with status 1 if any subagent fails to load or uses an invalid tool.
+    """
+    if not verify_all and not subagent_names:
+        console.print("❌ Error: pass subagent names or --all", style="red")
+        ctx.exit(1)
+    
+    try:
+        # Use provided directory or fall back to environment variable/default
+        if subagents_dir is None:
+            subagents_dir = get_default_subagents_dir()
+        parser = SubagentParser(subagents_dir)
+        verifier = ToolVerifier(get_ai_tool(parser.config, ai_tool), parser=parser)
+        
+        entries = parser.list_subagent_entries(workers=workers)
+        if verify_all:
+            results = verifier.verify_entries(entries)
+        else:
+            by_name = {entry.name: entry for entry in entries}
+            results = [verifier.verify_entry(by_name[name]) if name in by_name else
+                       _missing_result(name) for name in subagent_names]
+    except Exception as e:
+        console.print(f"❌ Unexpected error: {e}", style="red")
+        ctx.exit(1)
+    
+    if report_format == 'table':
+        report = None
+        _print_results_table(results, output)
+    else:
+        report = REPORT_RENDERERS[report_format](results)
+    
+    if report is not None:
+        if output:
+            output.write_text(report)
+        else:
+            click.echo(report, nl=False)
+    
+    if any(not result['success'] for result in results):
+        ctx.exit(1)
+
+def _missing_result(name: str) -> dict:
+    return {
+        'name': name,
+        'success': False,
+        'error': f"Subagent not found: {name}",
+        'allowed': {'valid': [], 'invalid': []},
+        'denied': {'valid': [], 'invalid': []},
+        'shadowed': []
+    }
+
+def _failure_message(result: dict) -> str:
+    """Single-line description of why a subagent failed verification."""
+    if result['error']:
+        return result['error']
+    messages = []
+    for key in ('allowed', 'denied'):
+        if result[key]['invalid']:
+            messages.append(f"Invalid {key} tools: {', '.join(result[key]['invalid'])}")
+    return '; '.join(messages)
+
+def _render_json(results: list) -> str:
+    import json
+    
+    failed = sum(1 for result in results if not result['success'])
+    report = {'total': len(results), 'failed': failed, 'results': results}
+    return json.dumps(report, indent=2) + '\n'
+
+def _render_jsonl(results: list) -> str:
+    import json
+    
+    return ''.join(json.dumps(result) + '\n' for result in results)
+
+def _render_junit(results: list) -> str:
+    from xml.etree import ElementTree
+    
+    failed = sum(1 for result in results if not result['success'])
+    suite = ElementTree.Element('testsuite', name='subagents.verify', tests=str(len(results)),
+                                failures=str(failed), errors='0')
+    for result in results:
+        case = ElementTree.SubElement(suite, 'testcase', classname='subagents', name=result['name'])
+        if not result['success']:
+            message = _failure_message(result)
+            failure = ElementTree.SubElement(case, 'failure', message=message)
+            failure.text = message
+    
+    return ElementTree.tostring(suite, encoding='unicode', xml_declaration=True) + '\n'
+
+REPORT_RENDERERS = {
+    'json': _render_json,
+    'jsonl': _render_jsonl,
+    'junit': _render_junit,
+}
+
+def _print_results_table(results: list, output) -> None:
+    """Render results as a rich table, to stdout or to a plain-text file."""
+    report_console = Console(file=output.open('w'), width=120) if output else console
+    
+    table = Table(title="Tool Verification", show_header=True, header_style="bold magenta")
+    table.add_column("Subagent", style="cyan")
+    table.add_column("Allowed", justify="right")
+    table.add_column("Denied", justify="right")
+    table.add_column("Status", style="bold")
+    table.add_column("Details", style="red")
+    
+    for result in results:
+        status = "[green]✅ Valid[/green]" if result['success'] else "[red]❌ Invalid[/red]"
+        allowed = result['allowed']['valid'] + result['allowed']['invalid']
+        denied = result['denied']['valid'] + result['denied']['invalid']
+        details = "" if result['success'] else _failure_message(result)
+        for pair in result['shadowed']:
+            details += f"\n[yellow]'{pair['allowed']}' is shadowed by deny '{pair['denied']}'[/yellow]"
+        table.add_row(result['name'], str(len(allowed)), str(len(denied)), status, details.strip())
+    
+    report_console.print(table)
+    
+    failed = sum(1 for result in results if not result['success'])
+    if failed:
+        report_console.print(f"⚠️  {failed} of {len(results)} subagent(s) failed verification", style="red")
+    else:
+        report_console.print(f"✅ All {len(results)} subagent(s) passed verification", style="green")
+    
+    if output:
+        report_console.file.close()
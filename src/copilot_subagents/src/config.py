@@ -0,0 +1,147 @@
+"""Resolved configuration for the subagents CLI."""
+
+import dataclasses
+import os
+from dataclasses import dataclass, field
+from pathlib import Path
+from types import MappingProxyType
+from typing import Any, Mapping, Optional
+
+ENV_PREFIX = 'COPILOT_SUBAGENTS_'
+DEFAULT_SUBAGENTS_DIR = '.github/subagents'
+
+def _empty_mapping() -> Mapping[str, str]:
+    return MappingProxyType({})
+
+@dataclass(frozen=True)
+class SubagentsConfig:
+    """Immutable snapshot of everything the CLI reads from env, ``.env`` and flags.
+    
+    Values from ``.env`` in the working directory take precedence over the
+    process environment, and CLI flags take precedence over both.
+    """
+    
+    cwd: Path
+    env: Mapping[str, str] = field(default_factory=_empty_mapping)
+    dotenv: Mapping[str, str] = field(default_factory=_empty_mapping)
+    subagents_dir: Optional[Path] = None
+    yolo_mode: bool = False
+    workers: int = 1
+    
+    def get(self, name: str, default: Optional[str] = None) -> Optional[str]:
+        """Get a ``COPILOT_SUBAGENTS_*`` setting by its name without the prefix."""
+        return self.env.get(f'{ENV_PREFIX}{name}', default)
+    
+    def get_int(self, name: str, default: int) -> int:
+        """Get a non-negative integer setting, falling back to ``default`` if unset or invalid."""
+        value = self.get(name)
+        if value and value.strip().isdigit():
+            return int(value)
+        return default
+    
+    def get_float(self, name: str, default: float) -> float:
+        """Get a non-negative number setting, falling back to ``default`` if unset or invalid."""
+        value = self.get(name)
+        try:
+            number = float(value) if value else default
+        except ValueError:
+            return default
+        return number if number >= 0 else default
+    
+    def get_bool(self, name: str, default: bool = False) -> bool:
+        """Get a boolean setting such as ``true``/``1``/``yes``/``on``."""
+        value = self.get(name)
+        return default if value is None else _parse_bool(value)
+    
+    def resolve_path(self, path: Any) -> Path:
+        """Resolve a path relative to the configured working directory."""
+        path = Path(path)
+        return path if path.is_absolute() else self.cwd / path
+    
+    def get_subagents_dir(self, ai_tool: str = "copilot-cli") -> Path:
+        """Get the subagents directory for an AI tool.
+        
+        Args:
+            ai_tool: The AI tool name to get the specific directory for
+            
+        Returns:
+            Path to the subagents directory for the specified AI tool
+        """
+        if self.subagents_dir is not None:
+            return self.subagents_dir
+        
+        # Get AI tool specific directory or fallback to general directory
+        ai_tool_setting = f'{ai_tool.upper().replace("-", "_")}_SUBAGENTS_DIR'
+        env_dir = self.get(ai_tool_setting) or self.get('SUBAGENTS_DIR', DEFAULT_SUBAGENTS_DIR)
+        return self.resolve_path(env_dir)
+    
+    def subprocess_env(self) -> Mapping[str, str]:
+        """Environment for backend processes: the process env plus ``.env`` values."""
+        return {**os.environ, **self.dotenv}
+    
+    def with_overrides(self, **overrides: Any) -> 'SubagentsConfig':
+        """Return a copy with CLI flag overrides applied (None values are ignored)."""
+        overrides = {key: value for key, value in overrides.items() if value is not None}
+        if 'subagents_dir' in overrides:
+            overrides['subagents_dir'] = self.resolve_path(overrides['subagents_dir'])
+        return dataclasses.replace(self, **overrides)
+
+def _parse_bool(value: Optional[str]) -> bool:
+    return (value or 'false').lower() in ('true', '1', 'yes', 'on')
+
+def _parse_workers(value: Optional[str]) -> int:
+    if value and value.isdigit() and int(value) > 0:
+        return int(value)
+    return min(32, (os.cpu_count() or 1) + 4)
+
+def resolve_config(cwd: Optional[Path] = None, **overrides: Any) -> SubagentsConfig:
+    """Resolve configuration from the environment, ``.env`` and CLI flag overrides.
+    
+    Unlike ``load_dotenv`` this does not modify ``os.environ``.
+    """
+    cwd = cwd or Path.cwd()
+    
+    dotenv_values: Mapping[str, str] = {}
+    env_file = cwd / '.env'
+    if env_file.exists():
+        from dotenv import dotenv_values as read_dotenv
+        dotenv_values = {key: value for key, value in read_dotenv(env_file).items()
+                         if value is not None}
+    
+    env = {key: value for key, value in os.environ.items() if key.startswith(ENV_PREFIX)}
+    env.update((key, value) for key, value in dotenv_values.items() if key.startswith(ENV_PREFIX))
+    
+    config = SubagentsConfig(
+        cwd=cwd,
+        env=MappingProxyType(env),
+        dotenv=MappingProxyType(dict(dotenv_values)),
+        yolo_mode=_parse_bool(env.get(f'{ENV_PREFIX}YOLO_MODE')),
+        workers=_parse_workers(env.get(f'{ENV_PREFIX}WORKERS')),
+    )
+    return config.with_overrides(**overrides)
+
+# Process-wide configuration and the CLI overrides it was resolved with
+_CONFIG: Optional[SubagentsConfig] = None
+_OVERRIDES: Mapping[str, Any] = {}
+
+def get_config() -> SubagentsConfig:
+    """Get the process-wide configuration, resolving it on first use."""
+    global _CONFIG
+    if _CONFIG is None:
+        _CONFIG = resolve_config(**_OVERRIDES)
+    return _CONFIG
+
+def configure(**overrides: Any) -> SubagentsConfig:
+    """Resolve the process-wide configuration with CLI flag overrides."""
+    global _CONFIG, _OVERRIDES
+    _OVERRIDES = dict(overrides)
+    _CONFIG = resolve_config(**_OVERRIDES)
+    return _CONFIG
+
+def reload_config() -> SubagentsConfig:
+    """Re-read the environment and ``.env``, keeping CLI flag overrides.
+    
+    Long-running processes such as the daemon call this when settings may
+    have changed since the configuration was first resolved.
+    """
+    return configure(**_OVERRIDES)
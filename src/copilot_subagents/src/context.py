@@ -0,0 +1,235 @@
+"""Assemble subagent context from files under a size budget.
+
+Files named explicitly or matched by globs are read through ``mmap`` so large
+files are never copied into Python memory as a whole. Binary files, files over
+the per-file limit and files whose content was already included are skipped.
+The rest are written in order, each wrapped in a ``<file path="...">`` block,
+until the byte budget is used up: the file that crosses the budget is cut at a
+line boundary and any later files are dropped. The same inputs therefore always
+produce the same context.
+"""
+
+import glob
+import hashlib
+import mmap
+import os
+import tempfile
+from pathlib import Path
+from typing import IO, Dict, Iterable, List, NamedTuple, Optional, Sequence
+
+from config import SubagentsConfig, get_config
+
+# Total size of the assembled context
+DEFAULT_CONTEXT_MAX_BYTES = 256 * 1024
+# Files larger than this are skipped rather than truncated
+DEFAULT_CONTEXT_MAX_FILE_BYTES = 1024 * 1024
+# Rough bytes per token, used to turn a token budget into a byte budget
+BYTES_PER_TOKEN = 4
+# A NUL byte in the first bytes of a file marks it as binary, as in git
+BINARY_SNIFF_BYTES = 8192
+# A file is only truncated if at least this much of it still fits
+MIN_TRUNCATED_BYTES = 256
+
+INCLUDED = 'included'
+TRUNCATED = 'truncated'
+SKIPPED = 'skipped'
+DROPPED = 'dropped'
+
+class ContextEntry(NamedTuple):
+    """What happened to one context file."""
+    
+    path: Path
+    size: int
+    # 'included', 'truncated', 'skipped' or 'dropped' (over budget)
+    status: str
+    detail: str = ''
+    # Bytes of the file written to the context
+    written: int = 0
+
+class ContextReport:
+    """Per-run statistics of an assembled context."""
+    
+    def __init__(self, path: Optional[Path], entries: List[ContextEntry], total_bytes: int, max_bytes: int):
+        self.path = path
+        self.entries = entries
+        self.total_bytes = total_bytes
+        self.max_bytes = max_bytes
+    
+    @property
+    def estimated_tokens(self) -> int:
+        return (self.total_bytes + BYTES_PER_TOKEN - 1) // BYTES_PER_TOKEN
+    
+    def count(self, status: str) -> int:
+        return sum(1 for entry in self.entries if entry.status == status)
+    
+    def summary(self) -> str:
+        """One-line summary, e.g. for the console."""
+        return (f"{self.count(INCLUDED)} included, {self.count(TRUNCATED)} truncated, "
+                f"{self.count(SKIPPED)} skipped, {self.count(DROPPED)} dropped - "
+                f"{self.total_bytes:,} of {self.max_bytes:,} bytes (~{self.estimated_tokens:,} tokens)")
+
+def get_context_budget(max_bytes: Optional[int] = None, max_tokens: Optional[int] = None,
+                       config: Optional[SubagentsConfig] = None) -> int:
+    """Byte budget of the context: the smaller of the byte and token limits.
+    
+    ``max_bytes`` defaults to ``COPILOT_SUBAGENTS_CONTEXT_MAX_BYTES`` when no
+    limit is given.
+    """
+    config = config or get_config()
+    if max_bytes is None:
+        max_bytes = config.get_int('CONTEXT_MAX_BYTES', DEFAULT_CONTEXT_MAX_BYTES)
+    if max_tokens is not None:
+        max_bytes = min(max_bytes, max_tokens * BYTES_PER_TOKEN)
+    return max(max_bytes, 0)
+
+def expand_context_paths(files: Iterable[Path] = (), patterns: Iterable[str] = ()) -> List[Path]:
+    """Explicit files in the given order, then glob matches in sorted order, without repeats.
+    
+    Patterns support ``**`` for recursive matches; directories are ignored.
+    """
+    paths: List[Path] = []
+    seen = set()
+    candidates = [Path(path) for path in files]
+    for pattern in patterns:
+        candidates.extend(Path(match) for match in sorted(glob.glob(os.path.expanduser(pattern), recursive=True)))
+    
+    for path in candidates:
+        if path.is_dir():
+            continue
+        key = os.path.realpath(path)
+        if key not in seen:
+            seen.add(key)
+            paths.append(path)
+    return paths
+
+def _truncation_point(data: mmap.mmap, limit: int) -> int:
+    """Largest cut at or below ``limit`` that ends a line, or else a UTF-8 character."""
+    newline = data.rfind(b'\n', 0, limit)
+    if newline != -1:
+        return newline + 1
+    cut = limit
+    # Do not split a multi-byte character: back off over continuation bytes
+    while cut > 0 and data[cut] & 0xC0 == 0x80:
+        cut -= 1
+    return cut
+
+def write_context(output: IO[bytes], paths: Sequence[Path], max_bytes: int,
+                  max_file_bytes: int = DEFAULT_CONTEXT_MAX_FILE_BYTES) -> ContextReport:
+    """Write the context blocks of ``paths`` to a binary stream.
+    
+    Args:
+        output: Stream the context is written to
+        paths: Files in the order they should appear
+        max_bytes: Budget for everything written, including block headers
+        max_file_bytes: Files larger than this are skipped
+        
+    Returns:
+        Statistics of what was included, truncated, skipped and dropped
+    """
+    entries: List[ContextEntry] = []
+    digests: Dict[str, Path] = {}
+    total = 0
+    exhausted = False
+    
+    for path in paths:
+        if exhausted:
+            entries.append(ContextEntry(path, 0, DROPPED, 'over budget'))
+            continue
+        try:
+            with open(path, 'rb') as source:
+                size = os.fstat(source.fileno()).st_size
+                if size == 0:
+                    entries.append(ContextEntry(path, 0, SKIPPED, 'empty'))
+                    continue
+                if size > max_file_bytes:
+                    entries.append(ContextEntry(path, size, SKIPPED, f"larger than {max_file_bytes:,} bytes"))
+                    continue
+                with mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                    entry = _write_file(output, path, data, max_bytes - total, digests)
+        except OSError as e:
+            entries.append(ContextEntry(path, 0, SKIPPED, f"unreadable: {e.strerror or e}"))
+            continue
+        
+        entries.append(entry)
+        if entry.status in (INCLUDED, TRUNCATED):
+            total += entry.written
+        # Later files are dropped even if they would fit, so the cut is predictable
+        exhausted = entry.status in (TRUNCATED, DROPPED)
+    
+    return ContextReport(None, entries, total, max_bytes)
+
+def _write_file(output: IO[bytes], path: Path, data: mmap.mmap, remaining: int,
+                digests: Dict[str, Path]) -> ContextEntry:
+    size = len(data)
+    if data.find(b'\0', 0, BINARY_SNIFF_BYTES) != -1:
+        return ContextEntry(path, size, SKIPPED, 'binary')
+    
+    digest = hashlib.sha256(data).hexdigest()
+    if digest in digests:
+        return ContextEntry(path, size, SKIPPED, f"duplicate of {digests[digest]}")
+    
+    header = f'<file path="{path}">\n'.encode('utf-8')
+    newline = b'' if data[size - 1:] == b'\n' else b'\n'
+    footer = b'</file>\n\n'
+    overhead = len(header) + len(footer)
+    
+    if overhead + size + len(newline) <= remaining:
+        cut, marker = size, newline
+        status, detail = INCLUDED, ''
+    else:
+        marker_text = "\n[... truncated {} bytes]\n"
+        # Reserve room for the longest marker this file can need
+        limit = remaining - overhead - len(marker_text.format(size).encode('utf-8'))
+        if limit < MIN_TRUNCATED_BYTES:
+            return ContextEntry(path, size, DROPPED, 'over budget')
+        cut = _truncation_point(data, limit)
+        marker = marker_text.format(size - cut).encode('utf-8')
+        if cut and data[cut - 1:cut] == b'\n':
+            marker = marker[1:]
+        status, detail = TRUNCATED, f"kept {cut:,} of {size:,} bytes"
+    
+    digests[digest] = path
+    output.write(header)
+    with memoryview(data) as view:
+        output.write(view[:cut])
+    output.write(marker)
+    output.write(footer)
+    return ContextEntry(path, size, status, detail, overhead + cut + len(marker))
+
+def assemble_context(paths: Sequence[Path], directory: Path, max_bytes: int,
+                     max_file_bytes: Optional[int] = None, preamble: Optional[str] = None,
+                     config: Optional[SubagentsConfig] = None) -> ContextReport:
+    """Write the context of ``paths`` to a new file in ``directory``.
+    
+    Args:
+        paths: Files in the order they should appear, e.g. from :func:`expand_context_paths`
+        directory: Directory the context file is created in
+        max_bytes: Budget of the whole context, see :func:`get_context_budget`
+        max_file_bytes: Files larger than this are skipped (default from
+            ``COPILOT_SUBAGENTS_CONTEXT_MAX_FILE_BYTES``)
+        preamble: Free-text context written before the files; it counts against the budget
+        config: Configuration to read defaults from
+        
+    Returns:
+        Statistics of the context; ``path`` is the file to delete when done
+        
+    Raises:
+        OSError: If the context file cannot be written
+    """
+    if max_file_bytes is None:
+        max_file_bytes = (config or get_config()).get_int('CONTEXT_MAX_FILE_BYTES', DEFAULT_CONTEXT_MAX_FILE_BYTES)
+    
+    directory.mkdir(parents=True, exist_ok=True)
+    fd, path = tempfile.mkstemp(dir=directory, prefix='context-', suffix='.md')
+    try:
+        with os.fdopen(fd, 'wb') as output:
+            written = 0
+            if preamble:
+                data = preamble.encode('utf-8') + b'\n\n'
+                output.write(data)
+                written = len(data)
+            report = write_context(output, paths, max(max_bytes - written, 0), max_file_bytes)
+    except BaseException:
+        os.unlink(path)
+        raise
+    return ContextReport(Path(path), report.entries, report.total_bytes + written, max_bytes)
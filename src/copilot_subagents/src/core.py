@@ -1,20 +1,20 @@
 """Core utilities for parsing subagent files and managing tools."""
 
-import os
 import re
-import yaml
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Tuple
-from rich.console import Console
-from dotenv import load_dotenv
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
 
-# Load environment variables from .env file in current working directory
-load_dotenv()
+from config import SubagentsConfig, get_config
+from limits import ResourceLimits
+from tools import (ToolCatalog, ToolMatcher, ToolPolicy, compile_tools, get_catalog_names,
+                   load_tool_catalog)
+from tracing import span
 
-console = Console()
+if TYPE_CHECKING:
+    from registry import IndexEntry
 
 def get_default_subagents_dir(ai_tool: str = "copilot-cli") -> Path:
-    """Get the default subagents directory from environment variables or fallback.
+    """Get the default subagents directory from the resolved configuration.
     
     Args:
         ai_tool: The AI tool name to get the specific directory for
@@ -22,39 +22,29 @@ def get_default_subagents_dir(ai_tool: str = "copilot-cli") -> Path:
     Returns:
         Path to the subagents directory for the specified AI tool
     """
-    # Look for .env file starting from current working directory
-    current_dir = Path.cwd()
-    env_file = current_dir / '.env'
-    
-    # Load .env from current working directory if it exists
-    if env_file.exists():
-        load_dotenv(dotenv_path=env_file, override=True)
-    
-    # Get AI tool specific directory or fallback to general directory
-    ai_tool_env_var = f'COPILOT_SUBAGENTS_{ai_tool.upper().replace("-", "_")}_SUBAGENTS_DIR'
-    general_env_var = 'COPILOT_SUBAGENTS_SUBAGENTS_DIR'
-    
-    env_dir = os.getenv(ai_tool_env_var) or os.getenv(general_env_var, '.github/subagents')
-    
-    # If the path is relative, make it relative to current working directory
-    subagents_path = Path(env_dir)
-    if not subagents_path.is_absolute():
-        subagents_path = current_dir / subagents_path
-    
-    return subagents_path
+    return get_config().get_subagents_dir(ai_tool)
 
 def get_yolo_mode() -> bool:
-    """Check if YOLO mode is enabled from environment variables."""
-    # Look for .env file starting from current working directory
-    current_dir = Path.cwd()
-    env_file = current_dir / '.env'
-    
-    # Load .env from current working directory if it exists
-    if env_file.exists():
-        load_dotenv(dotenv_path=env_file, override=True)
+    """Check if YOLO mode is enabled in the resolved configuration."""
+    return get_config().yolo_mode
+
+def get_discovery_workers() -> int:
+    """Get the number of threads used to discover and parse subagent files."""
+    return get_config().workers
+
+# Name of the git-ignored directory holding plans, indexes and caches
+STATE_DIRNAME = 'state'
+
+def get_state_dir(subagents_dir: Path) -> Path:
+    """Get the state directory used for plans, indexes and caches.
     
-    yolo_mode = os.getenv('COPILOT_SUBAGENTS_YOLO_MODE', 'false').lower()
-    return yolo_mode in ('true', '1', 'yes', 'on')
+    Args:
+        subagents_dir: The subagents directory the state belongs to
+        
+    Returns:
+        Path to the (git-ignored) state directory inside the subagents directory
+    """
+    return subagents_dir / STATE_DIRNAME
 
 def get_valid_tools_for_ai_tool(ai_tool: str) -> List[str]:
     """Get the list of valid tools for a given AI tool.
@@ -69,20 +59,284 @@ def get_valid_tools_for_ai_tool(ai_tool: str) -> List[str]:
     return verifier.get_valid_tools()
 
 def get_supported_ai_tools() -> List[str]:
-    """Get list of supported AI tools."""
-    return ['copilot-cli', 'claude-code', 'codex', 'gemini-cli']
+    """Get list of supported AI tools (those with a packaged tool catalog)."""
+    return get_catalog_names()
+
+class ParsedSubagent:
+    """Parsed representation of a single subagent file.
+    
+    Records are shared between every accessor on ``SubagentParser`` and every
+    ``ToolVerifier`` so that a subagent is read and YAML-parsed once per process.
+    Only the frontmatter is read up front; the prompt body is loaded on first access.
+    """
+    
+    __slots__ = ('path', 'name', 'frontmatter', 'body_offset', 'mtime_ns', 'size', '_prompt')
+    
+    def __init__(self, path: Path, frontmatter: Dict, body_offset: int, mtime_ns: int, size: int):
+        self.path = path
+        self.name = frontmatter.get('name', path.stem)
+        self.frontmatter = frontmatter
+        self.body_offset = body_offset
+        self.mtime_ns = mtime_ns
+        self.size = size
+        self._prompt: Optional[str] = None
+    
+    @property
+    def allowed_tools(self) -> List[str]:
+        return self.frontmatter.get('allowed_tools', [])
+    
+    @property
+    def denied_tools(self) -> List[str]:
+        return self.frontmatter.get('deny_tools', [])
+    
+    @property
+    def limits(self) -> ResourceLimits:
+        """Timeout and resource limits from the frontmatter.
+        
+        Raises:
+            ValueError: If a limit is not a positive number
+        """
+        return ResourceLimits.from_frontmatter(self.frontmatter)
+    
+    @property
+    def prompt(self) -> str:
+        """The prompt body, read from disk the first time it is needed."""
+        if self._prompt is None:
+            stat = self.path.stat()
+            if stat.st_mtime_ns != self.mtime_ns or stat.st_size != self.size:
+                # The file changed since the header was read; re-read it as a whole
+                return load_subagent_file(self.path).prompt
+            
+            with span('load', path=str(self.path), part='body'), self.path.open('rb') as subagent_file:
+                subagent_file.seek(self.body_offset)
+                self._prompt = subagent_file.read().decode().strip()
+        return self._prompt
+    
+    def as_dict(self) -> Dict[str, Any]:
+        """Structure the record as expected by ToolVerifier and the invoke command."""
+        return {
+            'name': self.name,
+            'description': self.frontmatter.get('description', ''),
+            'version': self.frontmatter.get('version', '1.0.0'),
+            'model': self.frontmatter.get('model', ''),  # Optional model specification
+            'tools': {
+                'allowed': self.allowed_tools,
+                'denied': self.denied_tools
+            },
+            'limits': self.limits.as_dict(),
+            'prompt': self.prompt
+        }
+
+# Parsed subagents keyed by file path, validated against the file's mtime and size
+_SUBAGENT_CACHE: Dict[str, ParsedSubagent] = {}
+
+def read_frontmatter_block(subagent_path: Path) -> Tuple[bytes, int]:
+    """Stream the YAML frontmatter block of a subagent file.
+    
+    Reading stops at the closing ``---`` line, so the cost depends on the size
+    of the header rather than the size of the prompt body.
+    
+    Args:
+        subagent_path: Path to the subagent markdown file
+        
+    Returns:
+        Tuple of (frontmatter_bytes, body_offset)
+        
+    Raises:
+        ValueError: If no YAML frontmatter block is found
+    """
+    with subagent_path.open('rb') as subagent_file:
+        if subagent_file.readline().rstrip(b'\r\n') == b'---':
+            header_lines = []
+            for line in iter(subagent_file.readline, b''):
+                if line.rstrip(b'\r\n') == b'---':
+                    return b''.join(header_lines), subagent_file.tell()
+                header_lines.append(line)
+    
+    raise ValueError(f"No YAML frontmatter found in {subagent_path}")
+
+_FLAT_KEY = re.compile(r'^([A-Za-z_][A-Za-z0-9_-]*):(?:[ \t]+(.*))?$')
+_DOUBLE_QUOTED = re.compile(r'^"([^"\\]*)"$')
+_SINGLE_QUOTED = re.compile(r"^'((?:[^']|'')*)'$")
+_PLAIN_SCALAR = re.compile(r'^[A-Za-z][^#]*$')
+_BLOCK_ITEM = re.compile(r'^([ \t]*)- (.+)$')
+_PLAIN_INT = re.compile(r'^(?:0|[1-9][0-9]*)$')
+_FLOW_ITEM = re.compile(r"""\s*("[^"\\]*"|'(?:[^']|'')*'|[A-Za-z][^,\[\]{}#]*?)\s*(?:,|$)""")
+_YAML_KEYWORDS = frozenset(['y', 'n', 'yes', 'no', 'true', 'false', 'on', 'off', 'null'])
+
+_NOT_FLAT = object()
+
+def _decode_flat_scalar(value: str, in_flow: bool = False) -> Any:
+    """Decode a quoted or plain scalar, or return ``_NOT_FLAT`` if YAML is needed."""
+    match = _DOUBLE_QUOTED.match(value)
+    if match:
+        return match.group(1)
+    match = _SINGLE_QUOTED.match(value)
+    if match:
+        return match.group(1).replace("''", "'")
+    if not in_flow and _PLAIN_INT.match(value):
+        return int(value)
+    if (_PLAIN_SCALAR.match(value) and ': ' not in value and not value.endswith(':')
+            and not (in_flow and ':' in value) and value.lower() not in _YAML_KEYWORDS):
+        return value
+    return _NOT_FLAT
+
+def _decode_flat_frontmatter(text: str) -> Optional[Dict[str, Any]]:
+    """Decode the common flat frontmatter shape without a YAML parser.
+    
+    Handles top-level ``key: value`` lines whose values are quoted strings,
+    simple plain strings, integers or flow/block lists of strings, which covers the
+    usual ``name``/``description``/``model``/``allowed_tools``/``deny_tools``
+    headers. Returns None for anything else so the caller falls back to YAML.
+    """
+    frontmatter: Dict[str, Any] = {}
+    block_key: Optional[str] = None
+    block_indent: Optional[str] = None
+    for line in text.splitlines():
+        line = line.rstrip()
+        if not line or line.startswith('#'):
+            continue
+        
+        item_match = _BLOCK_ITEM.match(line)
+        if item_match:
+            # Item of a block sequence opened by a bare ``key:`` line
+            if block_key is None or block_indent not in (None, item_match.group(1)):
+                return None
+            item = _decode_flat_scalar(item_match.group(2), in_flow=True)
+            if item is _NOT_FLAT:
+                return None
+            block_indent = item_match.group(1)
+            if frontmatter[block_key] is None:
+                frontmatter[block_key] = []
+            frontmatter[block_key].append(item)
+            continue
+        
+        match = _FLAT_KEY.match(line)
+        if not match or match.group(1).lower() in _YAML_KEYWORDS:
+            return None
+        key, value = match.group(1), match.group(2)
+        block_key, block_indent = None, None
+        
+        if value is None:
+            block_key = key
+            frontmatter[key] = None
+        elif value.startswith('['):
+            if not value.endswith(']'):
+                return None
+            inner = value[1:-1].strip()
+            items: List[Any] = []
+            position = 0
+            while position < len(inner):
+                flow_match = _FLOW_ITEM.match(inner, position)
+                if not flow_match or flow_match.end() == position:
+                    return None
+                item = _decode_flat_scalar(flow_match.group(1), in_flow=True)
+                if item is _NOT_FLAT:
+                    return None
+                items.append(item)
+                position = flow_match.end()
+            frontmatter[key] = items
+        else:
+            decoded = _decode_flat_scalar(value)
+            if decoded is _NOT_FLAT:
+                return None
+            frontmatter[key] = decoded
+    
+    return frontmatter
+
+def parse_frontmatter(frontmatter_yaml: bytes, subagent_path: Path) -> Dict:
+    """Parse a frontmatter block read by ``read_frontmatter_block``.
+    
+    Flat headers are decoded directly; anything else goes through the YAML
+    parser, using the libyaml C loader when it is installed.
+    
+    Raises:
+        ValueError: If YAML frontmatter is invalid
+    """
+    try:
+        frontmatter_text = frontmatter_yaml.decode()
+    except UnicodeDecodeError as e:
+        raise ValueError(f"Invalid YAML frontmatter in {subagent_path}: {e}")
+    
+    frontmatter = _decode_flat_frontmatter(frontmatter_text)
+    if frontmatter is None:
+        # Deferred so flat headers never pay for importing yaml
+        import yaml
+        
+        # libyaml's C loader is much faster than the pure-Python SafeLoader when available
+        loader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+        try:
+            frontmatter = yaml.load(frontmatter_text, Loader=loader)
+        except yaml.YAMLError as e:
+            raise ValueError(f"Invalid YAML frontmatter in {subagent_path}: {e}")
+    
+    if frontmatter is None:
+        return {}
+    if not isinstance(frontmatter, dict):
+        raise ValueError(f"Invalid YAML frontmatter in {subagent_path}: expected a mapping")
+    return frontmatter
+
+def load_subagent_file(subagent_path: Path) -> ParsedSubagent:
+    """Load a subagent file, reusing the cached record while the file is unchanged.
+    
+    Args:
+        subagent_path: Path to the subagent markdown file
+        
+    Returns:
+        ParsedSubagent record for the file
+        
+    Raises:
+        FileNotFoundError: If subagent file doesn't exist
+        ValueError: If YAML frontmatter is invalid
+    """
+    try:
+        stat = subagent_path.stat()
+    except FileNotFoundError:
+        raise FileNotFoundError(f"Subagent file not found: {subagent_path}")
+    
+    cache_key = str(subagent_path)
+    cached = _SUBAGENT_CACHE.get(cache_key)
+    if cached is not None and cached.mtime_ns == stat.st_mtime_ns and cached.size == stat.st_size:
+        return cached
+    
+    with span('load', path=cache_key):
+        frontmatter_yaml, body_offset = read_frontmatter_block(subagent_path)
+    with span('parse', bytes=len(frontmatter_yaml)):
+        frontmatter = parse_frontmatter(frontmatter_yaml, subagent_path)
+    
+    record = ParsedSubagent(subagent_path, frontmatter, body_offset,
+                            stat.st_mtime_ns, stat.st_size)
+    _SUBAGENT_CACHE[cache_key] = record
+    return record
+
+def clear_subagent_cache() -> None:
+    """Drop all cached subagent records."""
+    _SUBAGENT_CACHE.clear()
 
 class SubagentParser:
     """Parse subagent markdown files with YAML frontmatter."""
     
-    def __init__(self, subagents_dir: Optional[Path] = None, ai_tool: str = "copilot-cli"):
+    def __init__(self, subagents_dir: Optional[Path] = None, ai_tool: str = "copilot-cli",
+                 config: Optional[SubagentsConfig] = None):
         self.ai_tool = ai_tool
+        self.config = config or get_config()
         if subagents_dir:
             self.subagents_dir = subagents_dir
         else:
-            verifier = get_ai_tool_verifier(ai_tool)
+            verifier = get_ai_tool_verifier(ai_tool, self.config)
             self.subagents_dir = verifier.get_default_subagents_dir()
     
+    def load_subagent(self, subagent_name: str) -> ParsedSubagent:
+        """Load the cached parsed record for a subagent.
+        
+        Args:
+            subagent_name: Name of the subagent (without .md extension)
+            
+        Returns:
+            ParsedSubagent record shared with other parsers and verifiers
+        """
+        return load_subagent_file(self.subagents_dir / f"{subagent_name}.md")
+    
     def parse_subagent_file(self, subagent_name: str) -> Tuple[Dict, str]:
         """Parse a subagent file and return frontmatter and content.
         
@@ -96,43 +350,35 @@ class SubagentParser:
             FileNotFoundError: If subagent file doesn't exist
             ValueError: If YAML frontmatter is invalid
         """
-        subagent_path = self.subagents_dir / f"{subagent_name}.md"
-        
-        if not subagent_path.exists():
-            raise FileNotFoundError(f"Subagent file not found: {subagent_path}")
-        
-        content = subagent_path.read_text()
-        
-        # Extract YAML frontmatter
-        frontmatter_match = re.match(r'^---\n(.*?)\n---\n(.*)', content, re.DOTALL)
-        
-        if not frontmatter_match:
-            raise ValueError(f"No YAML frontmatter found in {subagent_path}")
-        
-        frontmatter_yaml = frontmatter_match.group(1)
-        content_body = frontmatter_match.group(2)
-        
-        try:
-            frontmatter = yaml.safe_load(frontmatter_yaml)
-        except yaml.YAMLError as e:
-            raise ValueError(f"Invalid YAML frontmatter in {subagent_path}: {e}")
-        
-        return frontmatter, content_body.strip()
+        record = self.load_subagent(subagent_name)
+        return record.frontmatter, record.prompt
     
     def get_allowed_tools(self, subagent_name: str) -> List[str]:
         """Extract allowed tools from subagent file."""
-        frontmatter, _ = self.parse_subagent_file(subagent_name)
-        return frontmatter.get('allowed_tools', [])
+        return self.load_subagent(subagent_name).allowed_tools
     
     def get_denied_tools(self, subagent_name: str) -> List[str]:
         """Extract denied tools from subagent file."""
-        frontmatter, _ = self.parse_subagent_file(subagent_name)
-        return frontmatter.get('deny_tools', [])
+        return self.load_subagent(subagent_name).denied_tools
     
     def get_subagent_prompt(self, subagent_name: str) -> str:
         """Extract the main content (prompt) from subagent file."""
-        _, content = self.parse_subagent_file(subagent_name)
-        return content
+        return self.load_subagent(subagent_name).prompt
+    
+    def load_file(self, subagent_path: str) -> ParsedSubagent:
+        """Load the cached parsed record for a subagent file path.
+        
+        Args:
+            subagent_path: Path to the subagent file
+            
+        Returns:
+            ParsedSubagent record shared with other parsers and verifiers
+        """
+        path_obj = Path(subagent_path)
+        if path_obj.is_file():
+            return load_subagent_file(path_obj)
+        # Fall back to resolving the name inside this parser's directory
+        return self.load_subagent(path_obj.stem)
     
     def parse_file(self, subagent_path: str) -> Dict[str, Any]:
         """Parse a subagent file and return structured data.
@@ -143,48 +389,51 @@ class SubagentParser:
         Returns:
             Dict with structured subagent data
         """
-        # Convert path to Path object and get relative name
-        path_obj = Path(subagent_path)
-        subagent_name = path_obj.stem  # Get filename without extension
+        return self.load_file(subagent_path).as_dict()
+    
+    def list_subagent_entries(self, workers: Optional[int] = None) -> List['IndexEntry']:
+        """List registry index entries for all available subagents.
         
-        frontmatter, content = self.parse_subagent_file(subagent_name)
+        Subagents in nested folders are named by relative path (``team/agent``).
+        Only files that changed since the index was last written are re-parsed.
         
-        # Structure the data as expected by ToolVerifier
-        return {
-            'name': frontmatter.get('name', subagent_name),
-            'description': frontmatter.get('description', ''),
-            'version': frontmatter.get('version', '1.0.0'),
-            'model': frontmatter.get('model', ''),  # Optional model specification
-            'tools': {
-                'allowed': frontmatter.get('allowed_tools', []),
-                'denied': frontmatter.get('deny_tools', [])
-            },
-            'prompt': content
-        }
+        Args:
+            workers: Number of discovery threads (default from COPILOT_SUBAGENTS_WORKERS)
+        """
+        from registry import SubagentIndex
+        return SubagentIndex(self.subagents_dir, workers=workers).refresh()
     
     def list_subagents(self) -> List[str]:
         """List all available subagent files."""
         if not self.subagents_dir.exists():
             return []
         
-        subagents = []
-        for file_path in self.subagents_dir.glob("*.md"):
-            if file_path.name != "README.md":
-                subagents.append(file_path.stem)
-        
-        return sorted(subagents)
+        return [entry.name for entry in self.list_subagent_entries()]
 
 class ToolVerifier:
     """Verifies if tools are allowed or denied based on configuration."""
     
-    def __init__(self, ai_tool: str = "copilot-cli"):
+    def __init__(self, ai_tool: str = "copilot-cli", parser: Optional[SubagentParser] = None,
+                 config: Optional[SubagentsConfig] = None):
         """Initialize ToolVerifier with AI tool configuration.
         
         Args:
             ai_tool: The AI tool to use (default: copilot-cli)
+            parser: Parser used to load subagents (default: created on first use)
+            config: Resolved configuration (default: the parser's or the process-wide one)
         """
         self.ai_tool = ai_tool
-        self.ai_verifier = get_ai_tool_verifier(ai_tool)
+        self.config = config or (parser.config if parser is not None else get_config())
+        self.ai_verifier = get_ai_tool_verifier(ai_tool, self.config)
+        self._parser = parser
+        self._tool_matcher: Optional[ToolMatcher] = None
+    
+    @property
+    def parser(self) -> SubagentParser:
+        """Parser shared by every verification made with this verifier."""
+        if self._parser is None:
+            self._parser = SubagentParser(ai_tool=self.ai_tool, config=self.config)
+        return self._parser
     
     def verify_allowed_tools(self, subagent_path: str) -> Dict[str, Any]:
         """Verify that only allowed tools are specified in the subagent.
@@ -195,29 +444,24 @@ class ToolVerifier:
         Returns:
             Dict with verification results
         """
-        parser = SubagentParser(ai_tool=self.ai_tool)
-        subagent = parser.parse_file(subagent_path)
+        subagent = self.parser.load_file(subagent_path)
         
-        if not subagent['tools']['allowed']:
+        if not subagent.allowed_tools:
             return {
                 'success': True,
                 'message': 'No allowed tools specified',
                 'invalid_tools': [],
                 'valid_tools': [],
-                'cli_flags': ''
+                'cli_flags': []
             }
         
-        valid_tools = self.ai_verifier.get_valid_tools()
-        allowed_tools = subagent['tools']['allowed']
-        
         # Check which tools are invalid
-        invalid_tools = [tool for tool in allowed_tools if tool not in valid_tools]
-        valid_allowed_tools = [tool for tool in allowed_tools if tool in valid_tools]
+        valid_allowed_tools, invalid_tools = self.verify_tools(subagent.allowed_tools)
         
         success = len(invalid_tools) == 0
         
         # Generate CLI flags for valid tools
-        cli_flags = ""
+        cli_flags = []
         if valid_allowed_tools:
             cli_flags = self.ai_verifier.format_tools(valid_allowed_tools, "allow")
         
@@ -238,29 +482,24 @@ class ToolVerifier:
         Returns:
             Dict with verification results
         """
-        parser = SubagentParser(ai_tool=self.ai_tool)
-        subagent = parser.parse_file(subagent_path)
+        subagent = self.parser.load_file(subagent_path)
         
-        if not subagent['tools']['denied']:
+        if not subagent.denied_tools:
             return {
                 'success': True,
                 'message': 'No denied tools specified',
                 'invalid_tools': [],
                 'valid_tools': [],
-                'cli_flags': ''
+                'cli_flags': []
             }
         
-        valid_tools = self.ai_verifier.get_valid_tools()
-        denied_tools = subagent['tools']['denied']
-        
         # Check which tools are invalid
-        invalid_tools = [tool for tool in denied_tools if tool not in valid_tools]
-        valid_denied_tools = [tool for tool in denied_tools if tool in valid_tools]
+        valid_denied_tools, invalid_tools = self.verify_tools(subagent.denied_tools)
         
         success = len(invalid_tools) == 0
         
         # Generate CLI flags for valid tools
-        cli_flags = ""
+        cli_flags = []
         if valid_denied_tools:
             cli_flags = self.ai_verifier.format_tools(valid_denied_tools, "deny")
         
@@ -282,11 +521,56 @@ class ToolVerifier:
         Returns:
             Tuple of (valid_tools, invalid_tools)
         """
-        valid_tools = self.ai_verifier.get_valid_tools()
-        valid = [tool for tool in tools if tool in valid_tools]
-        invalid = [tool for tool in tools if tool not in valid_tools]
+        matcher = self.tool_matcher
+        valid = [tool for tool in tools if matcher.matches(tool)]
+        invalid = [tool for tool in tools if not matcher.matches(tool)]
         return valid, invalid
     
+    @property
+    def tool_matcher(self) -> ToolMatcher:
+        """Valid tools of the AI tool compiled into a matcher, built once per catalog."""
+        if self._tool_matcher is None:
+            if isinstance(self.ai_verifier, CatalogVerifier):
+                self._tool_matcher = self.ai_verifier.catalog.matcher
+            else:
+                self._tool_matcher = compile_tools(tuple(self.ai_verifier.get_valid_tools()))
+        return self._tool_matcher
+    
+    def verify_entry(self, entry: 'IndexEntry') -> Dict[str, Any]:
+        """Verify allowed and denied tools of an indexed subagent.
+        
+        Args:
+            entry: Registry index entry of the subagent
+            
+        Returns:
+            Dict with the subagent name, overall success, any load error,
+            the valid/invalid allowed and denied tools and the allowed tools
+            shadowed by a deny rule
+        """
+        result = {'name': entry.name, 'success': entry.error is None, 'error': entry.error}
+        for key, tools in (('allowed', entry.allowed_tools), ('denied', entry.denied_tools)):
+            valid, invalid = self.verify_tools(tools)
+            result[key] = {'valid': valid, 'invalid': invalid}
+            if invalid:
+                result['success'] = False
+        
+        # Rules the backend cannot pass on would leave the subagent unrestricted
+        if entry.error is None and isinstance(self.ai_verifier, CatalogVerifier):
+            unenforced = self.ai_verifier.unenforced_rules(entry.allowed_tools, entry.denied_tools)
+            if unenforced:
+                result['success'] = False
+                result['error'] = '; '.join(unenforced)
+        
+        # Allowed tools that a deny rule fully overrides are dead configuration
+        policy = ToolPolicy(result['allowed']['valid'], result['denied']['valid'])
+        result['shadowed'] = [{'allowed': allowed, 'denied': denied}
+                              for allowed, denied in policy.shadowed()]
+        return result
+    
+    def verify_entries(self, entries: List['IndexEntry']) -> List[Dict[str, Any]]:
+        """Verify every given subagent against a single set of valid tools."""
+        return [self.verify_entry(entry) for entry in entries]
+    
     def add_valid_tool(self, tool: str) -> None:
         """Add a valid tool (for backward compatibility - not implemented)."""
         # This is a placeholder for backward compatibility with tests
@@ -303,22 +587,23 @@ class ToolVerifier:
 class BaseAIToolVerifier:
     """Base class for AI tool specific verifiers."""
     
-    def __init__(self):
+    def __init__(self, config: Optional[SubagentsConfig] = None):
         self.ai_tool_name = "base"
+        self.config = config or get_config()
     
     def get_valid_tools(self) -> List[str]:
         """Get the list of valid tools for this AI tool."""
         raise NotImplementedError("Subclasses must implement get_valid_tools")
     
-    def format_tools(self, tools: List[str], flag_type: str) -> str:
-        """Format tools as CLI flags for this AI tool.
+    def format_tools(self, tools: List[str], flag_type: str) -> List[str]:
+        """Format tools as CLI arguments for this AI tool.
         
         Args:
             tools: List of tool names
             flag_type: Either 'allow' or 'deny'
             
         Returns:
-            Formatted string with CLI flags
+            CLI arguments, one per flag and flag value
         """
         raise NotImplementedError("Subclasses must implement format_tools")
     
@@ -326,120 +611,134 @@ class BaseAIToolVerifier:
         """Check if this AI tool supports YOLO mode."""
         return False
     
-    def format_model(self, model: str) -> str:
-        """Format model as CLI flags for this AI tool.
+    def format_model(self, model: str) -> List[str]:
+        """Format model as CLI arguments for this AI tool.
         
         Args:
             model: Model name (e.g., 'gpt-4', 'gpt-3.5-turbo', etc.)
             
         Returns:
-            Formatted string with model CLI flags, empty string if no model
+            Model CLI arguments, empty list if no model
         """
         raise NotImplementedError("Subclasses must implement format_model")
     
     def get_default_subagents_dir(self) -> Path:
         """Get the default subagents directory for this AI tool."""
-        return get_default_subagents_dir(self.ai_tool_name)
+        return self.config.get_subagents_dir(self.ai_tool_name)
 
-class CopilotCLIVerifier(BaseAIToolVerifier):
-    """Tool verifier for GitHub Copilot CLI."""
+class CatalogVerifier(BaseAIToolVerifier):
+    """Tool verifier driven by an AI tool's packaged catalog."""
+    
+    def __init__(self, ai_tool_name: str, config: Optional[SubagentsConfig] = None):
+        super().__init__(config)
+        self.ai_tool_name = ai_tool_name
     
-    def __init__(self):
-        super().__init__()
-        self.ai_tool_name = "copilot-cli"
+    @property
+    def catalog(self) -> ToolCatalog:
+        """The AI tool's catalog, loaded once per process."""
+        return load_tool_catalog(self.ai_tool_name)
     
     def get_valid_tools(self) -> List[str]:
-        """Get the list of valid tools for Copilot CLI."""
-        return [
-            "write",
-            "shell(*)",
-            "shell(git)"
-        ]
+        """Get the list of valid tools from the catalog."""
+        return self.catalog.tool_names
     
-    def format_tools(self, tools: List[str], flag_type: str) -> str:
-        """Format tools as copilot CLI flags.
+    def format_tools(self, tools: List[str], flag_type: str) -> List[str]:
+        """Format tools as CLI arguments using the catalog's flag format.
         
         Args:
             tools: List of tool names
             flag_type: Either 'allow' or 'deny'
             
         Returns:
-            Formatted string with CLI flags
+            CLI arguments, one per flag and flag value
         """
         if not tools:
-            return ""
+            return []
         
         # Handle YOLO mode for allowed tools
-        if flag_type == "allow" and get_yolo_mode():
-            return "--allow-all-tools"
+        if flag_type == "allow" and self.config.yolo_mode and self.supports_yolo_mode():
+            return [self.catalog.flags['yolo']]
         
-        flag = "--allow-tool" if flag_type == "allow" else "--deny-tool"
-        return " ".join([f'{flag} {tool}' for tool in tools])
-    
-    def supports_yolo_mode(self) -> bool:
-        """Copilot CLI supports YOLO mode with --allow-all-tools."""
-        return True
+        return self.catalog.format_flags(tools, flag_type)
     
-    def get_default_subagents_dir(self) -> Path:
-        """Get the default subagents directory for Copilot CLI."""
-        # First try Copilot-specific directory, then fall back to general
-        current_dir = Path.cwd()
-        env_file = current_dir / '.env'
-        
-        # Load .env from current working directory if it exists
-        if env_file.exists():
-            load_dotenv(dotenv_path=env_file, override=True)
-        
-        # Try Copilot-specific environment variable first
-        copilot_dir = os.getenv('COPILOT_SUBAGENTS_COPILOT_CLI_SUBAGENTS_DIR')
-        if copilot_dir:
-            subagents_path = Path(copilot_dir)
-            if not subagents_path.is_absolute():
-                subagents_path = current_dir / subagents_path
-            return subagents_path
+    def unenforced_rules(self, allowed_tools: List[str], denied_tools: List[str]) -> List[str]:
+        """Describe the declared tool rules that the backend has no flag to enforce.
         
-        # Fall back to general directory with copilot-cli subdirectory
-        general_dir = os.getenv('COPILOT_SUBAGENTS_SUBAGENTS_DIR', '.github/subagents')
-        subagents_path = Path(general_dir) / 'copilot-cli'
-        if not subagents_path.is_absolute():
-            subagents_path = current_dir / subagents_path
+        Such rules would be dropped from the command and the subagent would run
+        unrestricted. YOLO mode is the explicit opt-in to run it anyway.
         
-        return subagents_path
+        Returns:
+            One issue per kind of rule that cannot be enforced, empty if all can
+        """
+        if self.config.yolo_mode:
+            return []
+        issues = []
+        for flag_type, kind, tools in (('allow', 'allowed', allowed_tools), ('deny', 'denied', denied_tools)):
+            if tools and not self.catalog.flags.get(flag_type):
+                issues.append(f"{self.catalog.display_name} cannot enforce {kind} tools: {', '.join(tools)} "
+                              f"(use YOLO mode to run without these restrictions)")
+        return issues
+    
+    def supports_yolo_mode(self) -> bool:
+        """Check if the catalog defines a flag that allows all tools."""
+        return bool(self.catalog.flags.get('yolo'))
     
-    def format_model(self, model: str) -> str:
-        """Format model as CLI flags for Copilot CLI.
+    def format_model(self, model: str) -> List[str]:
+        """Format model as CLI arguments using the catalog's model flag.
         
         Args:
             model: Model name (e.g., 'gpt-4', 'gpt-3.5-turbo', etc.)
             
         Returns:
-            Formatted string with model CLI flags, empty string if no model
+            Model CLI arguments, empty list if no model
         """
-        if not model or not model.strip():
-            return ""
+        model_flag = self.catalog.flags.get('model')
+        if not model or not model.strip() or not model_flag:
+            return []
         
-        return f"--model {model.strip()}"
+        return [model_flag, model.strip()]
+
+class CopilotCLIVerifier(CatalogVerifier):
+    """Tool verifier for GitHub Copilot CLI."""
+    
+    def __init__(self, config: Optional[SubagentsConfig] = None):
+        super().__init__("copilot-cli", config)
+    
+    def get_default_subagents_dir(self) -> Path:
+        """Get the default subagents directory for Copilot CLI."""
+        # First try Copilot-specific directory, then fall back to general
+        if self.config.subagents_dir is not None:
+            return self.config.subagents_dir
+        
+        # Try Copilot-specific setting first
+        copilot_dir = self.config.get('COPILOT_CLI_SUBAGENTS_DIR')
+        if copilot_dir:
+            return self.config.resolve_path(copilot_dir)
+        
+        # Fall back to general directory with copilot-cli subdirectory
+        general_dir = self.config.get('SUBAGENTS_DIR', '.github/subagents')
+        return self.config.resolve_path(Path(general_dir) / 'copilot-cli')
 
 # Factory function to get the appropriate verifier
-def get_ai_tool_verifier(ai_tool: str) -> BaseAIToolVerifier:
+def get_ai_tool_verifier(ai_tool: str, config: Optional[SubagentsConfig] = None) -> BaseAIToolVerifier:
     """Get the appropriate AI tool verifier.
     
     Args:
         ai_tool: The AI tool name
+        config: Resolved configuration (default: the process-wide one)
         
     Returns:
         BaseAIToolVerifier: The appropriate verifier instance
+        
+    Raises:
+        ValueError: If the AI tool has no packaged catalog
     """
-    verifiers = {
-        'copilot-cli': CopilotCLIVerifier,
-    }
-    
-    verifier_class = verifiers.get(ai_tool)
-    if verifier_class:
-        return verifier_class()
-    else:
-        # Default to copilot-cli for unknown tools
-        return CopilotCLIVerifier()
+    if ai_tool == 'copilot-cli':
+        return CopilotCLIVerifier(config)
+    
+    # Loading the catalog up front rejects unknown tools instead of guessing
+    load_tool_catalog(ai_tool)
+    return CatalogVerifier(ai_tool, config)
 
 def format_copilot_tools(tools: List[str], flag_type: str) -> str:
     """Format tools as copilot CLI flags (legacy function).
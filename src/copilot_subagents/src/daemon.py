@@ -0,0 +1,416 @@
+"""Resident daemon that keeps the subagent registry hot between CLI calls.
+
+The client half of this module is imported by the ``subagents`` entry point on
+every run, so it only uses cheap standard library imports at module level;
+socket, hashing and threading modules are imported when they are first needed.
+"""
+
+import json
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+# Commands the daemon can answer without touching a backend
+SERVED_COMMANDS = ('list', 'verify', 'verify-allowed-tools', 'verify-denied-tools')
+DRY_RUN_FLAGS = ('--dry-run', '--dry')
+# Profiles and traces must time the command in the calling process
+TRACE_FLAGS = ('--profile', '--trace')
+
+ENV_PREFIX = 'COPILOT_SUBAGENTS_'
+CLIENT_TIMEOUT_SECONDS = 30.0
+
+def get_socket_path(cwd: Optional[Path] = None) -> Path:
+    """Get the daemon socket path for a working directory.
+    
+    Each working directory gets its own daemon because subagent directories
+    and ``.env`` files are resolved relative to it.
+    """
+    import hashlib
+    import tempfile
+    
+    override = os.getenv('COPILOT_SUBAGENTS_DAEMON_SOCKET')
+    if override:
+        return Path(override)
+    
+    cwd = cwd or Path.cwd()
+    runtime_dir = os.getenv('XDG_RUNTIME_DIR') or tempfile.gettempdir()
+    digest = hashlib.sha1(str(cwd).encode()).hexdigest()[:16]
+    return Path(runtime_dir) / f"copilot-subagents-{os.getuid()}" / f"{digest}.sock"
+
+def is_private_dir(path: Path) -> bool:
+    """Check that a socket directory is a real directory only the current user can use.
+    
+    Without ``XDG_RUNTIME_DIR`` sockets live in the shared temp directory, where
+    another user could pre-create the directory and plant a socket in it.
+    """
+    import stat
+    
+    try:
+        info = os.lstat(path)
+    except OSError:
+        return False
+    return (stat.S_ISDIR(info.st_mode) and info.st_uid == os.getuid()
+            and stat.S_IMODE(info.st_mode) == 0o700)
+
+def ensure_private_dir(path: Path) -> None:
+    """Create the socket directory with mode 0700, or check an existing one.
+    
+    Raises:
+        PermissionError: If the directory is a symlink, belongs to another user or is not mode 0700
+    """
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.mkdir(mode=0o700)
+        # mkdir's mode is filtered by the umask
+        os.chmod(path, 0o700)
+    except FileExistsError:
+        pass
+    if not is_private_dir(path):
+        raise PermissionError(f"Refusing to use socket directory {path}: it must be a directory owned by "
+                              f"the current user with mode 0700")
+
+def is_served(argv: List[str]) -> bool:
+    """Check whether a command line can be answered by the daemon."""
+    if not argv:
+        return False
+    if argv[0] in SERVED_COMMANDS:
+        return True
+    if any(arg.split('=', 1)[0] in TRACE_FLAGS for arg in argv):
+        return False
+    return argv[0] == 'invoke' and any(flag in argv for flag in DRY_RUN_FLAGS)
+
+def _client_env() -> Dict[str, str]:
+    return {key: value for key, value in os.environ.items() if key.startswith(ENV_PREFIX)}
+
+def send_request(request: Dict[str, Any], socket_path: Optional[Path] = None,
+                 timeout: float = CLIENT_TIMEOUT_SECONDS) -> Dict[str, Any]:
+    """Send one JSON request to the daemon and return its JSON response.
+    
+    Raises:
+        OSError: If the daemon is not running or the connection fails
+    """
+    import socket
+    
+    socket_path = socket_path or get_socket_path()
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        client.settimeout(timeout)
+        client.connect(str(socket_path))
+        client.sendall(json.dumps(request).encode() + b'\n')
+        with client.makefile('rb') as response_file:
+            line = response_file.readline()
+    
+    if not line:
+        raise ConnectionError("Daemon closed the connection without a response")
+    return json.loads(line)
+
+def run_via_daemon(argv: List[str]) -> Optional[int]:
+    """Run a CLI command through a running daemon.
+    
+    Returns:
+        The command's exit code, or None if the caller should run it in-process
+    """
+    if os.getenv('COPILOT_SUBAGENTS_NO_DAEMON') or not is_served(argv):
+        return None
+    
+    import socket
+    if not hasattr(socket, 'AF_UNIX'):
+        return None
+    
+    socket_path = get_socket_path()
+    if not is_private_dir(socket_path.parent) or not _owned_by_user(socket_path):
+        return None
+    
+    request = {
+        'command': 'run',
+        'argv': argv,
+        'cwd': str(Path.cwd()),
+        'env': _client_env(),
+        'columns': _terminal_columns(),
+    }
+    try:
+        response = send_request(request, socket_path)
+    except (OSError, ValueError):
+        return None
+    
+    if response.get('fallback'):
+        return None
+    
+    sys.stdout.write(response.get('output', ''))
+    sys.stdout.flush()
+    return int(response.get('exit_code', 1))
+
+def _owned_by_user(path: Path) -> bool:
+    try:
+        return os.lstat(path).st_uid == os.getuid()
+    except OSError:
+        return False
+
+def _terminal_columns() -> Optional[int]:
+    try:
+        return os.get_terminal_size(sys.stdout.fileno()).columns
+    except (OSError, ValueError):
+        return None
+
+def _watched_paths(root: Path) -> List[Path]:
+    """Every path below the root except the state directory the CLI writes to."""
+    from core import STATE_DIRNAME
+    
+    return [path for path in root.rglob('*')
+            if STATE_DIRNAME not in path.relative_to(root).parts]
+
+class _InotifyWatcher:
+    """Minimal inotify binding that reports any change below a directory tree."""
+    
+    # IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+    WATCH_MASK = 0x002 | 0x004 | 0x008 | 0x040 | 0x080 | 0x100 | 0x200
+    
+    def __init__(self, root: Path):
+        import ctypes
+        import ctypes.util
+        
+        self.root = root
+        self._libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self._fd = self._libc.inotify_init1(os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.add_watches()
+    
+    def add_watches(self) -> None:
+        """Watch the root and every directory below it (watching twice is a no-op)."""
+        directories = [self.root] + [path for path in _watched_paths(self.root) if path.is_dir()]
+        for directory in directories:
+            self._libc.inotify_add_watch(self._fd, str(directory).encode(), self.WATCH_MASK)
+    
+    def wait(self, timeout: float) -> bool:
+        """Wait for changes, returning True if any happened within the timeout."""
+        import select
+        
+        ready, _, _ = select.select([self._fd], [], [], timeout)
+        if not ready:
+            return False
+        os.read(self._fd, 65536)
+        # New folders need their own watches
+        self.add_watches()
+        return True
+    
+    def close(self) -> None:
+        os.close(self._fd)
+
+class _PollingWatcher:
+    """Fallback watcher that compares stat signatures of the directory tree."""
+    
+    def __init__(self, root: Path):
+        self.root = root
+        self._signature = self._scan()
+    
+    def _scan(self) -> frozenset:
+        signature = set()
+        for path in _watched_paths(self.root):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            signature.add((str(path), stat.st_mtime_ns, stat.st_size))
+        return frozenset(signature)
+    
+    def wait(self, timeout: float) -> bool:
+        time.sleep(timeout)
+        signature = self._scan()
+        changed = signature != self._signature
+        self._signature = signature
+        return changed
+    
+    def close(self) -> None:
+        pass
+
+class SubagentDaemon:
+    """Serve CLI requests from a process that keeps the parsed registry in memory."""
+    
+    def __init__(self, socket_path: Path, watch_dir: Path, poll_interval: float = 1.0,
+                 use_inotify: bool = True):
+        import threading
+        
+        self.socket_path = socket_path
+        self.watch_dir = watch_dir
+        self.poll_interval = poll_interval
+        self.use_inotify = use_inotify
+        self.cwd = str(Path.cwd())
+        self.env = _client_env()
+        self.started_at = time.time()
+        self.requests_served = 0
+        self.invalidations = 0
+        self.watcher_mode = 'none'
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._server = None
+    
+    def serve_forever(self) -> None:
+        """Serve requests until a shutdown request is received.
+        
+        Raises:
+            PermissionError: If the socket directory is not private to the current user
+        """
+        import socketserver
+        import threading
+        from registry import disable_resident_registry, enable_resident_registry
+        
+        ensure_private_dir(self.socket_path.parent)
+        enable_resident_registry()
+        if self.socket_path.exists():
+            self.socket_path.unlink()
+        
+        daemon = self
+        
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                line = self.rfile.readline()
+                try:
+                    response = daemon.handle_request(json.loads(line))
+                except ValueError as e:
+                    response = {'fallback': True, 'error': str(e)}
+                self.wfile.write(json.dumps(response).encode() + b'\n')
+        
+        self._server = socketserver.UnixStreamServer(str(self.socket_path), Handler)
+        os.chmod(self.socket_path, 0o600)
+        
+        watcher_thread = threading.Thread(target=self._watch, name='subagents-watcher', daemon=True)
+        watcher_thread.start()
+        try:
+            self._server.serve_forever(poll_interval=0.2)
+        finally:
+            self._stop.set()
+            self._server.server_close()
+            disable_resident_registry()
+            try:
+                self.socket_path.unlink()
+            except FileNotFoundError:
+                pass
+    
+    def shutdown(self) -> None:
+        """Stop serving; safe to call from any thread."""
+        import threading
+        
+        self._stop.set()
+        if self._server is not None:
+            threading.Thread(target=self._server.shutdown, daemon=True).start()
+    
+    def handle_request(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        command = request.get('command')
+        if command == 'ping':
+            return self.status()
+        if command == 'shutdown':
+            self.shutdown()
+            return {'ok': True}
+        if command != 'run':
+            return {'fallback': True, 'error': f"Unknown daemon command: {command}"}
+        
+        argv = request.get('argv', [])
+        if request.get('cwd') != self.cwd or request.get('env') != self.env or not is_served(argv):
+            # Different working directory or configuration: let the client run it itself
+            return {'fallback': True}
+        
+        with self._lock:
+            exit_code, output = self._run_cli(argv, request.get('columns'))
+            self.requests_served += 1
+        return {'exit_code': exit_code, 'output': output}
+    
+    def status(self) -> Dict[str, Any]:
+        return {
+            'ok': True,
+            'pid': os.getpid(),
+            'cwd': self.cwd,
+            'watch_dir': str(self.watch_dir),
+            'watcher': self.watcher_mode,
+            'uptime': time.time() - self.started_at,
+            'requests_served': self.requests_served,
+            'invalidations': self.invalidations,
+        }
+    
+    def invalidate(self) -> None:
+        """Drop every in-memory parse so the next request re-reads changed files."""
+        from config import reload_config
+        from core import clear_subagent_cache
+        from registry import invalidate_resident_registry
+        
+        with self._lock:
+            reload_config()
+            clear_subagent_cache()
+            invalidate_resident_registry()
+            self.invalidations += 1
+    
+    def _run_cli(self, argv: List[str], columns: Optional[int]):
+        import contextlib
+        import io
+        import click
+        from cli import cli
+        
+        output = io.StringIO()
+        # The client's terminal width applies to this request only
+        saved_columns = os.environ.get('COLUMNS')
+        if columns:
+            os.environ['COLUMNS'] = str(columns)
+        try:
+            with contextlib.redirect_stdout(output), contextlib.redirect_stderr(output):
+                try:
+                    exit_code = cli.main(args=argv, prog_name='subagents', standalone_mode=False)
+                except click.ClickException as e:
+                    e.show()
+                    exit_code = e.exit_code
+                except click.exceptions.Abort:
+                    exit_code = 1
+                except SystemExit as e:
+                    exit_code = e.code if isinstance(e.code, int) else 1
+        finally:
+            if saved_columns is None:
+                os.environ.pop('COLUMNS', None)
+            else:
+                os.environ['COLUMNS'] = saved_columns
+        return exit_code or 0, output.getvalue()
+    
+    def _watch(self) -> None:
+        watcher = None
+        while watcher is None and not self._stop.is_set():
+            watcher = self._create_watcher()
+            if watcher is None:
+                # Directory does not exist yet
+                self._stop.wait(self.poll_interval)
+        
+        try:
+            while not self._stop.is_set():
+                if watcher.wait(self.poll_interval):
+                    self.invalidate()
+        finally:
+            if watcher is not None:
+                watcher.close()
+    
+    def _create_watcher(self):
+        if not self.watch_dir.is_dir():
+            return None
+        if self.use_inotify and sys.platform.startswith('linux'):
+            try:
+                watcher = _InotifyWatcher(self.watch_dir)
+                self.watcher_mode = 'inotify'
+                return watcher
+            except (OSError, AttributeError):
+                pass
+        self.watcher_mode = 'polling'
+        return _PollingWatcher(self.watch_dir)
+
+def daemon_status(socket_path: Optional[Path] = None) -> Optional[Dict[str, Any]]:
+    """Return the running daemon's status, or None if no daemon answers."""
+    try:
+        return send_request({'command': 'ping'}, socket_path, timeout=2.0)
+    except (OSError, ValueError):
+        return None
+
+def wait_for_daemon(socket_path: Path, timeout: float = 5.0,
+                    is_alive: Callable[[], bool] = lambda: True) -> bool:
+    """Wait until a daemon answers on the socket."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline and is_alive():
+        if daemon_status(socket_path) is not None:
+            return True
+        time.sleep(0.05)
+    return False
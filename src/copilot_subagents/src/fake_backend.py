@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""Stand-in for ``copilot -p`` with configurable latency, output and failures.
+
+Point the CLI at it to measure the orchestration overhead of ``subagents``
+itself, offline and without a Copilot subscription::
+
+    COPILOT_SUBAGENTS_BACKEND_BIN="python src/fake_backend.py --latency 0.5 --lines 200" \\
+        subagents invoke code-reviewer --prompt "Review the diff"
+
+It accepts the copilot command line and ignores the tool and model flags. The
+prompt comes from ``-p`` (an ``@path`` reference is read from the file) or
+from stdin. The first line reports the prompt size. Then, after ``--latency``
+seconds, the backend writes ``--lines`` lines of output spread over
+``--stream`` seconds. With ``--failure-rate`` a share of runs fails with a rate
+limit error instead, which the CLI treats as transient.
+"""
+
+import argparse
+import random
+import re
+import sys
+import time
+from typing import List, Optional
+
+# Exit code and message of a simulated failure
+FAILURE_EXIT_CODE = 1
+FAILURE_MESSAGE = "Error: rate limit exceeded (HTTP 429), try again later"
+
+_FILE_REFERENCE = re.compile(r'@(\S+)')
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog='fake-copilot', description=__doc__.split('\n\n')[0],
+                                     allow_abbrev=False)
+    parser.add_argument('-p', '--prompt', help='Prompt; read from stdin if omitted')
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='Seconds before the first line of output after the prompt size')
+    parser.add_argument('--jitter', type=float, default=0.0,
+                        help='Random extra latency of up to this many seconds')
+    parser.add_argument('--lines', type=int, default=1,
+                        help='Lines of output to write')
+    parser.add_argument('--line-bytes', type=int, default=80,
+                        help='Length of each output line')
+    parser.add_argument('--stream', type=float, default=0.0,
+                        help='Seconds over which the output lines are spread')
+    parser.add_argument('--failure-rate', type=float, default=0.0,
+                        help='Probability between 0 and 1 that the run fails')
+    parser.add_argument('--seed', type=int,
+                        help='Seed for jitter and failures, for reproducible runs')
+    # Copilot's tool and model flags, and anything else, are accepted and ignored
+    options, _ = parser.parse_known_args(argv)
+    return options
+
+def read_prompt(prompt: Optional[str]) -> str:
+    if prompt is None:
+        return sys.stdin.read()
+    # Prompt files are referenced as "... @/path/to/prompt.md"
+    for path in _FILE_REFERENCE.findall(prompt):
+        try:
+            with open(path, encoding='utf-8', errors='replace') as prompt_file:
+                prompt += prompt_file.read()
+        except OSError:
+            pass
+    return prompt
+
+def main(argv: Optional[List[str]] = None) -> int:
+    options = parse_args(argv)
+    rng = random.Random(options.seed)
+    prompt = read_prompt(options.prompt)
+    print(f"fake-copilot: {len(prompt.encode('utf-8'))} prompt bytes", flush=True)
+    
+    time.sleep(options.latency + rng.uniform(0, options.jitter))
+    if rng.random() < options.failure_rate:
+        print(FAILURE_MESSAGE, file=sys.stderr, flush=True)
+        return FAILURE_EXIT_CODE
+    
+    interval = options.stream / options.lines if options.lines > 0 else 0
+    filler = 'x' * max(options.line_bytes - 12, 0)
+    for number in range(options.lines):
+        sys.stdout.write(f"line {number:06d} {filler}\n")
+        if interval:
+            sys.stdout.flush()
+            time.sleep(interval)
+    sys.stdout.flush()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,821 @@
+"""Asynchronous subagent invocation with streamed output.
+
+This module has no CLI dependencies so it can drive many subagents from one
+event loop or be embedded in a service::
+
+    result = await invoke_subagent(subagents_dir, 'code-reviewer', 'Review the diff',
+                                   on_output=lambda line: print(line.text))
+
+Lower level, an :class:`Invocation` runs any command and yields its output as
+it is produced::
+
+    async with Invocation(command) as invocation:
+        async for line in invocation:
+            ...
+        result = await invocation.wait()
+"""
+
+import asyncio
+import hashlib
+import os
+import shlex
+import signal
+import tempfile
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from pathlib import Path
+from typing import (TYPE_CHECKING, Any, AsyncIterator, Callable, Deque, Dict, List, Mapping, NamedTuple,
+                    Optional, Sequence, Set, Tuple, Union)
+
+from config import SubagentsConfig, get_config
+from core import SubagentParser, ToolVerifier, get_ai_tool_verifier, get_state_dir
+from limits import ResourceLimits
+from ratelimit import RateLimiter
+from runlog import RunLog, get_tail_lines, new_run_log
+from tools import DEFAULT_AI_TOOL, ToolCatalog, load_tool_catalog
+from tracing import span
+
+if TYPE_CHECKING:
+    from resultcache import ResultCache
+
+# Largest output line read in one piece; longer lines are dropped rather than failing the run
+STREAM_LIMIT = 1 << 20
+# Lines buffered between the pipe readers and the consumer before the backend is paused
+QUEUE_SIZE = 256
+# Seconds a cancelled backend gets to exit after SIGTERM before it is killed
+TERMINATE_GRACE = 5.0
+# Backends run in their own process group so the whole tree can be signalled
+PROCESS_GROUPS = os.name == 'posix'
+# Characters of a single line kept in the in-memory tail
+TAIL_LINE_CHARS = 2000
+
+STDOUT = 'stdout'
+STDERR = 'stderr'
+
+# Prompt transports a backend catalog can declare
+PROMPT_ARGV = 'argv'
+PROMPT_STDIN = 'stdin'
+PROMPT_FILE = 'file'
+# Prompts above this many bytes are not passed as one argv element; Linux
+# rejects any single argument over 128 KiB (MAX_ARG_STRLEN) with E2BIG
+DEFAULT_PROMPT_ARGV_LIMIT = 96 * 1024
+PROMPTS_DIRNAME = 'prompts'
+
+def get_prompt_argv_limit(config: Optional[SubagentsConfig] = None) -> int:
+    """Largest prompt in bytes passed on the command line (``COPILOT_SUBAGENTS_PROMPT_ARGV_LIMIT``)."""
+    return (config or get_config()).get_int('PROMPT_ARGV_LIMIT', DEFAULT_PROMPT_ARGV_LIMIT)
+
+def get_backend_command(config: Optional[SubagentsConfig] = None,
+                        catalog: Optional[ToolCatalog] = None) -> Tuple[str, ...]:
+    """Backend executable, with any leading arguments, that subagents run with.
+    
+    ``COPILOT_SUBAGENTS_BACKEND_BIN`` overrides the catalog's binary, e.g. to run
+    a specific install or the bundled ``fake_backend.py`` stand-in. Its value is
+    split like a shell command line, so it can include an interpreter and options.
+    """
+    value = (config or get_config()).get('BACKEND_BIN')
+    if value and value.strip():
+        return tuple(shlex.split(value))
+    return catalog.command if catalog is not None else ('copilot',)
+
+def get_ai_tool(config: Optional[SubagentsConfig] = None, ai_tool: Optional[str] = None) -> str:
+    """AI tool whose catalog subagents are verified against and run with.
+    
+    ``ai_tool`` (e.g. from ``--ai-tool``) takes precedence over
+    ``COPILOT_SUBAGENTS_AI_TOOL``, which defaults to copilot-cli.
+    
+    Raises:
+        ValueError: If there is no catalog for the AI tool
+    """
+    name = ai_tool or (config or get_config()).get('AI_TOOL') or DEFAULT_AI_TOOL
+    load_tool_catalog(name)
+    return name
+
+class OutputLine(NamedTuple):
+    """One line of backend output."""
+    
+    stream: str
+    # Line text without the trailing newline
+    text: str
+    # Seconds since the backend process started
+    elapsed: float
+
+@dataclass(frozen=True)
+class InvocationResult:
+    """Outcome of a finished (or cancelled) backend process.
+    
+    ``stdout`` and ``stderr`` hold only the tail of each stream; the complete
+    output is in the run log at ``log_path`` when one was written.
+    """
+    
+    command: Tuple[str, ...]
+    returncode: int
+    # Wall clock start time (epoch seconds) and run time in seconds
+    started_at: float
+    duration: float
+    # Seconds until the first line of output, None if there was none
+    first_output: Optional[float] = None
+    stdout: str = ''
+    stderr: str = ''
+    cancelled: bool = False
+    # Terminated because the subagent's timeout expired
+    timed_out: bool = False
+    log_path: Optional[Path] = None
+    # Replayed from the result cache instead of running the backend
+    cached: bool = False
+    
+    @property
+    def success(self) -> bool:
+        return self.returncode == 0 and not self.cancelled
+
+class Invocation:
+    """A backend process whose stdout and stderr are streamed line by line.
+    
+    Iterating the invocation yields :class:`OutputLine` items from both streams
+    in arrival order. :meth:`wait` drains whatever was not consumed and returns
+    the :class:`InvocationResult`. Cancelling the task that waits or iterates,
+    or leaving the ``async with`` block early, terminates the process.
+    
+    Every line is written to ``log`` if given (the invocation closes it when
+    done), and only the last ``tail_lines`` lines of each stream are kept in
+    memory, so long and verbose runs use constant memory.
+    
+    On POSIX the process leads its own process group, so terminating it also
+    terminates anything it spawned. ``limits`` bounds its run time, memory and
+    CPU time; when the timeout expires the group gets SIGTERM and, after
+    ``TERMINATE_GRACE`` seconds, SIGKILL.
+    """
+    
+    def __init__(self, command: Sequence[str], env: Optional[Mapping[str, str]] = None,
+                 cwd: Optional[Path] = None, capture: bool = True, log: Optional[RunLog] = None,
+                 tail_lines: Optional[int] = None, stdin: Optional[Path] = None,
+                 limits: Optional[ResourceLimits] = None):
+        self.command = tuple(command)
+        # File piped to the process's stdin; otherwise stdin is inherited
+        self.stdin = stdin
+        self.env = dict(env if env is not None else get_config().subprocess_env())
+        self.cwd = cwd
+        self.capture = capture
+        self.log = log
+        self.limits = limits or ResourceLimits()
+        self.process: Optional[asyncio.subprocess.Process] = None
+        self.result: Optional[InvocationResult] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._readers: List[asyncio.Future] = []
+        self._open_streams = 0
+        tail_lines = get_tail_lines() if tail_lines is None else tail_lines
+        self._captured: Dict[str, Deque[str]] = {STDOUT: deque(maxlen=tail_lines),
+                                                 STDERR: deque(maxlen=tail_lines)}
+        self._started_at = 0.0
+        self._start = 0.0
+        self._first_output: Optional[float] = None
+        self._cancelled = False
+        self._timed_out = False
+        self._timer: Optional[asyncio.Future] = None
+    
+    async def __aenter__(self) -> 'Invocation':
+        return await self.start()
+    
+    async def __aexit__(self, *exc_info) -> None:
+        await self.cancel()
+        if self._timer is not None:
+            self._timer.cancel()
+        if self.log is not None:
+            self.log.close()
+    
+    def __aiter__(self) -> AsyncIterator[OutputLine]:
+        return self.lines()
+    
+    async def start(self) -> 'Invocation':
+        """Start the process; calling it again is a no-op.
+        
+        Raises:
+            FileNotFoundError: If the backend binary is not installed
+        """
+        if self.process is not None:
+            return self
+        
+        self._queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        self._started_at, self._start = time.time(), time.monotonic()
+        stdin_file = None
+        try:
+            if self.stdin is not None:
+                stdin_file = open(self.stdin, 'rb')
+            self.process = await asyncio.create_subprocess_exec(
+                *self.limits.wrap_command(self.command),
+                stdin=stdin_file,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+                env=self.env,
+                cwd=self.cwd,
+                limit=STREAM_LIMIT,
+                start_new_session=PROCESS_GROUPS
+            )
+        except OSError:
+            if self.log is not None:
+                self.log.close()
+            raise
+        finally:
+            # The child has its own copy of the descriptor
+            if stdin_file is not None:
+                stdin_file.close()
+        _track(self, True)
+        self._open_streams = 2
+        self._readers = [asyncio.ensure_future(self._pump(self.process.stdout, STDOUT)),
+                         asyncio.ensure_future(self._pump(self.process.stderr, STDERR))]
+        if self.limits.timeout is not None:
+            self._timer = asyncio.ensure_future(self._expire(self.limits.timeout))
+        return self
+    
+    async def _expire(self, timeout: float) -> None:
+        try:
+            await asyncio.wait_for(asyncio.shield(self.process.wait()), timeout)
+        except asyncio.TimeoutError:
+            self._timed_out = True
+            await self.cancel()
+    
+    async def _pump(self, stream: asyncio.StreamReader, name: str) -> None:
+        try:
+            while True:
+                try:
+                    line = await stream.readline()
+                except ValueError:
+                    # Line longer than STREAM_LIMIT; asyncio has discarded it
+                    continue
+                if not line:
+                    break
+                elapsed = time.monotonic() - self._start
+                await self._queue.put(OutputLine(name, line.decode(errors='replace').rstrip('\r\n'), elapsed))
+        finally:
+            self._open_streams -= 1
+            try:
+                # Wake a consumer blocked on an empty queue
+                self._queue.put_nowait(None)
+            except asyncio.QueueFull:
+                pass
+    
+    async def lines(self) -> AsyncIterator[OutputLine]:
+        """Yield output lines as the process produces them until both streams close."""
+        await self.start()
+        while self._open_streams or not self._queue.empty():
+            line = await self._queue.get()
+            if line is None:
+                continue
+            if self._first_output is None:
+                self._first_output = line.elapsed
+            if self.log is not None:
+                self.log.write(line.stream, line.text, line.elapsed)
+            if self.capture:
+                self._captured[line.stream].append(line.text[:TAIL_LINE_CHARS])
+            yield line
+    
+    async def wait(self) -> InvocationResult:
+        """Wait for the process to exit, consuming any output not yet iterated.
+        
+        Raises:
+            FileNotFoundError: If the backend binary is not installed
+        """
+        if self.result is not None:
+            return self.result
+        
+        await self.start()
+        try:
+            async for _ in self.lines():
+                pass
+            returncode = await self.process.wait()
+            if self._timer is not None:
+                # Let a timeout that already fired finish killing the group
+                await asyncio.wait([self._timer])
+        except asyncio.CancelledError:
+            await self.cancel()
+            raise
+        finally:
+            _track(self, False)
+        if self.log is not None:
+            self.log.close()
+        
+        self.result = InvocationResult(
+            command=self.command,
+            returncode=returncode,
+            started_at=self._started_at,
+            duration=time.monotonic() - self._start,
+            first_output=self._first_output,
+            stdout='\n'.join(self._captured[STDOUT]),
+            stderr='\n'.join(self._captured[STDERR]),
+            cancelled=self._cancelled,
+            timed_out=self._timed_out,
+            log_path=self.log.path if self.log is not None else None
+        )
+        return self.result
+    
+    async def cancel(self, grace: float = TERMINATE_GRACE) -> None:
+        """Terminate the process if it is still running, killing it after ``grace`` seconds."""
+        if self.process is None or self.process.returncode is not None:
+            _track(self, False)
+            return
+        
+        self._cancelled = True
+        self.signal(kill=False)
+        try:
+            await asyncio.wait_for(asyncio.shield(self.process.wait()), grace)
+        except asyncio.TimeoutError:
+            self.signal(kill=True)
+            await self.process.wait()
+        finally:
+            _track(self, False)
+        if PROCESS_GROUPS:
+            # Children that ignored SIGTERM would otherwise outlive the backend
+            self.signal(kill=True)
+        
+        # Give the readers a moment to flush, then drop pipes still held open by children
+        _, pending = await asyncio.wait(self._readers, timeout=1.0)
+        for reader in pending:
+            reader.cancel()
+    
+    def signal(self, kill: bool = False) -> None:
+        """Send SIGTERM, or SIGKILL if ``kill``, to the process and everything in its process group.
+        
+        Safe to call from any thread and after the process has exited.
+        """
+        if self.process is None:
+            return
+        try:
+            if PROCESS_GROUPS:
+                # The group outlives its leader while children are still in it
+                os.killpg(self.process.pid, signal.SIGKILL if kill else signal.SIGTERM)
+            elif self.process.returncode is None:
+                if kill:
+                    self.process.kill()
+                else:
+                    self.process.terminate()
+        except (ProcessLookupError, PermissionError):
+            pass
+
+# Invocations whose process may still be running, across all threads and event loops
+_RUNNING: Set[Invocation] = set()
+_RUNNING_LOCK = threading.Lock()
+
+def _track(invocation: Invocation, running: bool) -> None:
+    with _RUNNING_LOCK:
+        if running:
+            _RUNNING.add(invocation)
+        else:
+            _RUNNING.discard(invocation)
+
+def terminate_running_invocations(kill: bool = False) -> int:
+    """Signal the process groups of all running invocations, e.g. on Ctrl-C.
+    
+    Backends run in their own process groups, so the terminal's SIGINT does not
+    reach them. Invocations driven by ``asyncio.run`` in the main thread clean
+    up when their task is cancelled; this covers those run in worker threads.
+    
+    Returns:
+        Number of invocations signalled
+    """
+    with _RUNNING_LOCK:
+        invocations = list(_RUNNING)
+    for invocation in invocations:
+        invocation.signal(kill=kill)
+    return len(invocations)
+
+async def run_command(command: Sequence[str], on_output: Optional[Callable[[OutputLine], Any]] = None,
+                      env: Optional[Mapping[str, str]] = None, cwd: Optional[Path] = None,
+                      capture: bool = True, log: Optional[RunLog] = None,
+                      stdin: Optional[Path] = None,
+                      limits: Optional[ResourceLimits] = None,
+                      rate_limiter: Optional[RateLimiter] = None,
+                      model: Optional[str] = None) -> InvocationResult:
+    """Run a command to completion, passing each output line to ``on_output``.
+    
+    With a ``rate_limiter`` the command waits for a request token and a
+    concurrency slot of ``model`` before it starts, and holds the slot until it exits.
+    
+    Raises:
+        FileNotFoundError: If the command's binary is not installed
+    """
+    if rate_limiter is not None:
+        async with rate_limiter.slot(model):
+            return await run_command(command, on_output, env, cwd, capture, log, stdin, limits)
+    
+    with span('subprocess', binary=command[0] if command else '') as phase:
+        async with Invocation(command, env=env, cwd=cwd, capture=capture, log=log, stdin=stdin,
+                              limits=limits) as invocation:
+            async for line in invocation:
+                if on_output is not None:
+                    on_output(line)
+            result = await invocation.wait()
+        phase.set(returncode=result.returncode, first_output=result.first_output)
+        return result
+
+class ToolVerificationError(ValueError):
+    """A subagent lists tools that are not valid for its backend."""
+    
+    def __init__(self, subagent_name: str, issues: List[str]):
+        super().__init__(f"Tool verification failed for '{subagent_name}': {'; '.join(issues)}")
+        self.subagent_name = subagent_name
+        self.issues = issues
+
+class PreparedCommand(NamedTuple):
+    """Backend command for a subagent together with what it was built from."""
+    
+    command: 'BackendCommand'
+    subagent: Dict[str, Any]
+    # 'verified', 'cached' (verified by an earlier run) or 'skipped'
+    verification: str
+
+def verify_subagent_tools(subagents_dir: Path, subagent_name: str, allowed_tools: List[str],
+                          denied_tools: List[str], use_cache: bool = True, ai_tool: str = DEFAULT_AI_TOOL,
+                          config: Optional[SubagentsConfig] = None) -> bool:
+    """Verify a subagent's tools against the catalog of ``ai_tool``.
+    
+    Successful checks are recorded in the verification cache, so an unchanged
+    agent file is only checked once per catalog version.
+    
+    Returns:
+        True if the result came from the cache
+        
+    Raises:
+        ToolVerificationError: If any allowed or denied tool is invalid
+    """
+    from verification import VerificationCache
+    
+    cache = VerificationCache(Path(subagents_dir))
+    try:
+        key = cache.key(Path(subagents_dir) / f"{subagent_name}.md",
+                        get_ai_tool_verifier(ai_tool, config).catalog)
+    except (OSError, ValueError):
+        key = None
+    
+    if use_cache and key is not None and cache.is_verified(subagent_name, key):
+        return True
+    
+    verifier = ToolVerifier(ai_tool, config=config)
+    issues = []
+    if allowed_tools:
+        _, invalid_allowed = verifier.verify_tools(allowed_tools)
+        issues.extend([f"Invalid allowed tool: {tool}" for tool in invalid_allowed])
+    if denied_tools:
+        _, invalid_denied = verifier.verify_tools(denied_tools)
+        issues.extend([f"Invalid denied tool: {tool}" for tool in invalid_denied])
+    if issues:
+        raise ToolVerificationError(subagent_name, issues)
+    
+    if key is not None:
+        cache.record(subagent_name, key)
+    return False
+
+def build_full_prompt(subagent_prompt: str, user_prompt: str, context: Optional[str] = None) -> str:
+    """Build the complete prompt for the subagent."""
+    full_prompt = subagent_prompt
+    
+    if context:
+        full_prompt += f"\n\nContext: {context}"
+    
+    full_prompt += f"\n\nTask: {user_prompt}"
+    
+    return full_prompt
+
+def _prompt_parts(subagent_prompt: str, user_prompt: str, context: Optional[str],
+                  context_file: Optional[Path]) -> List[Union[str, Path]]:
+    """The pieces of :func:`build_full_prompt`, with a context file kept as a path."""
+    parts: List[Union[str, Path]] = [subagent_prompt]
+    if context_file is not None:
+        parts.extend(["\n\nContext: ", context_file])
+    elif context:
+        parts.append(f"\n\nContext: {context}")
+    parts.append(f"\n\nTask: {user_prompt}")
+    return parts
+
+def write_prompt_file(directory: Path, parts: Sequence[Union[str, Path]]) -> Tuple[Path, str]:
+    """Write prompt parts to a new private file, copying file parts in chunks.
+    
+    Returns:
+        Tuple of (prompt file, SHA-256 of its contents)
+        
+    Raises:
+        OSError: If the file cannot be written or a file part cannot be read
+    """
+    directory.mkdir(parents=True, exist_ok=True)
+    fd, path = tempfile.mkstemp(dir=directory, prefix='prompt-', suffix='.md')
+    digest = hashlib.sha256()
+    try:
+        with os.fdopen(fd, 'wb') as prompt_file:
+            for part in parts:
+                if isinstance(part, Path):
+                    with open(part, 'rb') as source:
+                        for chunk in iter(lambda: source.read(1 << 20), b''):
+                            digest.update(chunk)
+                            prompt_file.write(chunk)
+                else:
+                    data = part.encode('utf-8')
+                    digest.update(data)
+                    prompt_file.write(data)
+    except BaseException:
+        os.unlink(path)
+        raise
+    return Path(path), digest.hexdigest()
+
+def split_context_argument(context: Optional[str]) -> Tuple[Optional[str], Optional[Path]]:
+    """Split a ``--context`` value into inline text or an ``@file`` reference.
+    
+    ``@path`` refers to a file whose contents are streamed into the prompt;
+    ``@@text`` escapes a context that starts with ``@``.
+    
+    Raises:
+        FileNotFoundError: If a referenced context file does not exist
+    """
+    if not context or not context.startswith('@'):
+        return context, None
+    if context.startswith('@@'):
+        return context[1:], None
+    
+    context_file = Path(context[1:]).expanduser()
+    if not context_file.is_file():
+        raise FileNotFoundError(f"Context file not found: {context_file}")
+    return None, context_file
+
+def build_copilot_command(prompt: Optional[str], allowed_flags: Sequence[str], denied_flags: Sequence[str],
+                          model_flags: Sequence[str] = (), backend: Sequence[str] = ("copilot",),
+                          prompt_flag: Optional[str] = "-p") -> List[str]:
+    """Build the backend command; without a prompt the backend reads it from stdin.
+    
+    Flags are argument lists and are added as they are, so tool specs that
+    contain spaces stay single arguments. The prompt follows ``prompt_flag``,
+    or ends the command as a positional argument if ``prompt_flag`` is None.
+    """
+    cmd = list(backend)
+    
+    # Add model flag first if specified
+    cmd.extend(model_flags)
+    
+    # Add prompt
+    if prompt is not None and prompt_flag:
+        cmd.extend([prompt_flag, prompt])
+    
+    cmd.extend(allowed_flags)
+    cmd.extend(denied_flags)
+    
+    if prompt is not None and not prompt_flag:
+        cmd.append(prompt)
+    
+    return cmd
+
+class BackendCommand(NamedTuple):
+    """Backend argv and how the prompt reaches the backend.
+    
+    Prompts up to the argv limit are passed inline, including a context file
+    that fits. Larger prompts are written to a temporary prompt file that is
+    piped to stdin or referenced from a short inline prompt. Call
+    :meth:`cleanup` once the backend has finished.
+    """
+    
+    argv: List[str]
+    # 'argv', 'stdin' or 'file'
+    transport: str = PROMPT_ARGV
+    # SHA-256 of the full prompt, the same whichever transport carries it
+    prompt_digest: str = ''
+    # Full prompt when it is held in memory (argv transport)
+    prompt: Optional[str] = None
+    prompt_file: Optional[Path] = None
+    # Timeout and resource limits of the subagent
+    limits: ResourceLimits = ResourceLimits()
+    # Model whose rate limit the backend run counts against
+    model: str = ''
+    rate_limiter: Optional[RateLimiter] = None
+    
+    @property
+    def stdin_file(self) -> Optional[Path]:
+        """File to connect to the backend's stdin, if the prompt is piped."""
+        return self.prompt_file if self.transport == PROMPT_STDIN else None
+    
+    def cache_parts(self) -> List[str]:
+        """The argv with the prompt replaced by its digest, stable across runs for cache keys."""
+        parts = []
+        for arg in self.argv:
+            if arg == self.prompt or (self.prompt_file is not None and str(self.prompt_file) in arg):
+                parts.append(self.prompt_digest)
+            else:
+                parts.append(arg)
+        if self.transport == PROMPT_STDIN:
+            parts.append(self.prompt_digest)
+        return parts
+    
+    def preview(self, limit: int = 200) -> str:
+        """The start of the full prompt, read from the prompt file if needed."""
+        if self.prompt is not None:
+            text = self.prompt
+        else:
+            try:
+                with open(self.prompt_file, 'rb') as prompt_file:
+                    text = prompt_file.read(limit + 4).decode('utf-8', errors='ignore')
+            except OSError:
+                text = ''
+        return text[:limit] + "..." if len(text) > limit else text
+    
+    async def run(self, on_output: Optional[Callable[[OutputLine], Any]] = None,
+                  env: Optional[Mapping[str, str]] = None, log: Optional[RunLog] = None,
+                  capture: bool = True, cache: Optional['ResultCache'] = None,
+                  cache_key: Optional[str] = None) -> InvocationResult:
+        """Run the backend with the command's prompt stdin, limits and rate limit.
+        
+        Every command runs through here, so the CLI commands and
+        :func:`invoke_subagent` apply the same limits and rate limits. With a
+        ``cache``, an identical earlier result stored under ``cache_key`` is
+        replayed instead, and ``capture`` is ignored because the result is stored.
+        
+        Raises:
+            FileNotFoundError: If the backend binary is not installed
+        """
+        if cache is not None:
+            return await cache.run(cache_key, self.argv, on_output=on_output, env=env, log=log,
+                                   stdin=self.stdin_file, limits=self.limits, rate_limiter=self.rate_limiter,
+                                   model=self.model)
+        return await run_command(self.argv, on_output=on_output, env=env, capture=capture, log=log,
+                                 stdin=self.stdin_file, limits=self.limits, rate_limiter=self.rate_limiter,
+                                 model=self.model)
+    
+    def cleanup(self) -> None:
+        """Delete the temporary prompt file, if there is one."""
+        if self.prompt_file is not None:
+            try:
+                self.prompt_file.unlink()
+            except OSError:
+                pass
+
+class PreparedSubagent(NamedTuple):
+    """A parsed and verified subagent whose backend flags are already formatted.
+    
+    Preparing once and calling :meth:`command` per prompt avoids re-parsing and
+    re-verifying the agent for every task of a batch.
+    """
+    
+    name: str
+    subagent: Dict[str, Any]
+    # Allow, deny and model arguments
+    flags: Tuple[List[str], List[str], List[str]]
+    # 'verified', 'cached' (verified by an earlier run) or 'skipped'
+    verification: str
+    catalog: Optional[ToolCatalog] = None
+    # Where prompt files are written; the system temp directory if None
+    prompt_dir: Optional[Path] = None
+    argv_limit: int = DEFAULT_PROMPT_ARGV_LIMIT
+    limits: ResourceLimits = ResourceLimits()
+    rate_limiter: Optional[RateLimiter] = None
+    # Executable and leading arguments of the backend
+    backend: Tuple[str, ...] = ('copilot',)
+    
+    def command(self, prompt: str, context: Optional[str] = None,
+                context_file: Optional[Path] = None) -> BackendCommand:
+        """Build the backend command for one task, choosing how to deliver the prompt.
+        
+        Raises:
+            OSError: If the context file cannot be read or the prompt file cannot be written
+            ValueError: If the prompt is too large for argv and the backend cannot take it another way
+        """
+        transports = self.catalog.prompt_transports if self.catalog is not None else (PROMPT_ARGV,)
+        with span('prompt_build') as phase:
+            parts = _prompt_parts(self.subagent['prompt'], prompt, context, context_file)
+            size = sum(part.stat().st_size if isinstance(part, Path) else len(part.encode('utf-8'))
+                       for part in parts)
+            phase.set(bytes=size)
+        streamed = [transport for transport in (PROMPT_STDIN, PROMPT_FILE) if transport in transports]
+        
+        # A context file only counts by its size: a small one is read into the inline prompt
+        if size <= self.argv_limit or not streamed:
+            if size > self.argv_limit:
+                name = self.catalog.display_name if self.catalog is not None else 'The backend'
+                raise ValueError(f"Prompt of {size} bytes exceeds the {self.argv_limit} byte argument "
+                                 f"limit and {name} cannot read prompts from stdin or a file")
+            with span('prompt_build', transport=PROMPT_ARGV):
+                if context_file is not None:
+                    context = context_file.read_text(encoding='utf-8')
+                full_prompt = build_full_prompt(self.subagent['prompt'], prompt, context)
+                digest = hashlib.sha256(full_prompt.encode('utf-8')).hexdigest()
+            with span('command_build'):
+                return BackendCommand(self._argv(full_prompt), PROMPT_ARGV,
+                                      digest, prompt=full_prompt, **self._run_options())
+        
+        with span('prompt_build', transport=streamed[0]):
+            prompt_file, digest = write_prompt_file(self.prompt_dir or Path(tempfile.gettempdir()), parts)
+        with span('command_build'):
+            if streamed[0] == PROMPT_STDIN:
+                argv = self._argv(None)
+            else:
+                reference = self.catalog.prompt_file_reference.format(path=prompt_file)
+                argv = self._argv(reference)
+            return BackendCommand(argv, streamed[0], digest, prompt_file=prompt_file, **self._run_options())
+    
+    def _argv(self, prompt: Optional[str]) -> List[str]:
+        prompt_flag = self.catalog.prompt_flag if self.catalog is not None else '-p'
+        return build_copilot_command(prompt, *self.flags, self.backend, prompt_flag)
+    
+    def _run_options(self) -> Dict[str, Any]:
+        return {'limits': self.limits, 'model': self.subagent.get('model') or '',
+                'rate_limiter': self.rate_limiter}
+
+def prepare_subagent(parser: SubagentParser, subagents_dir: Path, subagent_name: str,
+                     verify_tools: bool = True, ai_tool: Optional[str] = None) -> PreparedSubagent:
+    """Load a subagent, verify its tools and format its tool and model flags.
+    
+    The subagent is verified against and run with ``ai_tool``, by default the
+    one selected by ``COPILOT_SUBAGENTS_AI_TOOL``.
+    
+    Raises:
+        FileNotFoundError: If the subagent does not exist
+        ToolVerificationError: If the subagent fails tool verification or declares tool rules the
+            backend cannot enforce
+        ValueError: If the subagent or the rate limit settings cannot be parsed, or the AI tool is unknown
+    """
+    ai_tool = get_ai_tool(parser.config, ai_tool)
+    subagent_data = parser.parse_file(f"{subagents_dir}/{subagent_name}.md")
+    allowed_tools = subagent_data['tools']['allowed']
+    denied_tools = subagent_data['tools']['denied']
+    
+    verification = 'skipped'
+    if verify_tools:
+        with span('verify', subagent=subagent_name) as phase:
+            cached = verify_subagent_tools(subagents_dir, subagent_name, allowed_tools, denied_tools,
+                                           ai_tool=ai_tool, config=parser.config)
+            phase.set(cached=cached)
+        verification = 'cached' if cached else 'verified'
+    
+    # Format tool and model flags using the AI verifier and the resolved config
+    with span('command_build', part='flags'):
+        verifier = get_ai_tool_verifier(ai_tool, parser.config)
+        # Checked even without verification: dropping a rule would run the subagent unrestricted
+        unenforced = verifier.unenforced_rules(allowed_tools, denied_tools)
+        if unenforced:
+            raise ToolVerificationError(subagent_name, unenforced)
+        flags = (verifier.format_tools(allowed_tools, "allow"),
+                 verifier.format_tools(denied_tools, "deny"),
+                 verifier.format_model(subagent_data.get('model', '')))
+    return PreparedSubagent(subagent_name, subagent_data, flags, verification,
+                            catalog=verifier.catalog,
+                            prompt_dir=get_state_dir(Path(subagents_dir)) / PROMPTS_DIRNAME,
+                            argv_limit=get_prompt_argv_limit(parser.config),
+                            limits=ResourceLimits.for_subagent(subagent_data, parser.config),
+                            rate_limiter=RateLimiter.from_config(subagents_dir, parser.config),
+                            backend=get_backend_command(parser.config, verifier.catalog))
+
+def prepare_subagent_command(parser: SubagentParser, subagents_dir: Path, subagent_name: str,
+                             prompt: str, context: Optional[str] = None, verify_tools: bool = True,
+                             context_file: Optional[Path] = None, ai_tool: Optional[str] = None) -> PreparedCommand:
+    """Load a subagent, verify its tools and build the backend command that runs it.
+    
+    Raises:
+        FileNotFoundError: If the subagent does not exist
+        ToolVerificationError: If the subagent fails tool verification
+        ValueError: If the subagent cannot be parsed or the prompt cannot be delivered
+    """
+    agent = prepare_subagent(parser, subagents_dir, subagent_name, verify_tools, ai_tool)
+    command = agent.command(prompt, context, context_file)
+    return PreparedCommand(command, agent.subagent, agent.verification)
+
+async def invoke_subagent(subagents_dir: Path, subagent_name: str, prompt: str,
+                          context: Optional[str] = None, verify_tools: bool = True,
+                          on_output: Optional[Callable[[OutputLine], Any]] = None,
+                          config: Optional[SubagentsConfig] = None,
+                          write_log: bool = True, use_cache: Optional[bool] = None,
+                          input_files: Sequence[Path] = (),
+                          context_file: Optional[Path] = None,
+                          ai_tool: Optional[str] = None) -> InvocationResult:
+    """Run a subagent with the copilot CLI and return its result.
+    
+    Args:
+        subagents_dir: Directory containing the subagent files
+        subagent_name: Name of the subagent to run
+        prompt: Task for the subagent
+        context: Additional context for the subagent
+        verify_tools: Verify the subagent's tools before running it
+        on_output: Called with each output line as it arrives
+        config: Configuration to use instead of the process configuration
+        write_log: Write the full output to a run log in the state directory
+        use_cache: Reuse and store results in the result cache (default from
+            ``COPILOT_SUBAGENTS_RESULT_CACHE``)
+        input_files: Files the task reads; their contents are part of the cache key
+        context_file: File streamed into the prompt as context, instead of ``context``
+        ai_tool: AI tool to verify against and run with (default from ``COPILOT_SUBAGENTS_AI_TOOL``)
+        
+    Raises:
+        FileNotFoundError: If the subagent, an input file or the copilot binary does not exist
+        ToolVerificationError: If the subagent fails tool verification
+        ValueError: If the subagent cannot be parsed or the prompt cannot be delivered
+    """
+    config = config or get_config()
+    parser = SubagentParser(subagents_dir, config=config)
+    prepared = prepare_subagent_command(parser, subagents_dir, subagent_name, prompt, context,
+                                        verify_tools, context_file, ai_tool)
+    command = prepared.command
+    try:
+        log = new_run_log(subagents_dir, subagent_name, config) if write_log else None
+        
+        from resultcache import ResultCache, is_result_cache_enabled, result_cache_key
+        cache, key = None, None
+        if is_result_cache_enabled(use_cache, config):
+            cache = ResultCache(subagents_dir, config=config)
+            key = result_cache_key(prepared.subagent, command.cache_parts(), input_files)
+        return await command.run(on_output, config.subprocess_env(), log, cache=cache, cache_key=key)
+    finally:
+        command.cleanup()
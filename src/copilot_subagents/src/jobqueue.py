@@ -0,0 +1,416 @@
+"""Durable local queue of subagent jobs drained by worker processes.
+
+Jobs live in ``<subagents-dir>/state/jobs.sqlite``. ``subagents enqueue`` adds
+a job from a terminal, hook or script, and any number of ``subagents worker``
+processes claim jobs, highest priority first and then in submission order. Each
+job runs through :func:`invocation.invoke_subagent`, the same path as
+``subagents invoke``.
+
+A claimed job is leased to its worker for ``lease_seconds``. The worker renews
+the lease with a heartbeat while the job runs. If the worker crashes or hangs,
+the lease expires and the job is delivered to the next worker that asks, until
+it has used up its attempts. Failures the retry policy classifies as transient
+are queued again after a backoff delay. Every state change is a single
+immediate SQLite transaction, so concurrent workers never claim the same job.
+"""
+
+import asyncio
+import os
+import socket
+import sqlite3
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+from config import SubagentsConfig, get_config
+from core import get_state_dir
+from retry import RetryPolicy
+
+JOBS_DB = 'jobs.sqlite'
+
+QUEUED = 'QUEUED'
+RUNNING = 'RUNNING'
+SUCCEEDED = 'SUCCEEDED'
+FAILED = 'FAILED'
+CANCELLED = 'CANCELLED'
+JOB_STATUSES = (QUEUED, RUNNING, SUCCEEDED, FAILED, CANCELLED)
+
+DEFAULT_MAX_ATTEMPTS = 3
+# Seconds a worker owns a job without renewing the lease
+DEFAULT_LEASE_SECONDS = 60.0
+# Seconds an idle worker waits before looking for new jobs
+DEFAULT_POLL_INTERVAL = 1.0
+# Seconds to wait for another process's transaction before giving up
+LOCK_TIMEOUT = 30.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY,
+    agent TEXT NOT NULL,
+    prompt TEXT NOT NULL,
+    context TEXT,
+    priority INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    created REAL NOT NULL,
+    available REAL NOT NULL,
+    started REAL,
+    finished REAL,
+    worker TEXT,
+    lease_expires REAL,
+    cancel_requested INTEGER NOT NULL DEFAULT 0,
+    returncode INTEGER,
+    error TEXT,
+    log TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (status, priority DESC, id);
+"""
+
+class Job(NamedTuple):
+    """One queued subagent invocation and its current state."""
+    
+    id: int
+    agent: str
+    prompt: str
+    context: Optional[str]
+    priority: int
+    status: str
+    attempts: int
+    max_attempts: int
+    # Epoch seconds it was enqueued, may next be claimed, last started and finished
+    created: float
+    available: float
+    started: Optional[float]
+    finished: Optional[float]
+    # Worker holding the lease while RUNNING
+    worker: Optional[str]
+    lease_expires: Optional[float]
+    cancel_requested: bool
+    returncode: Optional[int]
+    error: Optional[str]
+    log: Optional[str]
+    
+    def as_dict(self) -> Dict[str, Any]:
+        return self._asdict()
+
+_COLUMNS = ', '.join(Job._fields)
+
+def _job(row: tuple) -> Job:
+    job = Job(*row)
+    return job._replace(cancel_requested=bool(job.cancel_requested))
+
+def get_jobs_path(subagents_dir: Path) -> Path:
+    return get_state_dir(Path(subagents_dir)) / JOBS_DB
+
+def worker_id() -> str:
+    """Identifier of this worker process, unique across the machine."""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+class JobQueue:
+    """SQLite-backed job queue shared by every process on the machine."""
+    
+    def __init__(self, path: Path, clock: Callable[[], float] = time.time):
+        self.path = Path(path)
+        self._clock = clock
+        self._initialized = False
+    
+    @classmethod
+    def for_subagents_dir(cls, subagents_dir: Path) -> 'JobQueue':
+        return cls(get_jobs_path(subagents_dir))
+    
+    def _connect(self) -> sqlite3.Connection:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        connection = sqlite3.connect(self.path, timeout=LOCK_TIMEOUT, isolation_level=None)
+        if not self._initialized:
+            connection.executescript(_SCHEMA)
+            self._initialized = True
+        return connection
+    
+    def _transaction(self, operation: Callable[[sqlite3.Connection], Any]) -> Any:
+        """Run ``operation`` in an immediate transaction, committing unless it raises."""
+        connection = self._connect()
+        try:
+            connection.execute('BEGIN IMMEDIATE')
+            result = operation(connection)
+            connection.execute('COMMIT')
+            return result
+        except BaseException:
+            if connection.in_transaction:
+                connection.execute('ROLLBACK')
+            raise
+        finally:
+            connection.close()
+    
+    def enqueue(self, agent: str, prompt: str, context: Optional[str] = None, priority: int = 0,
+                max_attempts: int = DEFAULT_MAX_ATTEMPTS) -> int:
+        """Add a job; higher ``priority`` jobs are claimed first.
+        
+        Returns:
+            The new job's ID
+        """
+        now = self._clock()
+        return self._transaction(lambda connection: connection.execute(
+            'INSERT INTO jobs (agent, prompt, context, priority, status, max_attempts, created, available) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+            (agent, prompt, context, priority, QUEUED, max(max_attempts, 1), now, now)).lastrowid)
+    
+    def get(self, job_id: int) -> Optional[Job]:
+        connection = self._connect()
+        try:
+            row = connection.execute(f'SELECT {_COLUMNS} FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        finally:
+            connection.close()
+        return _job(row) if row is not None else None
+    
+    def jobs(self, status: Optional[str] = None, limit: Optional[int] = None) -> List[Job]:
+        """Jobs in submission order, optionally only those with ``status``; ``limit`` keeps the newest."""
+        query, params = f'SELECT {_COLUMNS} FROM jobs', []
+        if status is not None:
+            query += ' WHERE status = ?'
+            params.append(status)
+        query += ' ORDER BY id DESC'
+        if limit is not None:
+            query += ' LIMIT ?'
+            params.append(limit)
+        connection = self._connect()
+        try:
+            rows = connection.execute(query, params).fetchall()
+        finally:
+            connection.close()
+        return [_job(row) for row in reversed(rows)]
+    
+    def counts(self) -> Dict[str, int]:
+        """Number of jobs in each status."""
+        connection = self._connect()
+        try:
+            rows = connection.execute('SELECT status, COUNT(*) FROM jobs GROUP BY status').fetchall()
+        finally:
+            connection.close()
+        counts = dict.fromkeys(JOB_STATUSES, 0)
+        counts.update(rows)
+        return counts
+    
+    def claim(self, worker: str, lease_seconds: float = DEFAULT_LEASE_SECONDS) -> Optional[Job]:
+        """Lease the next ready job to ``worker``, re-delivering jobs whose lease expired.
+        
+        Returns:
+            The claimed job, now RUNNING, or None if no job is ready
+        """
+        def claim(connection: sqlite3.Connection) -> Optional[Job]:
+            now = self._clock()
+            self._expire_leases(connection, now)
+            row = connection.execute(
+                f'SELECT {_COLUMNS} FROM jobs WHERE status = ? AND available <= ? '
+                'ORDER BY priority DESC, id LIMIT 1', (QUEUED, now)).fetchone()
+            if row is None:
+                return None
+            job = _job(row)._replace(status=RUNNING, worker=worker, started=now, lease_expires=now + lease_seconds)
+            job = job._replace(attempts=job.attempts + 1)
+            connection.execute('UPDATE jobs SET status = ?, attempts = ?, worker = ?, started = ?, lease_expires = ? '
+                               'WHERE id = ?', (RUNNING, job.attempts, worker, now, job.lease_expires, job.id))
+            return job
+        
+        return self._transaction(claim)
+    
+    @staticmethod
+    def _expire_leases(connection: sqlite3.Connection, now: float) -> None:
+        """Queue again, or fail, running jobs whose worker stopped renewing the lease."""
+        connection.execute(
+            'UPDATE jobs SET status = ?, worker = NULL, lease_expires = NULL, finished = ? '
+            'WHERE status = ? AND lease_expires < ? AND cancel_requested', (CANCELLED, now, RUNNING, now))
+        connection.execute(
+            'UPDATE jobs SET status = ?, worker = NULL, lease_expires = NULL, finished = ?, '
+            "error = 'Lease expired after ' || attempts || ' attempt(s)' "
+            'WHERE status = ? AND lease_expires < ? AND attempts >= max_attempts', (FAILED, now, RUNNING, now))
+        connection.execute(
+            'UPDATE jobs SET status = ?, worker = NULL, lease_expires = NULL, available = ? '
+            'WHERE status = ? AND lease_expires < ?', (QUEUED, now, RUNNING, now))
+    
+    def heartbeat(self, job_id: int, worker: str, lease_seconds: float = DEFAULT_LEASE_SECONDS) -> bool:
+        """Renew a job's lease.
+        
+        Returns:
+            False if the worker should stop the job: it was cancelled or its lease was lost
+        """
+        def renew(connection: sqlite3.Connection) -> bool:
+            renewed = connection.execute(
+                'UPDATE jobs SET lease_expires = ? WHERE id = ? AND worker = ? AND status = ? '
+                'AND NOT cancel_requested', (self._clock() + lease_seconds, job_id, worker, RUNNING)).rowcount
+            return bool(renewed)
+        
+        return self._transaction(renew)
+    
+    def finish(self, job_id: int, worker: str, status: str, returncode: Optional[int] = None,
+               error: Optional[str] = None, log: Optional[str] = None, retry_after: Optional[float] = None) -> bool:
+        """Record the outcome of a job, or queue it again ``retry_after`` seconds from now.
+        
+        Only the worker holding the lease can finish a job, so a worker whose
+        lease expired cannot overwrite the outcome of the job's re-delivery.
+        
+        Returns:
+            True if the outcome was recorded
+        """
+        def finish(connection: sqlite3.Connection) -> bool:
+            now = self._clock()
+            if retry_after is not None:
+                return bool(connection.execute(
+                    'UPDATE jobs SET status = ?, worker = NULL, lease_expires = NULL, available = ?, '
+                    'returncode = ?, error = ?, log = ? WHERE id = ? AND worker = ? AND status = ?',
+                    (QUEUED, now + retry_after, returncode, error, log, job_id, worker, RUNNING)).rowcount)
+            return bool(connection.execute(
+                'UPDATE jobs SET status = ?, worker = NULL, lease_expires = NULL, finished = ?, '
+                'returncode = ?, error = ?, log = ? WHERE id = ? AND worker = ? AND status = ?',
+                (status, now, returncode, error, log, job_id, worker, RUNNING)).rowcount)
+        
+        return self._transaction(finish)
+    
+    def release(self, job_id: int, worker: str) -> bool:
+        """Give a job back to the queue without counting the attempt, e.g. when a worker shuts down."""
+        return bool(self._transaction(lambda connection: connection.execute(
+            'UPDATE jobs SET status = ?, worker = NULL, lease_expires = NULL, available = ?, '
+            'attempts = MAX(attempts - 1, 0) WHERE id = ? AND worker = ? AND status = ?',
+            (QUEUED, self._clock(), job_id, worker, RUNNING)).rowcount))
+    
+    def cancel(self, job_id: int) -> Optional[str]:
+        """Cancel a job: queued jobs at once, running jobs when their worker next renews the lease.
+        
+        Returns:
+            The job's status before the request, or None if there is no such job
+        """
+        def cancel(connection: sqlite3.Connection) -> Optional[str]:
+            row = connection.execute('SELECT status FROM jobs WHERE id = ?', (job_id,)).fetchone()
+            if row is None:
+                return None
+            if row[0] == QUEUED:
+                connection.execute('UPDATE jobs SET status = ?, finished = ? WHERE id = ?',
+                                   (CANCELLED, self._clock(), job_id))
+            elif row[0] == RUNNING:
+                connection.execute('UPDATE jobs SET cancel_requested = 1 WHERE id = ?', (job_id,))
+            return row[0]
+        
+        return self._transaction(cancel)
+
+class JobWorker:
+    """Drain a job queue with up to ``concurrency`` invocations at a time.
+    
+    Jobs run through :func:`invocation.invoke_subagent`. A heartbeat renews each
+    job's lease every third of ``lease_seconds`` and stops the invocation when
+    the job is cancelled or the lease is lost. When the worker is cancelled, e.g.
+    by Ctrl-C, its running jobs are stopped and handed back to the queue.
+    """
+    
+    def __init__(self, queue: JobQueue, subagents_dir: Path, concurrency: int = 1,
+                 lease_seconds: float = DEFAULT_LEASE_SECONDS, poll_interval: float = DEFAULT_POLL_INTERVAL,
+                 verify_tools: bool = True, retry: Optional[RetryPolicy] = None,
+                 config: Optional[SubagentsConfig] = None, worker: Optional[str] = None,
+                 on_event: Optional[Callable[[str, Job], None]] = None):
+        self.queue = queue
+        self.subagents_dir = Path(subagents_dir)
+        self.concurrency = max(concurrency, 1)
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.verify_tools = verify_tools
+        self.retry = retry
+        self.config = config or get_config()
+        self.worker = worker or worker_id()
+        # Called with 'started', 'retrying' or the final status of each job
+        self.on_event = on_event
+    
+    async def run(self, drain: bool = False) -> Dict[str, int]:
+        """Process jobs until cancelled, or with ``drain`` until no job is ready.
+        
+        Returns:
+            Number of jobs this worker finished in each final status
+        """
+        counts = dict.fromkeys((SUCCEEDED, FAILED, CANCELLED), 0)
+        loop = asyncio.get_running_loop()
+        
+        async def slot() -> None:
+            while True:
+                job = await loop.run_in_executor(None, self.queue.claim, self.worker, self.lease_seconds)
+                if job is None:
+                    if drain:
+                        return
+                    await asyncio.sleep(self.poll_interval)
+                    continue
+                status = await self.run_job(job)
+                if status in counts:
+                    counts[status] += 1
+        
+        await asyncio.gather(*(slot() for _ in range(self.concurrency)))
+        return counts
+    
+    async def run_job(self, job: Job) -> str:
+        """Run one claimed job and record its outcome.
+        
+        Returns:
+            The job's status afterwards
+        """
+        from invocation import invoke_subagent, split_context_argument
+        
+        self._event('started', job)
+        loop = asyncio.get_running_loop()
+        try:
+            context, context_file = split_context_argument(job.context)
+            invocation = asyncio.ensure_future(invoke_subagent(
+                self.subagents_dir, job.agent, job.prompt, context, self.verify_tools,
+                config=self.config, context_file=context_file))
+        except FileNotFoundError as e:
+            return await self._finish(job, FAILED, error=str(e))
+        
+        stopped = False
+        try:
+            while not invocation.done():
+                await asyncio.wait([invocation], timeout=self.lease_seconds / 3)
+                if not invocation.done() and not await loop.run_in_executor(
+                        None, self.queue.heartbeat, job.id, self.worker, self.lease_seconds):
+                    # Cancelled, or the lease expired and the job went to another worker
+                    stopped = True
+                    invocation.cancel()
+                    await asyncio.wait([invocation])
+        except asyncio.CancelledError:
+            invocation.cancel()
+            await asyncio.wait([invocation])
+            await loop.run_in_executor(None, self.queue.release, job.id, self.worker)
+            raise
+        
+        if stopped:
+            current = await loop.run_in_executor(None, self.queue.get, job.id)
+            if current is not None and current.cancel_requested:
+                return await self._finish(job, CANCELLED, error='Cancelled while running')
+            return RUNNING
+        
+        try:
+            result = invocation.result()
+        except Exception as e:
+            # Missing agent or backend, failed verification, unparsable agent
+            return await self._finish(job, FAILED, error=str(e))
+        
+        log = str(result.log_path) if result.log_path is not None else None
+        if result.success:
+            return await self._finish(job, SUCCEEDED, returncode=result.returncode, log=log)
+        
+        last_line = (result.stderr or result.stdout).rsplit('\n', 1)[-1].strip()
+        error = 'Timed out' if result.timed_out else f"Exited with code {result.returncode}"
+        error += f": {last_line}" if last_line else ""
+        if (self.retry is not None and job.attempts < job.max_attempts
+                and self.retry.is_transient(result.returncode, f"{error}\n{result.stderr}")):
+            retry_after = self.retry.delay(job.attempts)
+            return await self._finish(job, QUEUED, returncode=result.returncode, error=error, log=log,
+                                      retry_after=retry_after)
+        return await self._finish(job, FAILED, returncode=result.returncode, error=error, log=log)
+    
+    async def _finish(self, job: Job, status: str, retry_after: Optional[float] = None, **outcome: Any) -> str:
+        recorded = await asyncio.get_running_loop().run_in_executor(
+            None, lambda: self.queue.finish(job.id, self.worker, status, retry_after=retry_after, **outcome))
+        if not recorded:
+            # The lease was lost; the job's new owner records the outcome
+            return RUNNING
+        self._event('retrying' if status == QUEUED else status,
+                    job._replace(status=status, error=outcome.get('error'), log=outcome.get('log')))
+        return status
+    
+    def _event(self, event: str, job: Job) -> None:
+        if self.on_event is not None:
+            self.on_event(event, job)
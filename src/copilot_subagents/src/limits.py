@@ -0,0 +1,137 @@
+"""Per-subagent timeouts and resource limits for backend processes.
+
+Subagents can declare limits in their frontmatter::
+
+    timeout: 15m            # wall clock; seconds or a number with s, m or h
+    max_memory_mb: 2048     # data segment size of the backend process
+    max_cpu_seconds: 600    # CPU time of the backend process
+    
+The timeout is enforced by the invoker, which terminates the backend's whole
+process group when it expires. Memory and CPU limits are applied with
+``setrlimit`` by a small exec wrapper before the backend starts, so they also
+cover any processes it spawns (each child gets its own copy of the limits).
+A wrapper rather than ``preexec_fn`` keeps spawning safe from the worker
+threads of ``run-plan`` and ``map``.
+"""
+
+import re
+import shutil
+import sys
+from typing import Any, Dict, List, Mapping, NamedTuple, Optional, Sequence
+
+try:
+    import resource
+except ImportError:  # pragma: no cover - not available on Windows
+    resource = None
+
+from config import SubagentsConfig, get_config
+
+# Seconds between the CPU limit's SIGXCPU and the kernel's SIGKILL
+CPU_KILL_GRACE = 5
+
+# Run as ``python -c _RLIMIT_EXEC <memory bytes> <cpu seconds> -- <command...>``;
+# lowers the limits without raising them above the inherited hard limit, then execs
+_RLIMIT_EXEC = """\
+import os, resource, sys
+def lower(limit, soft, hard):
+    current = resource.getrlimit(limit)[1]
+    if current != resource.RLIM_INFINITY:
+        soft, hard = min(soft, current), min(hard, current)
+    resource.setrlimit(limit, (soft, hard))
+memory, cpu = sys.argv[1], sys.argv[2]
+if memory:
+    lower(getattr(resource, 'RLIMIT_DATA', resource.RLIMIT_AS), int(memory), int(memory))
+if cpu:
+    lower(resource.RLIMIT_CPU, int(cpu), int(cpu) + %d)
+try:
+    os.execvp(sys.argv[4], sys.argv[4:])
+except OSError as e:
+    sys.stderr.write('%%s: %%s\\n' %% (sys.argv[4], e))
+    sys.exit(127)
+""" % CPU_KILL_GRACE
+
+_DURATION = re.compile(r'^\s*(\d+(?:\.\d+)?)\s*([smh]?)\s*$', re.IGNORECASE)
+_DURATION_UNITS = {'': 1, 's': 1, 'm': 60, 'h': 3600}
+
+def parse_duration(value: Any) -> float:
+    """Parse a duration in seconds given as a number or a string like ``90``, ``30s``, ``15m`` or ``2h``.
+    
+    Raises:
+        ValueError: If the value is not a positive duration
+    """
+    if isinstance(value, bool):
+        raise ValueError(f"Invalid duration: {value!r}")
+    if isinstance(value, (int, float)):
+        seconds = float(value)
+    else:
+        match = _DURATION.match(str(value))
+        if match is None:
+            raise ValueError(f"Invalid duration: {value!r}")
+        seconds = float(match.group(1)) * _DURATION_UNITS[match.group(2).lower()]
+    if seconds <= 0:
+        raise ValueError(f"Duration must be positive: {value!r}")
+    return seconds
+
+def _positive_int(name: str, value: Any) -> int:
+    if isinstance(value, bool) or not isinstance(value, int) or value <= 0:
+        raise ValueError(f"{name} must be a positive integer, got {value!r}")
+    return value
+
+class ResourceLimits(NamedTuple):
+    """Limits a backend process runs under; None means unlimited."""
+    
+    timeout: Optional[float] = None
+    max_memory_mb: Optional[int] = None
+    max_cpu_seconds: Optional[int] = None
+    
+    @classmethod
+    def from_frontmatter(cls, frontmatter: Mapping[str, Any]) -> 'ResourceLimits':
+        """Read the limit fields of a subagent's frontmatter.
+        
+        Raises:
+            ValueError: If a limit is not a positive number
+        """
+        timeout = frontmatter.get('timeout')
+        memory = frontmatter.get('max_memory_mb')
+        cpu = frontmatter.get('max_cpu_seconds')
+        return cls(parse_duration(timeout) if timeout is not None else None,
+                   _positive_int('max_memory_mb', memory) if memory is not None else None,
+                   _positive_int('max_cpu_seconds', cpu) if cpu is not None else None)
+    
+    @classmethod
+    def for_subagent(cls, subagent: Mapping[str, Any],
+                     config: Optional[SubagentsConfig] = None) -> 'ResourceLimits':
+        """Limits of parsed subagent data, with ``COPILOT_SUBAGENTS_TIMEOUT`` as the default timeout."""
+        limits = cls(**(subagent.get('limits') or {}))
+        if limits.timeout is None:
+            default = (config or get_config()).get_float('TIMEOUT', 0)
+            limits = limits._replace(timeout=default or None)
+        return limits
+    
+    def as_dict(self) -> Dict[str, Any]:
+        return self._asdict()
+    
+    @property
+    def has_rlimits(self) -> bool:
+        """Whether memory or CPU limits are set and can be applied on this platform."""
+        return resource is not None and (self.max_memory_mb is not None or self.max_cpu_seconds is not None)
+    
+    def wrap_command(self, command: Sequence[str]) -> List[str]:
+        """Command that runs ``command`` under the memory and CPU limits.
+        
+        RLIMIT_DATA covers heap and private writable mappings without counting
+        the large address space reservations of runtimes like V8. The CPU limit
+        sends SIGXCPU at the soft limit and SIGKILL ``CPU_KILL_GRACE`` seconds later.
+        
+        Raises:
+            FileNotFoundError: If the command's binary does not exist
+        """
+        command = list(command)
+        if not self.has_rlimits:
+            return command
+        # Fail like a direct spawn would instead of inside the wrapper
+        if not command or shutil.which(command[0]) is None:
+            raise FileNotFoundError(f"No such file or directory: {command[0] if command else ''!r}")
+        memory = self.max_memory_mb * 1024 * 1024 if self.max_memory_mb is not None else ''
+        cpu = self.max_cpu_seconds if self.max_cpu_seconds is not None else ''
+        return [sys.executable, '-I', '-S', '-c', _RLIMIT_EXEC, str(memory), str(cpu), '--'] + command
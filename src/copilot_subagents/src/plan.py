@@ -0,0 +1,435 @@
+"""Parse execution plans and run their steps as a dependency graph.
+
+Plans use the format written by the plan-with-subagents prompt: one
+``### Step N: Title`` section per step with ``- **Subagent**:``,
+``- **CLI Command**:``, ``- **Dependencies**:`` and ``- **Status**:`` bullets.
+Execution adds ``- **Duration**:`` and ``- **Log**:`` bullets pointing at the
+step's run log, so output never has to be copied into the plan.
+"""
+
+import os
+import re
+import shlex
+import tempfile
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional
+
+if TYPE_CHECKING:
+    from retry import RetryPolicy
+
+PLAN_FILENAME = 'plan.md'
+
+PENDING = 'PENDING'
+IN_PROGRESS = 'IN_PROGRESS'
+COMPLETED = 'COMPLETED'
+FAILED = 'FAILED'
+# Not run because a dependency failed
+BLOCKED = 'BLOCKED'
+# Not run because the plan stopped on an earlier failure
+CANCELLED = 'CANCELLED'
+
+_STEP_HEADING = re.compile(r'^###\s+Step\s+(\d+)\s*:\s*(.*?)\s*$')
+_FIELD = re.compile(r'^\s*-\s+\*\*(.+?)\*\*\s*:\s*(.*?)\s*$')
+_PLAN_STATUS = re.compile(r'^\*\*Status\*\*\s*:')
+_STEP_RANGE = re.compile(r'(\d+)\s*-\s*(\d+)')
+_STEP_NUMBER = re.compile(r'\d+')
+_STATUS_WORD = re.compile(r'[A-Z][A-Z_]+')
+
+class PlanStep:
+    """A single step of an execution plan."""
+    
+    __slots__ = ('number', 'title', 'subagent', 'purpose', 'input', 'prompt', 'context',
+                 'dependencies', 'status', 'duration', 'error', 'log', 'attempts', 'stderr',
+                 '_status_line', '_duration_line', '_log_line', '_last_line')
+    
+    def __init__(self, number: int, title: str):
+        self.number = number
+        self.title = title
+        self.subagent = ''
+        self.purpose = ''
+        self.input = ''
+        self.prompt = ''
+        self.context: Optional[str] = None
+        self.dependencies: List[int] = []
+        self.status = PENDING
+        self.duration: Optional[float] = None
+        self.error: Optional[str] = None
+        # Path of the run log holding the step's output
+        self.log: Optional[str] = None
+        # Runs of the step so far, including retries
+        self.attempts = 0
+        # Error output of the last attempt, used to decide whether to retry
+        self.stderr = ''
+        self._status_line: Optional[int] = None
+        self._duration_line: Optional[int] = None
+        self._log_line: Optional[int] = None
+        self._last_line = 0
+    
+    def __repr__(self) -> str:
+        return f"PlanStep({self.number}, {self.subagent!r}, {self.status})"
+
+def parse_dependencies(text: str) -> List[int]:
+    """Parse a Dependencies field such as ``None``, ``Step 1, Step 2`` or ``Steps 1-3``."""
+    if not text or text.strip().lower().startswith(('none', 'n/a', '-')):
+        return []
+    
+    numbers = set()
+    for start, end in _STEP_RANGE.findall(text):
+        numbers.update(range(int(start), int(end) + 1))
+    numbers.update(int(number) for number in _STEP_NUMBER.findall(_STEP_RANGE.sub('', text)))
+    return sorted(numbers)
+
+def _parse_cli_command(command: str, step: PlanStep) -> None:
+    """Take the prompt and context from a ``subagents invoke`` command line."""
+    try:
+        argv = shlex.split(command)
+    except ValueError:
+        return
+    if 'invoke' not in argv:
+        return
+    
+    args = argv[argv.index('invoke') + 1:]
+    for i, arg in enumerate(args):
+        value = args[i + 1] if i + 1 < len(args) else None
+        if arg in ('--prompt', '-p') and value is not None:
+            step.prompt = value
+        elif arg in ('--context', '-c') and value is not None:
+            step.context = value
+        elif not arg.startswith('-') and not step.subagent and i == 0:
+            step.subagent = arg
+
+class Plan:
+    """Steps of a plan file plus what is needed to write their status back."""
+    
+    def __init__(self, path: Path, lines: List[str], steps: List[PlanStep],
+                 status_line: Optional[int]):
+        self.path = path
+        self.lines = lines
+        self.steps = steps
+        self.status: Optional[str] = None
+        self._status_line = status_line
+        self._lock = threading.Lock()
+    
+    @property
+    def by_number(self) -> Dict[int, PlanStep]:
+        return {step.number: step for step in self.steps}
+    
+    @classmethod
+    def load(cls, path: Path) -> 'Plan':
+        """Parse a plan file.
+        
+        Raises:
+            FileNotFoundError: If the plan file does not exist
+            ValueError: If the plan has no steps, a step has no subagent, or its
+                dependencies are unknown or circular
+        """
+        if not path.exists():
+            raise FileNotFoundError(f"Plan file not found: {path}")
+        return cls.parse(path.read_text(encoding='utf-8'), path)
+    
+    @classmethod
+    def parse(cls, text: str, path: Path) -> 'Plan':
+        lines = text.split('\n')
+        steps: List[PlanStep] = []
+        status_line = None
+        current: Optional[PlanStep] = None
+        in_command = False
+        command_lines: List[str] = []
+        
+        for index, line in enumerate(lines):
+            if in_command:
+                # Collect the fenced command block, which may span several lines
+                if line.strip().startswith('```') and command_lines:
+                    _parse_cli_command('\n'.join(command_lines), current)
+                    in_command = False
+                elif not line.strip().startswith('```'):
+                    command_lines.append(line)
+                continue
+            
+            heading = _STEP_HEADING.match(line)
+            if heading:
+                current = PlanStep(int(heading.group(1)), heading.group(2))
+                current._last_line = index
+                steps.append(current)
+                continue
+            if current is None:
+                if status_line is None and _PLAN_STATUS.match(line):
+                    status_line = index
+                continue
+            if line.startswith('#'):
+                # Any other heading ends the step section
+                current = None
+                continue
+            
+            field = _FIELD.match(line)
+            if field is None:
+                continue
+            current._last_line = index
+            name, value = field.group(1).lower(), field.group(2)
+            if name == 'subagent':
+                current.subagent = value.strip('` ')
+            elif name == 'cli command':
+                if value.strip('` '):
+                    _parse_cli_command(value.strip('` '), current)
+                else:
+                    in_command, command_lines = True, []
+            elif name == 'dependencies':
+                current.dependencies = parse_dependencies(value)
+            elif name == 'status':
+                status = _STATUS_WORD.search(value.upper())
+                current.status = status.group(0) if status else PENDING
+                current._status_line = index
+            elif name == 'duration':
+                current._duration_line = index
+                seconds = re.match(r'\s*(\d+(?:\.\d+)?)', value)
+                current.duration = float(seconds.group(1)) if seconds else None
+            elif name == 'log':
+                current._log_line = index
+                current.log = value.strip('` ') or None
+            elif name == 'purpose':
+                current.purpose = value
+            elif name == 'input':
+                current.input = value
+        
+        for step in steps:
+            # Steps without a CLI command are described by their purpose and input
+            if not step.prompt:
+                step.prompt = step.purpose
+                step.context = step.context or step.input or None
+        
+        plan = cls(path, lines, steps, status_line)
+        plan.validate()
+        return plan
+    
+    def validate(self) -> None:
+        """Check that every step has a subagent and the dependencies form a DAG.
+        
+        Raises:
+            ValueError: If the plan is not executable
+        """
+        if not self.steps:
+            raise ValueError(f"No steps found in plan {self.path}")
+        
+        steps = self.by_number
+        if len(steps) != len(self.steps):
+            raise ValueError(f"Duplicate step numbers in plan {self.path}")
+        for step in self.steps:
+            if not step.subagent:
+                raise ValueError(f"Step {step.number} has no subagent")
+            unknown = [number for number in step.dependencies if number not in steps]
+            if unknown:
+                raise ValueError(f"Step {step.number} depends on unknown step(s): "
+                                 f"{', '.join(map(str, unknown))}")
+        
+        # Kahn's algorithm: anything left over is part of a cycle
+        remaining = {step.number: len(step.dependencies) for step in self.steps}
+        dependents = self.dependents()
+        ready = [number for number, count in remaining.items() if count == 0]
+        while ready:
+            number = ready.pop()
+            del remaining[number]
+            for dependent in dependents[number]:
+                remaining[dependent] -= 1
+                if remaining[dependent] == 0:
+                    ready.append(dependent)
+        if remaining:
+            raise ValueError(f"Circular dependencies between steps: "
+                             f"{', '.join(map(str, sorted(remaining)))}")
+    
+    def dependents(self) -> Dict[int, List[int]]:
+        """Map each step number to the steps that directly depend on it."""
+        dependents: Dict[int, List[int]] = {step.number: [] for step in self.steps}
+        for step in self.steps:
+            for number in step.dependencies:
+                dependents[number].append(step.number)
+        return dependents
+    
+    def render(self) -> str:
+        """Plan text with each step's current status and duration written in."""
+        replacements: Dict[int, List[str]] = {}
+        insertions: Dict[int, List[str]] = {}
+        for step in self.steps:
+            fields = [f"- **Status**: {step.status}"]
+            if step.duration is not None:
+                fields.append(f"- **Duration**: {step.duration:.1f}s")
+            if step.log:
+                fields.append(f"- **Log**: `{step.log}`")
+            for line in (step._duration_line, step._log_line):
+                if line is not None:
+                    replacements[line] = []
+            if step._status_line is not None:
+                replacements[step._status_line] = fields
+            else:
+                insertions[step._last_line] = fields
+        if self.status is not None and self._status_line is not None:
+            replacements[self._status_line] = [f"**Status**: {self.status}"]
+        
+        output = []
+        for index, line in enumerate(self.lines):
+            output.extend(replacements.get(index, [line]))
+            output.extend(insertions.get(index, []))
+        return '\n'.join(output)
+    
+    def save(self) -> None:
+        """Atomically rewrite the plan file with the current step states."""
+        with self._lock:
+            text = self.render()
+            fd, tmp_path = tempfile.mkstemp(dir=self.path.parent, suffix='.tmp')
+            with os.fdopen(fd, 'w', encoding='utf-8') as tmp_file:
+                tmp_file.write(text)
+            os.replace(tmp_path, self.path)
+
+# Runs one step and returns its exit code, optionally setting the step's log,
+# error and stderr; exceptions count as failures
+StepRunner = Callable[[PlanStep], int]
+
+class PlanExecutor:
+    """Run plan steps concurrently as soon as their dependencies complete.
+    
+    Steps already marked COMPLETED are treated as done, so re-running a plan
+    resumes where it stopped. With ``fail_fast`` no new steps start after the
+    first failure; otherwise only the dependents of failed steps are skipped.
+    Failures the retry policy classifies as transient are retried after a
+    backoff delay before the step counts as failed.
+    """
+    
+    def __init__(self, plan: Plan, runner: StepRunner, max_workers: int = 4,
+                 fail_fast: bool = False, write_back: bool = True,
+                 on_update: Optional[Callable[[PlanStep], None]] = None,
+                 retry: Optional['RetryPolicy'] = None,
+                 on_retry: Optional[Callable[[PlanStep, float], None]] = None,
+                 on_finish: Optional[Callable[[PlanStep], None]] = None,
+                 on_interrupt: Optional[Callable[[], Any]] = None,
+                 sleep: Callable[[float], None] = time.sleep):
+        self.plan = plan
+        self.runner = runner
+        self.max_workers = max_workers
+        self.fail_fast = fail_fast
+        self.write_back = write_back
+        self.on_update = on_update
+        self.retry = retry
+        # Called from the worker thread before it waits to retry a step
+        self.on_retry = on_retry
+        # Called once a step has reached its final state in this run, e.g. to checkpoint it
+        self.on_finish = on_finish
+        # Called on Ctrl-C so running steps stop before the workers are joined
+        self.on_interrupt = on_interrupt
+        self.sleep = sleep
+        self._interrupted = False
+    
+    def run(self) -> bool:
+        """Execute the plan and return True if every step completed."""
+        steps = self.plan.by_number
+        dependents = self.plan.dependents()
+        waiting = {step.number: {number for number in step.dependencies
+                                 if steps[number].status != COMPLETED}
+                   for step in self.plan.steps if step.status != COMPLETED}
+        
+        self.plan.status = IN_PROGRESS
+        self._update(None)
+        stopped = False
+        
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            running = {}
+            while True:
+                if not stopped:
+                    for number in sorted(waiting):
+                        if not waiting[number] and len(running) < self.max_workers:
+                            del waiting[number]
+                            step = steps[number]
+                            step.status, step.error, step.duration, step.log = IN_PROGRESS, None, None, None
+                            step.attempts, step.stderr = 0, ''
+                            self._update(step)
+                            running[executor.submit(self._run_step, step)] = step
+                if not running:
+                    break
+                
+                try:
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+                except KeyboardInterrupt:
+                    # Steps that are still running fail without being retried
+                    self._interrupted = True
+                    if self.on_interrupt is not None:
+                        self.on_interrupt()
+                    raise
+                for future in done:
+                    step = running.pop(future)
+                    self._update(step)
+                    self._finish(step)
+                    if step.status == COMPLETED:
+                        for dependent in dependents[step.number]:
+                            waiting.get(dependent, set()).discard(step.number)
+                        continue
+                    
+                    for number in self._transitive_dependents(step.number, dependents):
+                        if number in waiting:
+                            del waiting[number]
+                            steps[number].status = BLOCKED
+                            steps[number].error = f"Dependency step {step.number} failed"
+                            self._update(steps[number])
+                            self._finish(steps[number])
+                    if self.fail_fast:
+                        stopped = True
+        
+        for number in waiting:
+            steps[number].status = CANCELLED
+            self._update(steps[number])
+            self._finish(steps[number])
+        
+        success = all(step.status == COMPLETED for step in self.plan.steps)
+        self.plan.status = COMPLETED if success else FAILED
+        self._update(None)
+        return success
+    
+    def _run_step(self, step: PlanStep) -> None:
+        while True:
+            step.attempts += 1
+            start = time.monotonic()
+            try:
+                exit_code = self.runner(step)
+            except Exception as e:
+                # None: the backend did not run, so only the message can say if it is transient
+                exit_code, step.error = None, str(e)
+            step.duration = time.monotonic() - start
+            if exit_code == 0:
+                step.status = COMPLETED
+                return
+            
+            output = f"{step.error or ''}\n{step.stderr}"
+            if (self.retry is None or self._interrupted
+                    or not self.retry.should_retry(step.attempts, exit_code, output)):
+                step.status = FAILED
+                step.error = step.error or f"Exited with code {exit_code}"
+                return
+            
+            delay = self.retry.delay(step.attempts)
+            if self.on_retry is not None:
+                self.on_retry(step, delay)
+            self.sleep(delay)
+            if self._interrupted:
+                step.status = FAILED
+                return
+            step.error, step.stderr, step.log = None, '', None
+    
+    @staticmethod
+    def _transitive_dependents(number: int, dependents: Dict[int, List[int]]) -> List[int]:
+        found, stack = [], list(dependents[number])
+        while stack:
+            dependent = stack.pop()
+            if dependent not in found:
+                found.append(dependent)
+                stack.extend(dependents[dependent])
+        return found
+    
+    def _finish(self, step: PlanStep) -> None:
+        if self.on_finish is not None:
+            self.on_finish(step)
+    
+    def _update(self, step: Optional[PlanStep]) -> None:
+        if self.write_back:
+            self.plan.save()
+        if step is not None and self.on_update is not None:
+            self.on_update(step)
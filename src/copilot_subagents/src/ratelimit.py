@@ -0,0 +1,230 @@
+"""Per-model rate limits shared by every invocation on the machine.
+
+Each model gets a token bucket that refills at its requests-per-minute rate and
+a cap on concurrently running backends. The state lives in one SQLite database,
+``<subagents-dir>/state/ratelimit.sqlite``, and every update runs in an
+immediate transaction, so threads, ``run-plan`` workers and separate
+``subagents invoke`` processes all draw from the same budget. A running
+invocation holds a lease tagged with its process ID. Leases of processes that
+died without releasing them are reclaimed.
+
+Limits come from settings::
+
+    COPILOT_SUBAGENTS_RATE_LIMITS=gpt-5=60/4,claude-sonnet-4.5=30/2
+    COPILOT_SUBAGENTS_RATE_LIMIT_RPM=120
+    COPILOT_SUBAGENTS_RATE_LIMIT_CONCURRENCY=8
+
+Each ``RATE_LIMITS`` entry is ``model=requests-per-minute[/concurrency]``. Models
+not listed there, including subagents without a ``model``, use the
+``RATE_LIMIT_RPM`` and ``RATE_LIMIT_CONCURRENCY`` defaults. 0 means unlimited.
+"""
+
+import asyncio
+import os
+import sqlite3
+import time
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import AsyncIterator, Callable, Dict, NamedTuple, Optional, Tuple
+
+from config import SubagentsConfig, get_config
+from core import get_state_dir
+from tracing import span
+
+RATE_LIMIT_DB = 'ratelimit.sqlite'
+# Bucket key of subagents without a model
+DEFAULT_MODEL = 'default'
+# Seconds between checks for a free slot held by another invocation
+POLL_INTERVAL = 0.25
+# Seconds to wait for another process's transaction before giving up
+LOCK_TIMEOUT = 30.0
+# Longest sleep between attempts, so a changed limit takes effect soon
+MAX_WAIT = 60.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS buckets (model TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL);
+CREATE TABLE IF NOT EXISTS leases (id INTEGER PRIMARY KEY, model TEXT NOT NULL, pid INTEGER NOT NULL,
+                                   acquired REAL NOT NULL);
+CREATE INDEX IF NOT EXISTS leases_model ON leases (model);
+"""
+
+class ModelLimit(NamedTuple):
+    """Rate limit of one model; 0 means unlimited."""
+    
+    requests_per_minute: float = 0
+    concurrency: int = 0
+    # Requests that may start back to back after an idle period
+    burst: int = 1
+    
+    @property
+    def unlimited(self) -> bool:
+        return not self.requests_per_minute and not self.concurrency
+
+def parse_rate_limits(value: Optional[str]) -> Dict[str, ModelLimit]:
+    """Parse ``model=rpm[/concurrency]`` entries separated by commas.
+    
+    Raises:
+        ValueError: If an entry is malformed
+    """
+    limits: Dict[str, ModelLimit] = {}
+    for entry in (value or '').split(','):
+        if not entry.strip():
+            continue
+        model, _, spec = entry.rpartition('=')
+        rpm, _, concurrency = spec.partition('/')
+        try:
+            limit = ModelLimit(float(rpm), int(concurrency or 0))
+        except ValueError:
+            limit = None
+        if not model.strip() or limit is None or min(limit.requests_per_minute, limit.concurrency) < 0:
+            raise ValueError(f"Invalid rate limit {entry.strip()!r}; expected model=rpm[/concurrency]")
+        limits[model.strip()] = limit
+    return limits
+
+class RateLimiter:
+    """Token buckets and concurrency caps per model, coordinated through SQLite."""
+    
+    def __init__(self, path: Path, limits: Optional[Dict[str, ModelLimit]] = None,
+                 default: ModelLimit = ModelLimit(), clock: Callable[[], float] = time.time):
+        self.path = Path(path)
+        self.limits = dict(limits or {})
+        self.default = default
+        self._clock = clock
+        self._initialized = False
+    
+    @classmethod
+    def from_config(cls, subagents_dir: Path,
+                    config: Optional[SubagentsConfig] = None) -> Optional['RateLimiter']:
+        """Limiter for the configured limits, or None if no model is limited.
+        
+        Raises:
+            ValueError: If ``COPILOT_SUBAGENTS_RATE_LIMITS`` is malformed
+        """
+        config = config or get_config()
+        burst = max(config.get_int('RATE_LIMIT_BURST', 1), 1)
+        limits = {model: limit._replace(burst=burst)
+                  for model, limit in parse_rate_limits(config.get('RATE_LIMITS')).items()}
+        default = ModelLimit(config.get_float('RATE_LIMIT_RPM', 0),
+                             config.get_int('RATE_LIMIT_CONCURRENCY', 0), burst)
+        if default.unlimited and all(limit.unlimited for limit in limits.values()):
+            return None
+        return cls(get_state_dir(Path(subagents_dir)) / RATE_LIMIT_DB, limits, default)
+    
+    def limit_for(self, model: Optional[str]) -> ModelLimit:
+        return self.limits.get(model or DEFAULT_MODEL, self.default)
+    
+    def _connect(self) -> sqlite3.Connection:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        connection = sqlite3.connect(self.path, timeout=LOCK_TIMEOUT, isolation_level=None)
+        if not self._initialized:
+            connection.executescript(_SCHEMA)
+            self._initialized = True
+        return connection
+    
+    def try_acquire(self, model: Optional[str]) -> Tuple[Optional[int], float]:
+        """Take a request token and a concurrency slot for ``model`` if both are free.
+        
+        Returns:
+            Tuple of (lease ID, 0) on success, or (None, seconds to wait before trying again);
+            the lease ID is 0 when the model has no concurrency cap
+        """
+        key = model or DEFAULT_MODEL
+        limit = self.limit_for(model)
+        connection = self._connect()
+        try:
+            connection.execute('BEGIN IMMEDIATE')
+            if limit.concurrency:
+                self._reclaim(connection, key)
+                (running,) = connection.execute('SELECT COUNT(*) FROM leases WHERE model = ?', (key,)).fetchone()
+                if running >= limit.concurrency:
+                    connection.execute('ROLLBACK')
+                    return None, POLL_INTERVAL
+            
+            now = self._clock()
+            if limit.requests_per_minute:
+                rate = limit.requests_per_minute / 60
+                row = connection.execute('SELECT tokens, updated FROM buckets WHERE model = ?', (key,)).fetchone()
+                tokens = limit.burst if row is None else min(limit.burst, row[0] + max(now - row[1], 0) * rate)
+                if tokens < 1:
+                    connection.execute('ROLLBACK')
+                    return None, (1 - tokens) / rate
+                connection.execute('INSERT OR REPLACE INTO buckets (model, tokens, updated) VALUES (?, ?, ?)',
+                                   (key, tokens - 1, now))
+            
+            lease = 0
+            if limit.concurrency:
+                lease = connection.execute('INSERT INTO leases (model, pid, acquired) VALUES (?, ?, ?)',
+                                           (key, os.getpid(), now)).lastrowid
+            connection.execute('COMMIT')
+            return lease, 0.0
+        except BaseException:
+            if connection.in_transaction:
+                connection.execute('ROLLBACK')
+            raise
+        finally:
+            connection.close()
+    
+    @staticmethod
+    def _reclaim(connection: sqlite3.Connection, key: str) -> None:
+        """Drop leases of processes that exited without releasing them."""
+        for lease, pid in connection.execute('SELECT id, pid FROM leases WHERE model = ?', (key,)).fetchall():
+            if not _process_alive(pid):
+                connection.execute('DELETE FROM leases WHERE id = ?', (lease,))
+    
+    def release(self, lease: int) -> None:
+        if not lease:
+            return
+        connection = self._connect()
+        try:
+            connection.execute('DELETE FROM leases WHERE id = ?', (lease,))
+        finally:
+            connection.close()
+    
+    async def acquire(self, model: Optional[str]) -> int:
+        """Wait until ``model`` has a free token and slot, without blocking the event loop.
+        
+        Returns:
+            Lease ID to pass to :meth:`release`
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            future = loop.run_in_executor(None, self.try_acquire, model)
+            try:
+                lease, delay = await asyncio.shield(future)
+            except asyncio.CancelledError:
+                # The worker thread may still take a lease; give it back when it does
+                future.add_done_callback(self._release_abandoned)
+                raise
+            if lease is not None:
+                return lease
+            await asyncio.sleep(min(delay, MAX_WAIT))
+    
+    def _release_abandoned(self, future: 'asyncio.Future[Tuple[Optional[int], float]]') -> None:
+        if not future.cancelled() and future.exception() is None and future.result()[0]:
+            self.release(future.result()[0])
+    
+    @asynccontextmanager
+    async def slot(self, model: Optional[str]) -> AsyncIterator[None]:
+        """Hold a lease for ``model`` for the duration of the block."""
+        if self.limit_for(model).unlimited:
+            yield
+            return
+        with span('rate_limit', model=model or DEFAULT_MODEL):
+            lease = await self.acquire(model)
+        try:
+            yield
+        finally:
+            self.release(lease)
+
+def _process_alive(pid: int) -> bool:
+    if os.name != 'posix':
+        # os.kill would terminate the process; assume it is still running
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # Exists, but belongs to another user
+        return True
+    return True
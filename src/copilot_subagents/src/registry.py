@@ -0,0 +1,234 @@
+"""Persistent registry index of the subagents directory."""
+
+import hashlib
+import json
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from core import (STATE_DIRNAME, get_discovery_workers, get_state_dir, parse_frontmatter,
+                  read_frontmatter_block)
+
+INDEX_VERSION = 2
+INDEX_FILENAME = 'index.json'
+
+# Entries held in memory by a resident daemon, keyed by index path (None when disabled)
+_RESIDENT_ENTRIES: Optional[Dict[str, List['IndexEntry']]] = None
+
+def enable_resident_registry() -> None:
+    """Keep refreshed entries in memory until ``invalidate_resident_registry`` is called.
+    
+    Only long-running processes that watch the subagents directory for changes
+    should enable this.
+    """
+    global _RESIDENT_ENTRIES
+    if _RESIDENT_ENTRIES is None:
+        _RESIDENT_ENTRIES = {}
+
+def disable_resident_registry() -> None:
+    """Stop keeping entries in memory."""
+    global _RESIDENT_ENTRIES
+    _RESIDENT_ENTRIES = None
+
+def invalidate_resident_registry() -> None:
+    """Drop all in-memory entries so the next refresh checks the files again."""
+    if _RESIDENT_ENTRIES is not None:
+        _RESIDENT_ENTRIES.clear()
+
+class IndexEntry:
+    """Indexed frontmatter of a single subagent file."""
+    
+    __slots__ = ('name', 'mtime_ns', 'size', 'sha256', 'frontmatter', 'error')
+    
+    def __init__(self, name: str, mtime_ns: int, size: int, sha256: str,
+                 frontmatter: Optional[Dict[str, Any]] = None, error: Optional[str] = None):
+        self.name = name
+        self.mtime_ns = mtime_ns
+        self.size = size
+        self.sha256 = sha256
+        self.frontmatter = frontmatter or {}
+        self.error = error
+    
+    @property
+    def description(self) -> str:
+        return self.frontmatter.get('description', 'No description')
+    
+    @property
+    def allowed_tools(self) -> List[str]:
+        return self.frontmatter.get('allowed_tools', [])
+    
+    @property
+    def denied_tools(self) -> List[str]:
+        return self.frontmatter.get('deny_tools', [])
+    
+    def to_json(self) -> Dict[str, Any]:
+        return {
+            'mtime_ns': self.mtime_ns,
+            'size': self.size,
+            'sha256': self.sha256,
+            'frontmatter': self.frontmatter,
+            'error': self.error
+        }
+    
+    @classmethod
+    def from_json(cls, name: str, data: Dict[str, Any]) -> 'IndexEntry':
+        return cls(name, data['mtime_ns'], data['size'], data['sha256'],
+                   data.get('frontmatter'), data.get('error'))
+
+class SubagentIndex:
+    """On-disk index of subagent frontmatter keyed by path, mtime, size and content hash.
+    
+    The content hash covers the frontmatter block only, so neither indexing nor
+    listing ever reads prompt bodies.
+    """
+    
+    def __init__(self, subagents_dir: Path, index_path: Optional[Path] = None,
+                 workers: Optional[int] = None):
+        self.subagents_dir = subagents_dir
+        self.index_path = index_path or get_state_dir(subagents_dir) / INDEX_FILENAME
+        self.workers = workers or get_discovery_workers()
+        self._entries: Dict[str, IndexEntry] = {}
+        self._dirty = False
+    
+    def load(self) -> None:
+        """Load the persisted index, discarding it if unreadable or outdated."""
+        self._entries = {}
+        try:
+            data = json.loads(self.index_path.read_text())
+        except (OSError, ValueError):
+            return
+        
+        if not isinstance(data, dict) or data.get('version') != INDEX_VERSION:
+            return
+        
+        for name, entry in data.get('entries', {}).items():
+            try:
+                self._entries[name] = IndexEntry.from_json(name, entry)
+            except (KeyError, TypeError):
+                continue
+    
+    def save(self) -> None:
+        """Atomically write the index next to the subagent files."""
+        data = {
+            'version': INDEX_VERSION,
+            'entries': {name: entry.to_json() for name, entry in sorted(self._entries.items())}
+        }
+        
+        try:
+            self.index_path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.index_path.parent, suffix='.tmp')
+            with os.fdopen(fd, 'w') as tmp_file:
+                json.dump(data, tmp_file, default=str)
+            os.replace(tmp_path, self.index_path)
+        except OSError:
+            # A read-only checkout still lists fine, it just re-parses next time
+            return
+        self._dirty = False
+    
+    def discover(self) -> List[Tuple[str, Path]]:
+        """Recursively find subagent files, named by their path relative to the directory.
+        
+        Files in nested team folders get namespaced names such as ``team/agent``.
+        READMEs, hidden folders and the state directory are skipped.
+        """
+        if not self.subagents_dir.exists():
+            return []
+        
+        found = []
+        for path in self.subagents_dir.rglob("*.md"):
+            relative = path.relative_to(self.subagents_dir)
+            folders = relative.parts[:-1]
+            if path.name == "README.md" or STATE_DIRNAME in folders:
+                continue
+            if any(folder.startswith('.') for folder in folders):
+                continue
+            found.append((relative.with_suffix('').as_posix(), path))
+        
+        return sorted(found)
+    
+    def refresh(self) -> List[IndexEntry]:
+        """Bring the index up to date and return its entries sorted by name.
+        
+        Files whose mtime and size are unchanged reuse their indexed frontmatter;
+        changed files are hashed and only re-parsed if their content differs.
+        Files are checked in a thread pool and a failure in one file only marks
+        that entry as errored.
+        """
+        resident_key = str(self.index_path)
+        if _RESIDENT_ENTRIES is not None and resident_key in _RESIDENT_ENTRIES:
+            return list(_RESIDENT_ENTRIES[resident_key])
+        
+        self.load()
+        
+        discovered = self.discover()
+        previous = [self._entries.get(name) for name, _ in discovered]
+        
+        if self.workers > 1 and len(discovered) > 1:
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                refreshed = list(executor.map(_refresh_entry, discovered, previous))
+        else:
+            refreshed = [_refresh_entry(item, entry) for item, entry in zip(discovered, previous)]
+        
+        entries = {}
+        for entry, old_entry in zip(refreshed, previous):
+            entries[entry.name] = entry
+            if entry is not old_entry:
+                self._dirty = True
+        
+        if set(entries) != set(self._entries):
+            self._dirty = True
+        self._entries = entries
+        
+        if self._dirty:
+            self.save()
+        
+        entries_list = [self._entries[name] for name in sorted(self._entries)]
+        if _RESIDENT_ENTRIES is not None:
+            _RESIDENT_ENTRIES[resident_key] = entries_list
+        return list(entries_list)
+    
+    def rebuild(self) -> List[IndexEntry]:
+        """Discard the persisted index and re-parse every subagent file."""
+        if _RESIDENT_ENTRIES is not None:
+            _RESIDENT_ENTRIES.pop(str(self.index_path), None)
+        try:
+            self.index_path.unlink()
+        except FileNotFoundError:
+            pass
+        return self.refresh()
+
+def _refresh_entry(item: Tuple[str, Path], entry: Optional[IndexEntry]) -> IndexEntry:
+    """Return the up-to-date index entry for a discovered file.
+    
+    The previous entry is returned unchanged when the file's stat matches it.
+    """
+    name, path = item
+    try:
+        stat = path.stat()
+        if entry is not None and entry.mtime_ns == stat.st_mtime_ns and entry.size == stat.st_size:
+            return entry
+        
+        try:
+            frontmatter_yaml, _ = read_frontmatter_block(path)
+        except ValueError as e:
+            frontmatter_yaml, error = b'', str(e)
+        else:
+            error = None
+    except OSError as e:
+        return IndexEntry(name, 0, 0, '', None, str(e))
+    
+    sha256 = hashlib.sha256(frontmatter_yaml).hexdigest()
+    if entry is not None and entry.sha256 == sha256 and entry.error == error:
+        # Touched or body edited: keep the parsed frontmatter
+        return IndexEntry(name, stat.st_mtime_ns, stat.st_size, sha256, entry.frontmatter, error)
+    
+    frontmatter = {}
+    if error is None:
+        try:
+            frontmatter = parse_frontmatter(frontmatter_yaml, path)
+        except ValueError as e:
+            error = str(e)
+    
+    return IndexEntry(name, stat.st_mtime_ns, stat.st_size, sha256, frontmatter, error)
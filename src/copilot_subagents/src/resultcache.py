@@ -0,0 +1,286 @@
+"""Opt-in on-disk cache of successful invocation results.
+
+Entries live in ``<subagents-dir>/state/results`` as ``<key>.json`` (the
+result) plus ``<key>.log`` (the full output, replayed on a hit). The key
+covers the parsed agent, the complete backend command (model and tool flags,
+with the full prompt standing in as its digest however it is delivered) and
+the contents of declared input files, so any change that could
+alter the output misses the cache.
+
+The cache is bounded in bytes and evicts the least recently used entries.
+Identical invocations that run at the same time are coalesced with a lock file
+per key, so only one backend process runs and the others reuse its result. This
+also works across processes.
+"""
+
+import asyncio
+import dataclasses
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from typing import IO, Any, Callable, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not available on Windows
+    fcntl = None
+
+from config import SubagentsConfig, get_config
+from core import get_state_dir
+from limits import ResourceLimits
+from ratelimit import RateLimiter
+from invocation import InvocationResult, OutputLine, run_command
+from runlog import RunLog, read_run_log, run_log_files
+from tracing import span
+
+CACHE_DIRNAME = 'results'
+CACHE_VERSION = 1
+DEFAULT_RESULT_CACHE_MAX_BYTES = 512 * 1024 * 1024
+
+def hash_file(path: Path) -> str:
+    """SHA-256 of a file's contents, read in chunks.
+    
+    Raises:
+        OSError: If the file cannot be read
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as input_file:
+        for chunk in iter(lambda: input_file.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def result_cache_key(subagent: Dict[str, Any], command: Sequence[str],
+                     input_files: Iterable[Path] = ()) -> str:
+    """Cache key of an invocation.
+    
+    Args:
+        subagent: Parsed subagent data
+        command: Backend command with the prompt as a digest, see ``BackendCommand.cache_parts``
+        input_files: Files the task reads, hashed by content
+        
+    Raises:
+        OSError: If an input file cannot be read
+    """
+    agent_hash = hashlib.sha256(json.dumps(subagent, sort_keys=True, default=str).encode()).hexdigest()
+    files = sorted((str(path), hash_file(Path(path))) for path in input_files)
+    payload = json.dumps([CACHE_VERSION, agent_hash, list(command), files])
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+def is_result_cache_enabled(override: Optional[bool] = None,
+                            config: Optional[SubagentsConfig] = None) -> bool:
+    """Whether to use the result cache: the ``--cache/--no-cache`` flag or ``COPILOT_SUBAGENTS_RESULT_CACHE``."""
+    if override is not None:
+        return override
+    return (config or get_config()).get_bool('RESULT_CACHE')
+
+class ResultCache:
+    """Successful invocation results keyed by :func:`result_cache_key`."""
+    
+    def __init__(self, subagents_dir: Path, max_bytes: Optional[int] = None,
+                 cache_dir: Optional[Path] = None, config: Optional[SubagentsConfig] = None):
+        config = config or get_config()
+        self.cache_dir = cache_dir or get_state_dir(Path(subagents_dir)) / CACHE_DIRNAME
+        self.max_bytes = (max_bytes if max_bytes is not None
+                          else config.get_int('RESULT_CACHE_MAX_BYTES', DEFAULT_RESULT_CACHE_MAX_BYTES))
+    
+    def _paths(self, key: str) -> Tuple[Path, Path, Path]:
+        base = self.cache_dir / key
+        return base.with_suffix('.json'), base.with_suffix('.log'), base.with_suffix('.lock')
+    
+    def get(self, key: str) -> Optional[InvocationResult]:
+        """Return the cached result for a key and mark it as recently used."""
+        meta_path, log_path, _ = self._paths(key)
+        try:
+            data = json.loads(meta_path.read_text())
+        except (OSError, ValueError):
+            return None
+        if not isinstance(data, dict) or data.get('version') != CACHE_VERSION or not log_path.exists():
+            return None
+        
+        try:
+            # The metadata mtime is the entry's last use for LRU eviction
+            os.utime(meta_path)
+        except OSError:
+            pass
+        return InvocationResult(
+            command=tuple(data['command']),
+            returncode=data['returncode'],
+            started_at=data['started_at'],
+            duration=data['duration'],
+            first_output=data.get('first_output'),
+            stdout=data.get('stdout', ''),
+            stderr=data.get('stderr', ''),
+            log_path=log_path,
+            cached=True
+        )
+    
+    def put(self, key: str, result: InvocationResult) -> None:
+        """Store a successful result with a copy of its full output, then evict old entries."""
+        if not result.success:
+            return
+        
+        meta_path, log_path, _ = self._paths(key)
+        # Temporary file not yet moved into place, removed if anything fails
+        tmp_path = None
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            # Output first: an entry only exists once its metadata is in place
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+            os.close(fd)
+            if result.log_path is not None:
+                with open(tmp_path, 'wb') as output:
+                    for log_file in run_log_files(result.log_path):
+                        with open(log_file, 'rb') as source:
+                            shutil.copyfileobj(source, output)
+            else:
+                with RunLog(Path(tmp_path), max_bytes=0) as output:
+                    for stream, text in (('stdout', result.stdout), ('stderr', result.stderr)):
+                        for line in text.splitlines():
+                            output.write(stream, line, 0.0)
+            os.replace(tmp_path, log_path)
+            tmp_path = None
+            
+            data = {
+                'version': CACHE_VERSION,
+                'command': list(result.command),
+                'returncode': result.returncode,
+                'started_at': result.started_at,
+                'duration': result.duration,
+                'first_output': result.first_output,
+                'stdout': result.stdout,
+                'stderr': result.stderr,
+            }
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+            with os.fdopen(fd, 'w') as tmp_file:
+                json.dump(data, tmp_file)
+            os.replace(tmp_path, meta_path)
+            tmp_path = None
+        except (OSError, TypeError, ValueError):
+            # A read-only state directory or an unserializable result just means no caching
+            return
+        finally:
+            if tmp_path is not None:
+                try:
+                    os.unlink(tmp_path)
+                except OSError:
+                    pass
+        self.evict()
+    
+    def evict(self) -> List[str]:
+        """Remove least recently used entries until the cache fits in ``max_bytes``.
+        
+        Returns:
+            Keys of the removed entries
+        """
+        entries = []
+        total = 0
+        for meta_path in self.cache_dir.glob('*.json'):
+            log_path = meta_path.with_suffix('.log')
+            try:
+                stat = meta_path.stat()
+                size = stat.st_size + (log_path.stat().st_size if log_path.exists() else 0)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, meta_path.stem, size))
+            total += size
+        
+        evicted = []
+        for _, key, size in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            meta_path, log_path, lock_path = self._paths(key)
+            for path in (meta_path, log_path):
+                try:
+                    path.unlink()
+                except OSError:
+                    pass
+            self._remove_idle_lock(lock_path)
+            total -= size
+            evicted.append(key)
+        return evicted
+    
+    @staticmethod
+    def _remove_idle_lock(lock_path: Path) -> None:
+        if fcntl is None or not lock_path.exists():
+            return
+        try:
+            with open(lock_path, 'a') as lock_file:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                lock_path.unlink()
+        except OSError:
+            # Held by a running invocation; it stays for the next eviction
+            pass
+    
+    async def _acquire(self, key: str) -> Optional[IO[str]]:
+        """Take the key's lock file without blocking the event loop."""
+        if fcntl is None:
+            return None
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            lock_file = open(self._paths(key)[2], 'a')
+        except OSError:
+            return None
+        
+        future = asyncio.get_running_loop().run_in_executor(
+            None, fcntl.flock, lock_file.fileno(), fcntl.LOCK_EX)
+        try:
+            await asyncio.shield(future)
+        except asyncio.CancelledError:
+            # The worker thread may still get the lock; release it when it does
+            future.add_done_callback(lambda _: lock_file.close())
+            raise
+        except OSError:
+            lock_file.close()
+            return None
+        return lock_file
+    
+    async def run(self, key: str, command: Sequence[str],
+                  on_output: Optional[Callable[[OutputLine], Any]] = None,
+                  env: Optional[Mapping[str, str]] = None, log: Optional[RunLog] = None,
+                  stdin: Optional[Path] = None,
+                  limits: Optional[ResourceLimits] = None, rate_limiter: Optional[RateLimiter] = None,
+                  model: Optional[str] = None) -> InvocationResult:
+        """Return the cached result for ``key`` or run the command and cache its result.
+        
+        A hit replays the stored output to ``on_output`` and ``log`` without
+        counting against the model's rate limit. While one
+        invocation of a key runs, identical ones wait for it and reuse its
+        result instead of starting their own backend.
+        
+        Raises:
+            FileNotFoundError: If the command's binary is not installed
+        """
+        with span('cache_lookup') as phase:
+            cached = self.get(key)
+            phase.set(hit=cached is not None)
+        if cached is None:
+            lock_file = await self._acquire(key)
+            try:
+                # Another invocation may have finished while we waited
+                cached = self.get(key)
+                if cached is None:
+                    result = await run_command(command, on_output=on_output, env=env, log=log, stdin=stdin,
+                                               limits=limits, rate_limiter=rate_limiter, model=model)
+                    self.put(key, result)
+                    return result
+            finally:
+                if lock_file is not None:
+                    lock_file.close()
+        with span('cache_replay'):
+            return self._replay(cached, on_output, log)
+    
+    @staticmethod
+    def _replay(cached: InvocationResult, on_output: Optional[Callable[[OutputLine], Any]],
+                log: Optional[RunLog]) -> InvocationResult:
+        for stream, text, elapsed in read_run_log(cached.log_path):
+            if on_output is not None:
+                on_output(OutputLine(stream, text, elapsed))
+            if log is not None:
+                log.write(stream, text, elapsed)
+        if log is None:
+            return cached
+        log.close()
+        return dataclasses.replace(cached, log_path=log.path)
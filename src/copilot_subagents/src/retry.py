@@ -0,0 +1,86 @@
+"""Classify backend failures and space out retries of transient ones.
+
+A failure is retried only when it looks transient: a known transient message
+in the output (rate limits, timeouts, dropped connections, 5xx responses) or a
+retryable exit code such as a process killed by a signal. Messages that point
+at a permanent problem, like a permission or authentication error, are never
+retried even if the exit code would be. Delays grow exponentially with random
+jitter, so steps that failed together do not all retry at the same moment.
+"""
+
+import random
+import re
+from typing import Optional, Pattern, Sequence
+
+from config import SubagentsConfig, get_config
+
+DEFAULT_RETRIES = 2
+DEFAULT_RETRY_BASE_DELAY = 2.0
+DEFAULT_RETRY_MAX_DELAY = 60.0
+
+# EX_TEMPFAIL from sysexits.h; negative codes mean the process was killed by a signal
+DEFAULT_RETRY_EXIT_CODES = (75,)
+
+TRANSIENT_PATTERNS = (
+    r'rate.?limit', r'too many requests', r'(?:http|status|code)\W*(?:429|5\d\d)\b',
+    r'internal server error', r'bad gateway', r'gateway timeout', r'service unavailable',
+    r'temporarily unavailable', r'timed? ?out', r'overloaded', r'try again',
+    r'connection (?:reset|refused|aborted|closed)', r'econnreset', r'etimedout', r'network error',
+)
+
+PERMANENT_PATTERNS = (
+    r'permission denied', r'not permitted', r'(?:un|not )authori[sz]ed', r'forbidden',
+    r'(?:http|status|code)\W*40[13]\b', r'authenticat', r'not logged in',
+    r'invalid (?:allowed|denied) tool', r'tool verification',
+)
+
+def _compile(patterns: Sequence[str]) -> Pattern[str]:
+    return re.compile('|'.join(f'(?:{pattern})' for pattern in patterns), re.IGNORECASE)
+
+class RetryPolicy:
+    """How often and how soon failed steps are retried."""
+    
+    def __init__(self, retries: int = DEFAULT_RETRIES, base_delay: float = DEFAULT_RETRY_BASE_DELAY,
+                 max_delay: float = DEFAULT_RETRY_MAX_DELAY,
+                 exit_codes: Sequence[int] = DEFAULT_RETRY_EXIT_CODES,
+                 transient_patterns: Sequence[str] = TRANSIENT_PATTERNS,
+                 permanent_patterns: Sequence[str] = PERMANENT_PATTERNS,
+                 rng: Optional[random.Random] = None):
+        self.retries = retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.exit_codes = frozenset(exit_codes)
+        self._transient = _compile(transient_patterns)
+        self._permanent = _compile(permanent_patterns)
+        self._rng = rng or random.Random()
+    
+    @classmethod
+    def from_config(cls, retries: Optional[int] = None,
+                    config: Optional[SubagentsConfig] = None) -> 'RetryPolicy':
+        """Policy from ``COPILOT_SUBAGENTS_RETRIES``, ``..._RETRY_BASE_DELAY`` and ``..._RETRY_MAX_DELAY``."""
+        config = config or get_config()
+        return cls(retries=retries if retries is not None else config.get_int('RETRIES', DEFAULT_RETRIES),
+                   base_delay=config.get_float('RETRY_BASE_DELAY', DEFAULT_RETRY_BASE_DELAY),
+                   max_delay=config.get_float('RETRY_MAX_DELAY', DEFAULT_RETRY_MAX_DELAY))
+    
+    def is_transient(self, returncode: Optional[int], output: str = '') -> bool:
+        """Whether a failure is worth retrying.
+        
+        Args:
+            returncode: Exit code of the backend, or None if it could not be run
+            output: Error output or message of the failure
+        """
+        if self._permanent.search(output):
+            return False
+        if self._transient.search(output):
+            return True
+        return returncode is not None and (returncode < 0 or returncode in self.exit_codes)
+    
+    def should_retry(self, attempt: int, returncode: Optional[int], output: str = '') -> bool:
+        """Whether to run again after failed attempt number ``attempt`` (starting at 1)."""
+        return attempt <= self.retries and self.is_transient(returncode, output)
+    
+    def delay(self, attempt: int) -> float:
+        """Seconds to wait after failed attempt number ``attempt``: exponential, with equal jitter."""
+        ceiling = min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+        return ceiling / 2 + self._rng.uniform(0, ceiling / 2)
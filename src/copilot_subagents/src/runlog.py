@@ -0,0 +1,153 @@
+"""Per-run log files for backend output.
+
+Every invocation writes its full output to its own file under
+``<subagents-dir>/state/logs``, so only a short tail needs to stay in memory or
+be copied into a plan. Files are rotated by size within a run and the oldest
+runs are pruned, so disk use is bounded as well.
+"""
+
+import os
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple
+
+from config import SubagentsConfig, get_config
+from core import get_state_dir
+
+LOGS_DIRNAME = 'logs'
+
+# Size at which a run's log is rotated to <name>.log.1, <name>.log.2, ...
+DEFAULT_LOG_MAX_BYTES = 10 * 1024 * 1024
+DEFAULT_LOG_BACKUPS = 3
+# Number of most recent runs whose logs are kept
+DEFAULT_LOG_RETENTION = 200
+# Lines of each stream kept in memory for summaries
+DEFAULT_TAIL_LINES = 200
+
+def get_tail_lines(config: Optional[SubagentsConfig] = None) -> int:
+    """Number of output lines per stream kept in memory (``COPILOT_SUBAGENTS_TAIL_LINES``)."""
+    return (config or get_config()).get_int('TAIL_LINES', DEFAULT_TAIL_LINES)
+
+def get_log_dir(subagents_dir: Path) -> Path:
+    """Directory holding the run logs of a subagents directory."""
+    return get_state_dir(Path(subagents_dir)) / LOGS_DIRNAME
+
+class RunLog:
+    """Output of one run, appended to a log file that is rotated by size.
+    
+    When the file grows past ``max_bytes`` it is renamed to ``<name>.1``
+    (earlier rotations move up, keeping at most ``backups``) and a new file is
+    started, so a run never uses more than ``(backups + 1) * max_bytes`` of disk.
+    Writes are serialized, so one log can be shared between threads.
+    """
+    
+    def __init__(self, path: Path, max_bytes: int = DEFAULT_LOG_MAX_BYTES,
+                 backups: int = DEFAULT_LOG_BACKUPS):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.path, 'ab')
+        self._size = self._file.tell()
+    
+    def __enter__(self) -> 'RunLog':
+        return self
+    
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+    
+    @property
+    def closed(self) -> bool:
+        return self._file.closed
+    
+    def write(self, stream: str, text: str, elapsed: float) -> None:
+        """Append one output line, prefixed with its time offset and stream."""
+        data = f"{elapsed:10.3f} {stream}: {text}\n".encode('utf-8', errors='replace')
+        with self._lock:
+            if self._file.closed:
+                return
+            if self.max_bytes and self._size and self._size + len(data) > self.max_bytes:
+                self._rotate()
+            self._file.write(data)
+            self._size += len(data)
+    
+    def _rotate(self) -> None:
+        self._file.close()
+        if self.backups > 0:
+            for index in range(self.backups - 1, 0, -1):
+                source = self.path.with_name(f"{self.path.name}.{index}")
+                if source.exists():
+                    os.replace(source, self.path.with_name(f"{self.path.name}.{index + 1}"))
+            os.replace(self.path, self.path.with_name(f"{self.path.name}.1"))
+            self._file = open(self.path, 'ab')
+        else:
+            self._file = open(self.path, 'wb')
+        self._size = 0
+    
+    def close(self) -> None:
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+
+def run_log_files(path: Path) -> List[Path]:
+    """A run's log file and its rotations, oldest first."""
+    path = Path(path)
+    rotations = [rotation for rotation in path.parent.glob(f"{path.name}.*")
+                 if rotation.suffix[1:].isdigit()]
+    rotations.sort(key=lambda rotation: int(rotation.suffix[1:]), reverse=True)
+    return rotations + ([path] if path.exists() else [])
+
+def read_run_log(path: Path) -> Iterator[Tuple[str, str, float]]:
+    """Read back ``(stream, text, elapsed)`` for each line of a run log, including rotations."""
+    for log_file in run_log_files(path):
+        with open(log_file, encoding='utf-8', errors='replace') as lines:
+            for line in lines:
+                elapsed, _, rest = line.rstrip('\n').lstrip().partition(' ')
+                stream, _, text = rest.partition(': ')
+                try:
+                    yield stream, text, float(elapsed)
+                except ValueError:
+                    continue
+
+def prune_run_logs(log_dir: Path, keep: int) -> List[Path]:
+    """Delete all but the ``keep`` most recent run logs, including their rotations.
+    
+    Returns:
+        The removed log files
+    """
+    # Log names start with a timestamp, so name order is run order
+    runs = sorted(Path(log_dir).glob('*.log'))
+    removed = []
+    for run in runs[:max(len(runs) - keep, 0)]:
+        for path in [run, *run.parent.glob(f"{run.name}.*")]:
+            try:
+                path.unlink()
+                removed.append(path)
+            except OSError:
+                continue
+    return removed
+
+def new_run_log(subagents_dir: Path, run_name: str,
+                config: Optional[SubagentsConfig] = None) -> RunLog:
+    """Create the log for a new run and prune logs of old runs.
+    
+    Args:
+        subagents_dir: Subagents directory whose state directory holds the logs
+        run_name: Name included in the file name, usually the subagent name
+        config: Configuration to read log settings from
+        
+    Raises:
+        OSError: If the log directory or file cannot be created
+    """
+    config = config or get_config()
+    log_dir = get_log_dir(subagents_dir)
+    prune_run_logs(log_dir, max(config.get_int('LOG_RETENTION', DEFAULT_LOG_RETENTION) - 1, 0))
+    
+    safe_name = run_name.replace('/', '__').replace(os.sep, '__')
+    file_name = f"{time.strftime('%Y%m%d-%H%M%S')}-{safe_name}-{uuid.uuid4().hex[:8]}.log"
+    return RunLog(log_dir / file_name,
+                  max_bytes=config.get_int('LOG_MAX_BYTES', DEFAULT_LOG_MAX_BYTES),
+                  backups=config.get_int('LOG_BACKUPS', DEFAULT_LOG_BACKUPS))
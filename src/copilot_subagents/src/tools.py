@@ -0,0 +1,294 @@
+"""Tool specifications, compiled allow/deny matchers and backend tool catalogs.
+
+Tool entries look like ``write``, ``shell(*)``, ``shell(git)`` or
+``shell(git push)``. The rules are:
+
+- A bare name and ``name(*)`` match every use of the tool.
+- An argument matches the same command words and any longer command that starts
+  with them, so ``shell(git)`` matches ``shell(git push)``.
+- A trailing ``*`` or ``:*`` is accepted as an explicit prefix marker, so
+  ``shell(git:*)`` and ``shell(git *)`` mean the same as ``shell(git)``.
+"""
+
+import json
+import re
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Sequence, Set, Tuple
+
+_TOOL_SPEC = re.compile(r'^\s*([A-Za-z0-9_.-]+)\s*(?:\((.*)\))?\s*$', re.DOTALL)
+
+class ToolSpec(NamedTuple):
+    """Structured form of a tool entry."""
+    
+    name: str
+    # Command words the argument must start with; empty when wildcard
+    args: Tuple[str, ...] = ()
+    wildcard: bool = True
+    
+    def __str__(self) -> str:
+        if self.wildcard:
+            return f"{self.name}(*)"
+        return f"{self.name}({' '.join(self.args)})"
+    
+    def covers(self, other: 'ToolSpec') -> bool:
+        """Check whether every use matched by ``other`` is also matched by this spec."""
+        if self.name != other.name:
+            return False
+        if self.wildcard:
+            return True
+        return not other.wildcard and other.args[:len(self.args)] == self.args
+
+def parse_tool_spec(tool: str) -> ToolSpec:
+    """Parse a tool entry into a ToolSpec.
+    
+    Args:
+        tool: Tool entry such as ``write`` or ``shell(git push)``
+        
+    Returns:
+        The parsed ToolSpec
+        
+    Raises:
+        ValueError: If the entry is not a valid tool specification
+    """
+    match = _TOOL_SPEC.match(tool) if isinstance(tool, str) else None
+    if match is None:
+        raise ValueError(f"Invalid tool specification: {tool!r}")
+    
+    name, argument = match.groups()
+    if argument is None:
+        return ToolSpec(name)
+    
+    argument = argument.strip()
+    if argument.endswith(':*'):
+        argument = argument[:-2]
+    elif argument.endswith(' *'):
+        argument = argument[:-1]
+    
+    words = tuple(argument.split())
+    if not words or words == ('*',):
+        return ToolSpec(name)
+    if '(' in argument or ')' in argument:
+        raise ValueError(f"Invalid tool specification: {tool!r}")
+    return ToolSpec(name, words, wildcard=False)
+
+class ToolMatcher:
+    """Compiled list of tool rules with constant-time lookups.
+    
+    Rules are indexed by their exact text, by tool name for wildcards and by
+    ``(name, command words)`` for argument prefixes. Checking a tool is one
+    hash lookup per command word of the tool, independent of the number of rules.
+    """
+    
+    def __init__(self, rules: Iterable[str]):
+        self.rules: List[str] = []
+        self.invalid_rules: List[str] = []
+        self._exact: Dict[str, str] = {}
+        self._wildcards: Dict[str, str] = {}
+        self._prefixes: Dict[Tuple[str, Tuple[str, ...]], str] = {}
+        
+        for rule in rules:
+            try:
+                spec = parse_tool_spec(rule)
+            except ValueError:
+                self.invalid_rules.append(rule)
+                continue
+            self.rules.append(rule)
+            self._exact.setdefault(rule, rule)
+            if spec.wildcard:
+                self._wildcards.setdefault(spec.name, rule)
+            else:
+                self._prefixes.setdefault((spec.name, spec.args), rule)
+    
+    def __contains__(self, tool: str) -> bool:
+        return self.matches(tool)
+    
+    def __len__(self) -> int:
+        return len(self.rules)
+    
+    def covering_rule(self, spec: ToolSpec) -> Optional[str]:
+        """Return the first rule that matches every use matched by ``spec``, if any."""
+        rule = self._wildcards.get(spec.name)
+        if rule is not None or spec.wildcard:
+            return rule
+        for length in range(1, len(spec.args) + 1):
+            rule = self._prefixes.get((spec.name, spec.args[:length]))
+            if rule is not None:
+                return rule
+        return None
+    
+    def matching_rule(self, tool: str) -> Optional[str]:
+        """Return the rule that matches a tool entry, or None (also for invalid entries)."""
+        rule = self._exact.get(tool)
+        if rule is not None:
+            return rule
+        try:
+            spec = parse_tool_spec(tool)
+        except ValueError:
+            return None
+        return self.covering_rule(spec)
+    
+    def matches(self, tool: str) -> bool:
+        """Check whether a tool entry is matched by any rule."""
+        return self.matching_rule(tool) is not None
+
+@lru_cache(maxsize=64)
+def compile_tools(rules: Tuple[str, ...]) -> ToolMatcher:
+    """Compile tool rules into a matcher, reusing earlier compilations of the same rules."""
+    return ToolMatcher(rules)
+
+class ToolPolicy:
+    """Allow and deny lists of a subagent compiled for queries.
+    
+    A tool is allowed when an allow rule matches it and no deny rule does.
+    """
+    
+    def __init__(self, allowed: Iterable[str], denied: Iterable[str]):
+        self.allow = ToolMatcher(allowed)
+        self.deny = ToolMatcher(denied)
+    
+    def is_allowed(self, tool: str) -> bool:
+        return self.allow.matches(tool) and not self.deny.matches(tool)
+    
+    def is_denied(self, tool: str) -> bool:
+        return self.deny.matches(tool)
+    
+    def shadowed(self) -> List[Tuple[str, str]]:
+        """Allow rules that a deny rule fully overrides, as ``(allow, deny)`` pairs."""
+        pairs = []
+        for rule in self.allow.rules:
+            deny_rule = self.deny.covering_rule(parse_tool_spec(rule))
+            if deny_rule is not None:
+                pairs.append((rule, deny_rule))
+        return pairs
+    
+    def overlaps(self) -> List[Tuple[str, str]]:
+        """Deny rules that carve an exception out of an allow rule, as ``(allow, deny)`` pairs."""
+        pairs = []
+        shadowed: Set[str] = {rule for rule, _ in self.shadowed()}
+        for rule in self.deny.rules:
+            allow_rule = self.allow.covering_rule(parse_tool_spec(rule))
+            if allow_rule is not None and allow_rule not in shadowed:
+                pairs.append((allow_rule, rule))
+        return pairs
+
+# Packaged catalogs (catalogs/<ai-tool>.json) and the backend listed first
+CATALOG_DIR = Path(__file__).parent / 'catalogs'
+DEFAULT_AI_TOOL = 'copilot-cli'
+
+class ToolCatalog:
+    """Valid tools, descriptions and CLI flag formats of one AI tool backend."""
+    
+    __slots__ = ('name', 'display_name', 'version', 'binary', 'args', 'flags', 'flag_style', 'tools', 'prompt',
+                 '_matcher')
+    
+    def __init__(self, name: str, display_name: str, version: str, binary: str,
+                 flags: Dict[str, Optional[str]], flag_style: str, tools: Dict[str, str],
+                 prompt: Optional[Dict[str, Any]] = None, args: Sequence[str] = ()):
+        self.name = name
+        self.display_name = display_name
+        self.version = version
+        self.binary = binary
+        # Arguments that put the binary in non-interactive mode, e.g. codex's 'exec'
+        self.args = tuple(args)
+        self.flags = flags
+        self.flag_style = flag_style
+        self.tools = tools
+        # How prompts reach the backend: its prompt flag, the supported transports
+        # ('argv', 'stdin', 'file') and the text that points it at a prompt file
+        self.prompt = prompt or {}
+        self._matcher: Optional[ToolMatcher] = None
+    
+    @property
+    def command(self) -> Tuple[str, ...]:
+        """Binary and leading arguments that run the backend non-interactively."""
+        return (self.binary,) + self.args
+    
+    @property
+    def tool_names(self) -> List[str]:
+        return list(self.tools)
+    
+    @property
+    def matcher(self) -> ToolMatcher:
+        """The catalog's tools compiled into a matcher on first use."""
+        if self._matcher is None:
+            self._matcher = compile_tools(tuple(self.tools))
+        return self._matcher
+    
+    @property
+    def fingerprint(self) -> str:
+        """Identifies the catalog's contents, changing with its version or tool list."""
+        import hashlib
+        
+        digest = hashlib.sha256(json.dumps([self.tools, self.flags], sort_keys=True).encode()).hexdigest()
+        return f"{self.name}@{self.version}:{digest[:16]}"
+    
+    @property
+    def prompt_transports(self) -> Tuple[str, ...]:
+        return tuple(self.prompt.get('transports') or ('argv',))
+    
+    @property
+    def prompt_flag(self) -> Optional[str]:
+        """Flag that precedes an inline prompt; None if the prompt is a trailing positional argument."""
+        return self.prompt.get('flag', '-p')
+    
+    @property
+    def prompt_file_reference(self) -> str:
+        """Prompt that makes the backend read its instructions from ``{path}``."""
+        return self.prompt.get('file_reference') or "Follow the instructions in @{path}"
+    
+    def describe(self, tool: str) -> str:
+        return self.tools.get(tool, 'Tool for AI assistant operations')
+    
+    def format_flags(self, tools: List[str], flag_type: str) -> List[str]:
+        """Format tools as CLI arguments, or an empty list if the backend has no such flag.
+        
+        Each flag value is one argument, so specs with spaces such as
+        ``shell(git push)`` reach the backend intact.
+        
+        Args:
+            tools: List of tool names
+            flag_type: Either 'allow' or 'deny'
+        """
+        flag = self.flags.get(flag_type)
+        if not tools or not flag:
+            return []
+        if self.flag_style == 'join':
+            return [flag, ','.join(tools)]
+        return [arg for tool in tools for arg in (flag, tool)]
+    
+    @classmethod
+    def from_json(cls, data: Dict[str, Any]) -> 'ToolCatalog':
+        return cls(data['name'], data.get('display_name', data['name']), str(data['version']),
+                   data['binary'], data.get('flags', {}), data.get('flag_style', 'repeat'),
+                   data['tools'], data.get('prompt'), data.get('args', ()))
+
+# Catalogs loaded by this process, keyed by AI tool name
+_CATALOGS: Dict[str, ToolCatalog] = {}
+
+def get_catalog_names() -> List[str]:
+    """Names of the AI tools with a packaged catalog, the default backend first."""
+    names = sorted(path.stem for path in CATALOG_DIR.glob('*.json'))
+    return sorted(names, key=lambda name: name != DEFAULT_AI_TOOL)
+
+def load_tool_catalog(ai_tool: str) -> ToolCatalog:
+    """Load an AI tool's catalog on first use and keep it for the rest of the process.
+    
+    Raises:
+        ValueError: If there is no catalog for the AI tool or it is malformed
+    """
+    catalog = _CATALOGS.get(ai_tool)
+    if catalog is not None:
+        return catalog
+    
+    if ai_tool not in get_catalog_names():
+        raise ValueError(f"Unsupported AI tool: '{ai_tool}' "
+                         f"(supported: {', '.join(get_catalog_names())})")
+    try:
+        data = json.loads((CATALOG_DIR / f"{ai_tool}.json").read_text())
+        catalog = ToolCatalog.from_json(data)
+    except (OSError, KeyError, TypeError, ValueError) as e:
+        raise ValueError(f"Invalid tool catalog for '{ai_tool}': {e}") from e
+    
+    _CATALOGS[ai_tool] = catalog
+    return catalog
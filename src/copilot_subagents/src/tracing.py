@@ -0,0 +1,230 @@
+"""Phase-level tracing of subagent invocations.
+
+Code marks its phases with ``span``::
+
+    with span('verify', subagent=name):
+        ...
+
+Tracing is off unless ``start_tracing`` was called, and ``span`` then returns
+one shared no-op context manager, so marked phases cost a global lookup and a
+function call. While tracing is on, finished spans are recorded with their
+thread, parent and attributes. They can be summarized per phase or written as
+Chrome trace-event JSON, for ``chrome://tracing`` and Perfetto, or as OTLP JSON,
+for OpenTelemetry collectors and viewers.
+"""
+
+import os
+import threading
+import time
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Dict, List, NamedTuple, Optional
+
+CHROME = 'chrome'
+OTLP = 'otlp'
+TRACE_FORMATS = (CHROME, OTLP)
+
+SERVICE_NAME = 'copilot-subagents'
+
+class Span:
+    """One timed phase; times are ``perf_counter_ns`` readings."""
+    
+    __slots__ = ('name', 'attributes', 'span_id', 'parent_id', 'thread_id', 'start_ns', 'end_ns', '_token',
+                 '_tracer')
+    
+    def __init__(self, tracer: 'Tracer', name: str, attributes: Dict[str, Any]):
+        self._tracer = tracer
+        self.name = name
+        self.attributes = attributes
+        self.span_id = 0
+        self.parent_id = 0
+        self.thread_id = 0
+        self.start_ns = 0
+        self.end_ns = 0
+        self._token = None
+    
+    @property
+    def duration(self) -> float:
+        """Duration in seconds."""
+        return (self.end_ns - self.start_ns) / 1e9
+    
+    def set(self, **attributes: Any) -> None:
+        """Add attributes known only once the phase has run."""
+        self.attributes.update(attributes)
+    
+    def __enter__(self) -> 'Span':
+        parent = _CURRENT_SPAN.get()
+        self.parent_id = parent.span_id if parent is not None else 0
+        self.span_id = self._tracer._next_id()
+        self.thread_id = threading.get_ident()
+        self._token = _CURRENT_SPAN.set(self)
+        self.start_ns = time.perf_counter_ns()
+        return self
+    
+    def __exit__(self, exc_type, exc, traceback) -> None:
+        self.end_ns = time.perf_counter_ns()
+        _CURRENT_SPAN.reset(self._token)
+        if exc_type is not None:
+            self.attributes['error'] = exc_type.__name__
+        self._tracer.spans.append(self)
+
+class _NoopSpan:
+    """Stand-in returned by ``span`` while tracing is off."""
+    
+    __slots__ = ()
+    
+    def set(self, **attributes: Any) -> None:
+        pass
+    
+    def __enter__(self) -> '_NoopSpan':
+        return self
+    
+    def __exit__(self, exc_type, exc, traceback) -> None:
+        pass
+
+class PhaseTiming(NamedTuple):
+    """Time spent in one phase, summed over its spans."""
+    
+    name: str
+    calls: int
+    # Seconds from start to end of each span
+    total: float
+    # Seconds not spent in nested spans
+    own: float
+
+class Tracer:
+    """Collects the spans of one process."""
+    
+    def __init__(self):
+        self.spans: List[Span] = []
+        # Maps perf_counter_ns readings to Unix time for OTLP
+        self.epoch_offset_ns = time.time_ns() - time.perf_counter_ns()
+        self.trace_id = os.urandom(16).hex()
+        self._ids = iter(range(1, 2 ** 63))
+        self._lock = threading.Lock()
+    
+    def _next_id(self) -> int:
+        with self._lock:
+            return next(self._ids)
+    
+    def span(self, name: str, **attributes: Any) -> Span:
+        return Span(self, name, attributes)
+    
+    def summary(self) -> List[PhaseTiming]:
+        """Per-phase call counts, total and own time, in order of first start."""
+        child_time: Dict[int, int] = {}
+        for recorded in self.spans:
+            if recorded.parent_id:
+                child_time[recorded.parent_id] = (child_time.get(recorded.parent_id, 0)
+                                                  + recorded.end_ns - recorded.start_ns)
+        phases: Dict[str, List[int]] = {}
+        for recorded in sorted(self.spans, key=lambda recorded: recorded.start_ns):
+            elapsed = recorded.end_ns - recorded.start_ns
+            phase = phases.setdefault(recorded.name, [0, 0, 0])
+            phase[0] += 1
+            phase[1] += elapsed
+            phase[2] += max(elapsed - child_time.get(recorded.span_id, 0), 0)
+        return [PhaseTiming(name, calls, total / 1e9, own / 1e9)
+                for name, (calls, total, own) in phases.items()]
+    
+    def chrome_trace(self) -> Dict[str, Any]:
+        """Spans as Chrome trace-event JSON, with times in microseconds."""
+        pid = os.getpid()
+        origin = min((recorded.start_ns for recorded in self.spans), default=0)
+        events = [{'name': recorded.name, 'cat': SERVICE_NAME, 'ph': 'X', 'pid': pid, 'tid': recorded.thread_id,
+                   'ts': (recorded.start_ns - origin) / 1000, 'dur': (recorded.end_ns - recorded.start_ns) / 1000,
+                   'args': _json_safe(recorded.attributes)}
+                  for recorded in sorted(self.spans, key=lambda recorded: recorded.start_ns)]
+        return {'traceEvents': events, 'displayTimeUnit': 'ms',
+                'otherData': {'service': SERVICE_NAME, 'trace_id': self.trace_id}}
+    
+    def otlp_trace(self) -> Dict[str, Any]:
+        """Spans as an OTLP/JSON ``ExportTraceServiceRequest``."""
+        spans = []
+        for recorded in sorted(self.spans, key=lambda recorded: recorded.start_ns):
+            otlp_span = {
+                'traceId': self.trace_id,
+                'spanId': f"{recorded.span_id:016x}",
+                'name': recorded.name,
+                # SPAN_KIND_INTERNAL
+                'kind': 1,
+                'startTimeUnixNano': str(recorded.start_ns + self.epoch_offset_ns),
+                'endTimeUnixNano': str(recorded.end_ns + self.epoch_offset_ns),
+                'attributes': [_otlp_attribute('thread.id', recorded.thread_id)]
+                              + [_otlp_attribute(key, value) for key, value in recorded.attributes.items()],
+            }
+            if recorded.parent_id:
+                otlp_span['parentSpanId'] = f"{recorded.parent_id:016x}"
+            if 'error' in recorded.attributes:
+                # STATUS_CODE_ERROR
+                otlp_span['status'] = {'code': 2, 'message': str(recorded.attributes['error'])}
+            spans.append(otlp_span)
+        resource = [_otlp_attribute('service.name', SERVICE_NAME), _otlp_attribute('process.pid', os.getpid())]
+        return {'resourceSpans': [{'resource': {'attributes': resource},
+                                   'scopeSpans': [{'scope': {'name': SERVICE_NAME}, 'spans': spans}]}]}
+    
+    def write(self, path: Path, trace_format: Optional[str] = None) -> Path:
+        """Write the spans to ``path`` as JSON.
+        
+        Args:
+            path: File to write
+            trace_format: ``chrome`` or ``otlp``; inferred from the file name if None
+                (``otlp`` when it contains "otlp", otherwise ``chrome``)
+                
+        Returns:
+            The path written
+        """
+        import json
+        
+        path = Path(path)
+        if trace_format is None:
+            trace_format = OTLP if OTLP in path.name.lower() else CHROME
+        if trace_format not in TRACE_FORMATS:
+            raise ValueError(f"Unknown trace format {trace_format!r}; expected one of {', '.join(TRACE_FORMATS)}")
+        document = self.otlp_trace() if trace_format == OTLP else self.chrome_trace()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(document), encoding='utf-8')
+        return path
+
+def _json_safe(attributes: Dict[str, Any]) -> Dict[str, Any]:
+    return {key: value if isinstance(value, (bool, int, float, str)) or value is None else str(value)
+            for key, value in attributes.items()}
+
+def _otlp_attribute(key: str, value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        typed = {'boolValue': value}
+    elif isinstance(value, int):
+        # OTLP/JSON encodes 64-bit integers as strings
+        typed = {'intValue': str(value)}
+    elif isinstance(value, float):
+        typed = {'doubleValue': value}
+    else:
+        typed = {'stringValue': str(value)}
+    return {'key': key, 'value': typed}
+
+# Innermost open span of the running thread or asyncio task
+_CURRENT_SPAN = ContextVar('subagents_current_span', default=None)
+_NOOP_SPAN = _NoopSpan()
+_TRACER: Optional[Tracer] = None
+
+def span(name: str, **attributes: Any):
+    """Time the enclosed block as phase ``name`` if tracing is on."""
+    if _TRACER is None:
+        return _NOOP_SPAN
+    return _TRACER.span(name, **attributes)
+
+def start_tracing() -> Tracer:
+    """Start recording spans in this process, keeping a tracer that is already running."""
+    global _TRACER
+    if _TRACER is None:
+        _TRACER = Tracer()
+    return _TRACER
+
+def stop_tracing() -> Optional[Tracer]:
+    """Stop recording spans and return the tracer with what it recorded."""
+    global _TRACER
+    tracer, _TRACER = _TRACER, None
+    return tracer
+
+def get_tracer() -> Optional[Tracer]:
+    return _TRACER
@@ -0,0 +1,73 @@
+"""On-disk cache of subagents that passed tool verification."""
+
+import hashlib
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import Dict, Optional
+
+from core import get_state_dir, read_frontmatter_block
+from tools import ToolCatalog
+
+CACHE_VERSION = 1
+CACHE_FILENAME = 'verified.json'
+
+class VerificationCache:
+    """Verified subagents keyed by a hash of the agent's frontmatter plus the tool catalog fingerprint.
+    
+    Tools are declared in the frontmatter, so only the header is read and
+    hashed; editing the prompt body keeps the entry valid. Any edit to the
+    header or upgrade of the catalog changes the key, so stale entries never
+    match and are simply overwritten on the next success.
+    """
+    
+    def __init__(self, subagents_dir: Path, cache_path: Optional[Path] = None):
+        self.subagents_dir = subagents_dir
+        self.cache_path = cache_path or get_state_dir(subagents_dir) / CACHE_FILENAME
+        self._entries: Optional[Dict[str, str]] = None
+    
+    @staticmethod
+    def key(subagent_path: Path, catalog: ToolCatalog) -> str:
+        """Cache key of a subagent file verified against a catalog.
+        
+        Raises:
+            OSError: If the subagent file cannot be read
+            ValueError: If the subagent file has no frontmatter
+        """
+        frontmatter_yaml, _ = read_frontmatter_block(subagent_path)
+        digest = hashlib.sha256(frontmatter_yaml).hexdigest()
+        return f"{digest}:{catalog.fingerprint}"
+    
+    @property
+    def entries(self) -> Dict[str, str]:
+        if self._entries is None:
+            self._entries = {}
+            try:
+                data = json.loads(self.cache_path.read_text())
+            except (OSError, ValueError):
+                return self._entries
+            if isinstance(data, dict) and data.get('version') == CACHE_VERSION:
+                self._entries = dict(data.get('entries', {}))
+        return self._entries
+    
+    def is_verified(self, subagent_name: str, key: str) -> bool:
+        return self.entries.get(subagent_name) == key
+    
+    def record(self, subagent_name: str, key: str) -> None:
+        """Remember a successful verification and persist the cache."""
+        self.entries[subagent_name] = key
+        self.save()
+    
+    def save(self) -> None:
+        """Atomically write the cache next to the registry index."""
+        data = {'version': CACHE_VERSION, 'entries': dict(sorted(self.entries.items()))}
+        try:
+            self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_path.parent, suffix='.tmp')
+            with os.fdopen(fd, 'w') as tmp_file:
+                json.dump(data, tmp_file)
+            os.replace(tmp_path, self.cache_path)
+        except OSError:
+            # Read-only checkouts just verify every time
+            return
@@ -0,0 +1,21 @@
+"""Shared pytest configuration for the subagents tests."""
+
+import os
+
+import pytest
+
+BENCHMARK_ENV = 'COPILOT_SUBAGENTS_BENCHMARKS'
+
+def pytest_configure(config):
+    # Also registered in pyproject.toml, which is not read when pytest runs from the repository root
+    config.addinivalue_line('markers', 'benchmark: timing benchmark, skipped unless selected with -m benchmark '
+                                       f'or {BENCHMARK_ENV}=1')
+
+def pytest_collection_modifyitems(config, items):
+    """Skip benchmarks unless they were selected with ``-m`` or the environment asks for them."""
+    if os.getenv(BENCHMARK_ENV, '').lower() in ('1', 'true', 'yes') or 'benchmark' in (config.option.markexpr or ''):
+        return
+    skip = pytest.mark.skip(reason=f"benchmark; run with -m benchmark or {BENCHMARK_ENV}=1")
+    for item in items:
+        if 'benchmark' in item.keywords:
+            item.add_marker(skip)
@@ -0,0 +1,272 @@
+"""Performance benchmarks for the subagents CLI.
+
+They are marked ``benchmark`` and skipped unless selected with
+``-m benchmark`` or ``COPILOT_SUBAGENTS_BENCHMARKS=1`` is set. Timings are
+printed; only comparisons against a baseline measured in the same run are asserted.
+"""
+
+import os
+import subprocess
+import time
+from pathlib import Path
+
+import pytest
+import yaml
+
+# Import from the source directory
+import sys
+SRC_DIR = Path(__file__).parent.parent.parent / "src" / "copilot_subagents" / "src"
+sys.path.insert(0, str(SRC_DIR))
+
+from core import _decode_flat_frontmatter
+
+def _synthetic_corpus(size: int):
+    """Build frontmatter blocks in the shapes used by generated subagents."""
+    corpus = []
+    for i in range(size):
+        corpus.append(f'''name: "agent-{i}"
+description: "Synthetic subagent number {i} used for benchmarking frontmatter decoding"
+version: "1.0.{i}"
+created: "2025-10-15"
+model: "claude-sonnet-4.5"
+allowed_tools: ["write", "shell(git)", "shell(npm test)"]
+deny_tools:
+  - "shell(rm)"
+  - "shell(git push)"
+tags: ["generated", "team-{i % 7}", "benchmark"]
+''')
+    return corpus
+
+def _best_of(repeats: int, func, corpus) -> float:
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for text in corpus:
+            func(text)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+@pytest.mark.benchmark
+def test_flat_decoder_speedup():
+    """Benchmark the restricted decoder against the YAML loaders on a synthetic corpus."""
+    corpus = _synthetic_corpus(300)
+    
+    assert all(_decode_flat_frontmatter(text) == yaml.safe_load(text) for text in corpus)
+    
+    flat_time = _best_of(3, _decode_flat_frontmatter, corpus)
+    python_time = _best_of(3, lambda text: yaml.load(text, Loader=yaml.SafeLoader), corpus)
+    print(f"\nflat decoder: {flat_time * 1000:.1f}ms, "
+          f"SafeLoader: {python_time * 1000:.1f}ms ({python_time / flat_time:.0f}x)")
+    
+    if hasattr(yaml, 'CSafeLoader'):
+        c_time = _best_of(3, lambda text: yaml.load(text, Loader=yaml.CSafeLoader), corpus)
+        print(f"CSafeLoader: {c_time * 1000:.1f}ms ({c_time / flat_time:.0f}x)")
+    
+    # Generous bound so the benchmark only fails on a real regression
+    assert flat_time * 3 < python_time
+
+@pytest.mark.benchmark
+def test_tool_matcher_lookup_is_constant():
+    """Benchmark compiled matcher lookups against list membership on a large catalog."""
+    from tools import ToolMatcher
+    
+    catalog = [f"shell(tool-{i})" for i in range(5000)] + ["write"]
+    queries = [f"shell(tool-{i} --flag)" for i in range(0, 5000, 50)] + ["write", "shell(unknown)"]
+    matcher = ToolMatcher(catalog)
+    
+    assert all(matcher.matches(query) for query in queries[:-1])
+    assert not matcher.matches(queries[-1])
+    
+    matcher_time = _best_of(3, matcher.matches, queries)
+    list_time = _best_of(3, lambda query: query in catalog, queries)
+    print(f"\nmatcher: {matcher_time * 1e6:.0f}us, list membership: {list_time * 1e6:.0f}us "
+          f"for {len(queries)} lookups")
+    
+    # List membership cannot even express prefix matches; it is only a speed reference
+    assert matcher_time < list_time
+
+@pytest.mark.benchmark
+def test_disabled_tracing_overhead():
+    """Benchmark the cost of a phase span while tracing is off, and while it is on."""
+    from tracing import span, start_tracing, stop_tracing
+    
+    def traced(phase):
+        with span(phase, path='agent.md'):
+            pass
+    
+    phases = ['load'] * 100000
+    bare = _best_of(3, lambda phase: None, phases)
+    disabled = _best_of(3, traced, phases)
+    start_tracing()
+    try:
+        enabled = _best_of(1, traced, phases)
+    finally:
+        stop_tracing()
+    per_span = (disabled - bare) / len(phases)
+    print(f"\nspan while tracing is off: {per_span * 1e9:.0f}ns, "
+          f"on: {(enabled - bare) / len(phases) * 1e9:.0f}ns")
+    
+    assert disabled < enabled
+
+def _best_wall_clock(repeats: int, command, env=None) -> float:
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        subprocess.run(command, check=True, stdout=subprocess.DEVNULL, env=env)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def test_cli_import_is_lazy():
+    """Importing the CLI must not pull in command modules, rich, yaml or dotenv."""
+    heavy = ['rich', 'yaml', 'dotenv', 'core', 'commands']
+    script = (f"import sys; sys.path.insert(0, {str(SRC_DIR)!r}); import cli; "
+              f"print(','.join(m for m in {heavy!r} if m in sys.modules))")
+    result = subprocess.run([sys.executable, '-c', script], check=True,
+                            capture_output=True, text=True)
+    
+    assert result.stdout.strip() == ''
+
+@pytest.mark.benchmark
+def test_version_startup_time():
+    """Benchmark `subagents --version` wall clock against a bare interpreter and eager imports."""
+    bare = _best_wall_clock(5, [sys.executable, '-c', 'pass'])
+    eager = _best_wall_clock(5, [sys.executable, '-c', f"import sys; sys.path.insert(0, {str(SRC_DIR)!r}); "
+                                 "import cli, commands.invoke, commands.verify"])
+    version = _best_wall_clock(5, [sys.executable, str(SRC_DIR / 'cli.py'), '--version'])
+    print(f"\ninterpreter: {bare * 1000:.0f}ms, subagents --version: {version * 1000:.0f}ms "
+          f"(overhead {(version - bare) * 1000:.0f}ms), eager command imports: {eager * 1000:.0f}ms")
+    
+    # Lazy command loading must keep startup below importing the commands up front
+    assert version < eager
+
+@pytest.mark.benchmark
+def test_verify_all_scales_to_thousands():
+    """Benchmark `verify --all` over a few thousand subagents in a single process."""
+    import json
+    import shutil
+    import tempfile
+    
+    temp_dir = Path(tempfile.mkdtemp())
+    try:
+        for i, text in enumerate(_synthetic_corpus(2000)):
+            (temp_dir / f"agent-{i}.md").write_text(f"---\n{text}---\n\nPrompt {i}.\n")
+        
+        command = [sys.executable, str(SRC_DIR / 'cli.py'), 'verify', '--all', '--format', 'json',
+                   '--subagents-dir', str(temp_dir)]
+        env = {**os.environ, 'COPILOT_SUBAGENTS_NO_DAEMON': '1'}
+        
+        cold_start = time.perf_counter()
+        result = subprocess.run(command, capture_output=True, text=True, env=env)
+        cold = time.perf_counter() - cold_start
+        warm_start = time.perf_counter()
+        subprocess.run(command, capture_output=True, text=True, env=env)
+        warm = time.perf_counter() - warm_start
+        print(f"\nverify --all (2000 agents): cold {cold * 1000:.0f}ms, warm index {warm * 1000:.0f}ms")
+        
+        # The synthetic tools are not all in the copilot catalog, so failures are expected
+        assert json.loads(result.stdout)['total'] == 2000
+    finally:
+        shutil.rmtree(temp_dir)
+
+def _fake_backend_env(**options) -> dict:
+    """Environment that runs subagents against the bundled fake backend."""
+    import shlex
+    command = [sys.executable, str(SRC_DIR / 'fake_backend.py')]
+    for name, value in options.items():
+        command.extend([f"--{name.replace('_', '-')}", str(value)])
+    return {**os.environ, 'COPILOT_SUBAGENTS_NO_DAEMON': '1',
+            'COPILOT_SUBAGENTS_BACKEND_BIN': ' '.join(shlex.quote(part) for part in command)}
+
+def _subagents_dir(temp_dir: Path) -> Path:
+    subagents_dir = temp_dir / "subagents"
+    subagents_dir.mkdir()
+    (subagents_dir / "helper.md").write_text('---\nname: "helper"\nallowed_tools: ["write"]\n---\n\nYou help.\n')
+    return subagents_dir
+
+def _run_measured(args, env, cwd: Path):
+    """Run the CLI and return (wall clock seconds, peak RSS in MiB of the CLI process alone)."""
+    rss_file = cwd / "rss.txt"
+    script = (f"import resource, runpy, sys\nsys.argv = {['subagents'] + args!r}\n"
+              f"sys.path.insert(0, {str(SRC_DIR)!r})\ntry:\n    runpy.run_path({str(SRC_DIR / 'cli.py')!r}, run_name='__main__')\n"
+              f"finally:\n    open({str(rss_file)!r}, 'w').write(str(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss))\n")
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True, env=env, cwd=cwd)
+    elapsed = time.perf_counter() - start
+    assert result.returncode == 0, result.stdout + result.stderr
+    # Kilobytes on Linux, bytes on macOS
+    rss = int(rss_file.read_text()) / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+    return elapsed, rss
+
+@pytest.mark.benchmark
+def test_invoke_overhead_against_fake_backend():
+    """Benchmark the wall clock `subagents invoke` adds on top of the backend it runs."""
+    import shutil
+    import tempfile
+    
+    temp_dir = Path(tempfile.mkdtemp())
+    try:
+        subagents_dir = _subagents_dir(temp_dir)
+        env = _fake_backend_env(lines=100)
+        backend = _best_wall_clock(3, [sys.executable, str(SRC_DIR / 'fake_backend.py'), '-p', 'Task',
+                                       '--lines', '100'])
+        invoke = _best_wall_clock(3, [sys.executable, str(SRC_DIR / 'cli.py'), 'invoke', 'helper',
+                                      '--prompt', 'Task', '--subagents-dir', str(subagents_dir)], env=env)
+        print(f"\nfake backend: {backend * 1000:.0f}ms, subagents invoke: {invoke * 1000:.0f}ms "
+              f"(overhead {(invoke - backend) * 1000:.0f}ms per invocation)")
+    finally:
+        shutil.rmtree(temp_dir)
+
+@pytest.mark.benchmark
+def test_parallel_plan_makespan():
+    """Benchmark how close `run-plan` gets to the ideal makespan of independent steps."""
+    import shutil
+    import tempfile
+    
+    steps, workers, latency = 8, 4, 0.5
+    temp_dir = Path(tempfile.mkdtemp())
+    try:
+        subagents_dir = _subagents_dir(temp_dir)
+        plan_file = temp_dir / "plan.md"
+        plan_file.write_text("# Plan\n\n## Execution Workflow\n\n" + "".join(
+            f"### Step {number}: Part {number}\n- **Subagent**: `helper`\n"
+            f"- **CLI Command**: `subagents invoke helper --prompt \"Part {number}\"`\n"
+            f"- **Dependencies**: None\n- **Status**: PENDING\n\n" for number in range(1, steps + 1)))
+        
+        makespan, _ = _run_measured(['run-plan', str(plan_file), '--max-workers', str(workers), '--retries', '0',
+                                     '--subagents-dir', str(subagents_dir)],
+                                    _fake_backend_env(latency=latency), temp_dir)
+        ideal = latency * -(-steps // workers)
+        print(f"\nrun-plan: {steps} steps of {latency}s on {workers} workers in {makespan:.2f}s "
+              f"(ideal {ideal:.2f}s, serial {steps * latency:.2f}s)")
+        
+        assert plan_file.read_text().count("**Status**: COMPLETED") == steps
+        assert makespan < steps * latency
+    finally:
+        shutil.rmtree(temp_dir)
+
+@pytest.mark.benchmark
+def test_map_throughput_and_memory():
+    """Benchmark `map` throughput and the CLI's peak memory on verbose backends."""
+    import json
+    import shutil
+    import tempfile
+    
+    tasks, concurrency, latency = 24, 8, 0.25
+    temp_dir = Path(tempfile.mkdtemp())
+    try:
+        subagents_dir = _subagents_dir(temp_dir)
+        input_file = temp_dir / "tasks.jsonl"
+        input_file.write_text("".join(json.dumps({'prompt': f"Task {i}"}) + "\n" for i in range(tasks)))
+        
+        # 2 MB of output per task; only the tail is kept in memory
+        env = _fake_backend_env(latency=latency, lines=10000, line_bytes=200)
+        elapsed, rss = _run_measured(['map', 'helper', '--input', str(input_file), '--concurrency',
+                                      str(concurrency), '--subagents-dir', str(subagents_dir)], env, temp_dir)
+        print(f"\nmap: {tasks} tasks in {elapsed:.2f}s ({tasks / elapsed:.1f} tasks/s), "
+              f"peak RSS {rss:.0f} MiB")
+        
+        results = [json.loads(line) for line in (temp_dir / "tasks.results.jsonl").read_text().splitlines()]
+        assert len(results) == tasks and all(result['success'] for result in results)
+        assert elapsed < tasks * latency
+    finally:
+        shutil.rmtree(temp_dir)
@@ -34,6 +34,17 @@ def test_version_option():
     assert result.exit_code == 0
     assert "0.1.0" in result.output
 
+def test_show_tools_for_each_backend():
+    """Test showing catalog tools for a non-default backend."""
+    runner = CliRunner()
+    result = runner.invoke(cli, ['show-tools', 'claude-code'])
+    assert result.exit_code == 0
+    assert "WebFetch" in result.output
+    
+    result = runner.invoke(cli, ['show-tools', 'not-a-tool'])
+    assert result.exit_code == 1
+    assert "Unsupported AI tool" in result.output
+
 class TestWithTempSubagents:
     """Tests that require temporary subagent files."""
     
@@ -104,6 +115,86 @@ You are a test subagent for unit testing.
         assert result.exit_code == 0
         assert "test-agent" in result.output
     
+    def test_index_rebuild(self):
+        """Test rebuilding the registry index."""
+        runner = CliRunner()
+        result = runner.invoke(cli, [
+            'index', 'rebuild',
+            '--subagents-dir', str(self.subagents_dir)
+        ])
+        assert result.exit_code == 0
+        assert "Indexed 1 subagent(s)" in result.output
+        assert (self.subagents_dir / "state" / "index.json").exists()
+    
+    def test_verify_all_json(self):
+        """Test batch verification with a JSON report."""
+        import json
+        (self.subagents_dir / "bad-agent.md").write_text(
+            '---\nname: "bad-agent"\nallowed_tools: ["write", "teleport"]\n---\n\nBad.\n'
+        )
+        
+        runner = CliRunner()
+        result = runner.invoke(cli, [
+            'verify', '--all', '--format', 'json',
+            '--subagents-dir', str(self.subagents_dir)
+        ])
+        assert result.exit_code == 1
+        
+        report = json.loads(result.output)
+        assert report['total'] == 2 and report['failed'] == 1
+        results = {item['name']: item for item in report['results']}
+        assert results['test-agent']['success']
+        assert results['bad-agent']['allowed']['invalid'] == ["teleport"]
+    
+    def test_unenforceable_rules_fail_unless_yolo(self):
+        """Test that tool rules a backend has no flag for fail verification and invocation."""
+        import json
+        (self.subagents_dir / "gemini-agent.md").write_text(
+            '---\nname: "gemini-agent"\nallowed_tools: ["read_file"]\n'
+            'deny_tools: ["run_shell_command(rm)"]\n---\n\nRead only.\n'
+        )
+        
+        runner = CliRunner()
+        args = ['verify', 'gemini-agent', '--ai-tool', 'gemini-cli', '--format', 'json',
+                '--subagents-dir', str(self.subagents_dir)]
+        result = runner.invoke(cli, args)
+        assert result.exit_code == 1
+        assert "cannot enforce denied tools" in json.loads(result.output)['results'][0]['error']
+        assert runner.invoke(cli, ['--yolo'] + args).exit_code == 0
+        
+        args = ['invoke', 'gemini-agent', '--prompt', 'Go', '--ai-tool', 'gemini-cli', '--dry-run',
+                '--subagents-dir', str(self.subagents_dir)]
+        result = runner.invoke(cli, args)
+        assert result.exit_code == 1
+        assert "cannot enforce denied tools" in result.output
+        result = runner.invoke(cli, ['--yolo'] + args)
+        assert result.exit_code == 0 and "--yolo" in result.output
+    
+    def test_verify_junit_output_file(self):
+        """Test writing a JUnit report for the named subagents."""
+        from xml.etree import ElementTree
+        report_path = Path(self.temp_dir) / "verify.xml"
+        
+        runner = CliRunner()
+        result = runner.invoke(cli, [
+            'verify', 'test-agent', 'missing-agent', '--format', 'junit',
+            '--output', str(report_path),
+            '--subagents-dir', str(self.subagents_dir)
+        ])
+        assert result.exit_code == 1
+        
+        suite = ElementTree.parse(report_path).getroot()
+        assert suite.get('tests') == '2' and suite.get('failures') == '1'
+        failure = suite.find("testcase[@name='missing-agent']/failure")
+        assert "not found" in failure.get('message')
+    
+    def test_verify_requires_names_or_all(self):
+        """Test that verify without targets fails."""
+        runner = CliRunner()
+        result = runner.invoke(cli, ['verify', '--subagents-dir', str(self.subagents_dir)])
+        assert result.exit_code == 1
+        assert "--all" in result.output
+    
     def test_invoke_missing_prompt(self):
         """Test invoke command without prompt."""
         runner = CliRunner()
@@ -127,4 +218,417 @@ You are a test subagent for unit testing.
         ])
         assert result.exit_code == 0
         assert "Dry run mode" in result.output
-        assert "copilot" in result.output
\ No newline at end of file
+        assert "copilot" in result.output
+    
+    def test_invoke_reuses_verification(self):
+        """Test that a repeat invoke of an unchanged agent skips verification."""
+        runner = CliRunner()
+        args = ['invoke', 'test-agent', '--prompt', 'Test prompt', '--dry-run',
+                '--subagents-dir', str(self.subagents_dir)]
+        
+        first = runner.invoke(cli, args)
+        second = runner.invoke(cli, args)
+        assert first.exit_code == 0 and second.exit_code == 0
+        assert "(cached)" not in first.output
+        assert "(cached)" in second.output
+    
+    def test_invoke_streams_backend_output(self, monkeypatch):
+        """Test that invoke relays backend output and exit code."""
+        bin_dir = Path(self.temp_dir) / "bin"
+        bin_dir.mkdir()
+        copilot = bin_dir / "copilot"
+        copilot.write_text(f"#!{sys.executable}\nimport sys\nprint('backend says hi')\nsys.exit(4)\n")
+        copilot.chmod(0o755)
+        monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ.get('PATH', '')}")
+        
+        runner = CliRunner()
+        result = runner.invoke(cli, ['invoke', 'test-agent', '--prompt', 'Test prompt',
+                                     '--subagents-dir', str(self.subagents_dir)])
+        assert result.exit_code == 4
+        assert "backend says hi" in result.output
+        assert "failed with exit code 4" in result.output
+        logs = list((self.subagents_dir / "state" / "logs").glob("*-test-agent-*.log"))
+        assert len(logs) == 1 and "backend says hi" in logs[0].read_text()
+    
+    def test_invoke_timeout(self, monkeypatch):
+        """Test that a hung backend is stopped when the subagent's timeout expires."""
+        bin_dir = Path(self.temp_dir) / "bin"
+        bin_dir.mkdir()
+        copilot = bin_dir / "copilot"
+        copilot.write_text(f"#!{sys.executable}\nimport time\nprint('thinking', flush=True)\ntime.sleep(30)\n")
+        copilot.chmod(0o755)
+        monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ.get('PATH', '')}")
+        (self.subagents_dir / "slow-agent.md").write_text('---\nname: "slow-agent"\ntimeout: 1s\n---\n\nSlow.\n')
+        
+        runner = CliRunner()
+        result = runner.invoke(cli, ['invoke', 'slow-agent', '--prompt', 'Test prompt',
+                                     '--subagents-dir', str(self.subagents_dir)])
+        assert result.exit_code == 124
+        assert "thinking" in result.output
+        assert "timed out after 1s" in result.output
+    
+    def test_invoke_profile_and_trace(self, monkeypatch):
+        """Test that --profile prints per-phase timings and --trace writes Chrome and OTLP traces."""
+        import json
+        bin_dir = Path(self.temp_dir) / "bin"
+        bin_dir.mkdir()
+        copilot = bin_dir / "copilot"
+        copilot.write_text(f"#!{sys.executable}\nprint('traced answer')\n")
+        copilot.chmod(0o755)
+        monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ.get('PATH', '')}")
+        
+        runner = CliRunner()
+        args = ['invoke', 'test-agent', '--prompt', 'Test prompt', '--subagents-dir', str(self.subagents_dir)]
+        chrome_file = Path(self.temp_dir) / "invoke.json"
+        result = runner.invoke(cli, args + ['--profile', '--trace', str(chrome_file)])
+        assert result.exit_code == 0, result.output
+        assert "Invocation Profile" in result.output and "traced answer" in result.output
+        
+        events = json.loads(chrome_file.read_text())['traceEvents']
+        phases = {event['name'] for event in events}
+        assert {'invoke', 'load', 'parse', 'verify', 'prompt_build', 'command_build', 'render',
+                'subprocess'} <= phases
+        assert all(event['ph'] == 'X' and event['dur'] >= 0 for event in events)
+        
+        otlp_file = Path(self.temp_dir) / "invoke.otlp.json"
+        result = runner.invoke(cli, args + ['--dry-run', '--trace', str(otlp_file)])
+        assert result.exit_code == 0 and "Invocation Profile" not in result.output
+        spans = json.loads(otlp_file.read_text())['resourceSpans'][0]['scopeSpans'][0]['spans']
+        root = next(span for span in spans if span['name'] == 'invoke')
+        assert 'subprocess' not in {span['name'] for span in spans}
+        assert all(span.get('parentSpanId') for span in spans if span is not root)
+    
+    def test_job_queue_commands(self, monkeypatch):
+        """Test enqueueing jobs, draining them with a worker and inspecting and cancelling them."""
+        import json
+        bin_dir = Path(self.temp_dir) / "bin"
+        bin_dir.mkdir()
+        copilot = bin_dir / "copilot"
+        copilot.write_text(f"#!{sys.executable}\nprint('queued answer')\n")
+        copilot.chmod(0o755)
+        monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ.get('PATH', '')}")
+        
+        runner = CliRunner()
+        dir_args = ['--subagents-dir', str(self.subagents_dir)]
+        first = runner.invoke(cli, ['enqueue', 'test-agent', '-p', 'First', '-q'] + dir_args)
+        second = runner.invoke(cli, ['enqueue', 'test-agent', '-p', 'Second', '--priority', '2'] + dir_args)
+        assert first.exit_code == 0 and first.output.strip() == "1"
+        assert "Queued job 2" in second.output
+        assert runner.invoke(cli, ['enqueue', 'nobody', '-p', 'x'] + dir_args).exit_code == 1
+        
+        cancelled = runner.invoke(cli, ['cancel', '1', '99'] + dir_args)
+        assert cancelled.exit_code == 1
+        assert "Job 1 cancelled" in cancelled.output and "No job 99" in cancelled.output
+        
+        worked = runner.invoke(cli, ['worker', '--drain', '-j', '2'] + dir_args)
+        assert worked.exit_code == 0, worked.output
+        assert "1 succeeded" in worked.output
+        
+        status = runner.invoke(cli, ['status', '--json'] + dir_args)
+        jobs = [json.loads(line) for line in status.output.splitlines()]
+        assert [(job['id'], job['status']) for job in jobs] == [(1, 'CANCELLED'), (2, 'SUCCEEDED')]
+        assert "queued answer" in Path(jobs[1]['log']).read_text()
+        assert "SUCCEEDED" in runner.invoke(cli, ['status', '2'] + dir_args).output
+    
+    def test_invoke_result_cache(self, monkeypatch):
+        """Test that --cache reuses an identical invocation and --no-cache bypasses it."""
+        bin_dir = Path(self.temp_dir) / "bin"
+        bin_dir.mkdir()
+        counter = Path(self.temp_dir) / "runs.txt"
+        copilot = bin_dir / "copilot"
+        copilot.write_text(f"#!{sys.executable}\nopen({str(counter)!r}, 'a').write('x')\nprint('fresh answer')\n")
+        copilot.chmod(0o755)
+        monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ.get('PATH', '')}")
+        
+        runner = CliRunner()
+        args = ['invoke', 'test-agent', '--prompt', 'Test prompt', '--subagents-dir', str(self.subagents_dir)]
+        first = runner.invoke(cli, args + ['--cache'])
+        second = runner.invoke(cli, args + ['--cache'])
+        third = runner.invoke(cli, args + ['--no-cache'])
+        
+        assert first.exit_code == second.exit_code == third.exit_code == 0
+        assert "Reused the cached result" in second.output and "fresh answer" in second.output
+        assert "Reused" not in third.output
+        assert counter.read_text() == "xx"
+    
+    def test_invoke_context_file_is_delivered_as_prompt_file(self, monkeypatch):
+        """Test that a large --context @FILE reaches the backend through a prompt file that is removed afterwards."""
+        bin_dir = Path(self.temp_dir) / "bin"
+        bin_dir.mkdir()
+        copilot = bin_dir / "copilot"
+        copilot.write_text(f"#!{sys.executable}\nimport sys\n"
+                           "prompt = sys.argv[sys.argv.index('-p') + 1]\n"
+                           "print(open(prompt.split('@', 1)[1]).read().count('CONTEXT LINE'))\n")
+        copilot.chmod(0o755)
+        monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ.get('PATH', '')}")
+        context_file = Path(self.temp_dir) / "context.txt"
+        # Over the default 96 KiB argv limit
+        context_file.write_text("CONTEXT LINE\n" * 10000)
+        
+        runner = CliRunner()
+        args = ['invoke', 'test-agent', '--prompt', 'Test prompt', '--context', f"@{context_file}",
+                '--subagents-dir', str(self.subagents_dir)]
+        result = runner.invoke(cli, args)
+        assert result.exit_code == 0
+        assert "Prompt delivered via file" in result.output
+        assert "\n10000\n" in result.output
+        assert list((self.subagents_dir / "state" / "prompts").iterdir()) == []
+        
+        # The dry-run command refers to the prompt file, so it is kept
+        result = runner.invoke(cli, args + ['--dry-run'])
+        assert result.exit_code == 0
+        prompt_files = list((self.subagents_dir / "state" / "prompts").iterdir())
+        assert len(prompt_files) == 1
+        assert str(prompt_files[0]) in result.output.replace("\n", "")
+        assert prompt_files[0].read_text().count("CONTEXT LINE") == 10000
+    
+    def test_invoke_context_glob_reports_stats(self):
+        """Test that --context-glob assembles files into the prompt and reports what was left out."""
+        docs = Path(self.temp_dir) / "docs"
+        docs.mkdir()
+        (docs / "guide.md").write_text("Use tabs.\n")
+        (docs / "logo.md").write_bytes(b"\x00\x01")
+        
+        runner = CliRunner()
+        result = runner.invoke(cli, ['invoke', 'test-agent', '--prompt', 'Test prompt', '--dry-run',
+                                     '--context-glob', f"{docs}/*.md", '--context-max-tokens', '1000',
+                                     '--subagents-dir', str(self.subagents_dir)])
+        assert result.exit_code == 0
+        assert "1 included, 0 truncated, 1 skipped" in result.output and "of 4,000 bytes" in result.output
+        assert "binary" in result.output
+        # The small assembled context goes inline, so nothing is left behind
+        assert list((self.subagents_dir / "state" / "prompts").iterdir()) == []
+    
+    def test_map_resumes_from_output(self, monkeypatch):
+        """Test that map writes indexed results and skips them when run again."""
+        import json
+        bin_dir = Path(self.temp_dir) / "bin"
+        bin_dir.mkdir()
+        copilot = bin_dir / "copilot"
+        copilot.write_text(f"#!{sys.executable}\nprint('reviewed')\n")
+        copilot.chmod(0o755)
+        monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ.get('PATH', '')}")
+        input_file = Path(self.temp_dir) / "tasks.jsonl"
+        input_file.write_text('{"prompt": "one"}\n{"prompt": "two"}\n')
+        output_file = Path(self.temp_dir) / "tasks.results.jsonl"
+        output_file.write_text('{"index": 0, "success": true}\n')
+        
+        runner = CliRunner()
+        args = ['map', 'test-agent', '--input', str(input_file), '--subagents-dir', str(self.subagents_dir)]
+        result = runner.invoke(cli, args)
+        assert result.exit_code == 0
+        assert "1 succeeded" in result.output and "1 skipped" in result.output
+        
+        records = [json.loads(line) for line in output_file.read_text().splitlines()]
+        assert [record['index'] for record in records] == [0, 1]
+        assert records[1]['output'] == "reviewed"
+        
+        result = runner.invoke(cli, args + ['--overwrite'])
+        assert result.exit_code == 0
+        assert len(output_file.read_text().splitlines()) == 2
+    
+    def test_run_plan_dry_run(self):
+        """Test previewing a plan without executing or updating it."""
+        plan_file = Path(self.temp_dir) / "plan.md"
+        plan_text = ("### Step 1: Test\n- **Subagent**: `test-agent`\n- **Purpose**: Test it\n"
+                     "- **Dependencies**: None\n- **Status**: PENDING\n")
+        plan_file.write_text(plan_text)
+        
+        runner = CliRunner()
+        result = runner.invoke(cli, [
+            'run-plan', str(plan_file), '--dry-run',
+            '--subagents-dir', str(self.subagents_dir)
+        ])
+        assert result.exit_code == 0
+        assert "COMPLETED" in result.output
+        assert plan_file.read_text() == plan_text
+    
+    def test_resume_runs_only_incomplete_steps(self, monkeypatch):
+        """Test that resume continues from the checkpoint without re-running completed steps."""
+        bin_dir = Path(self.temp_dir) / "bin"
+        bin_dir.mkdir()
+        runs = Path(self.temp_dir) / "runs.txt"
+        fixed = Path(self.temp_dir) / "fixed"
+        copilot = bin_dir / "copilot"
+        copilot.write_text(f"#!{sys.executable}\nimport os, sys\n"
+                           "prompt = sys.argv[sys.argv.index('-p') + 1]\n"
+                           f"open({str(runs)!r}, 'a').write(prompt[-6:] + '\\n')\n"
+                           f"if prompt.endswith('Second') and not os.path.exists({str(fixed)!r}):\n"
+                           "    sys.exit('Error: permission denied')\n")
+        copilot.chmod(0o755)
+        monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ.get('PATH', '')}")
+        plan_file = Path(self.temp_dir) / "plan.md"
+        plan_file.write_text("### Step 1: One\n- **Subagent**: `test-agent`\n- **Purpose**: First\n"
+                             "- **Dependencies**: None\n\n"
+                             "### Step 2: Two\n- **Subagent**: `test-agent`\n- **Purpose**: Second\n"
+                             "- **Dependencies**: Step 1\n")
+        
+        runner = CliRunner()
+        args = [str(plan_file), '--skip-verification', '--subagents-dir', str(self.subagents_dir)]
+        result = runner.invoke(cli, ['resume'] + args)
+        assert result.exit_code == 1 and "No checkpoint found" in result.output
+        
+        result = runner.invoke(cli, ['run-plan'] + args)
+        assert result.exit_code == 1
+        # A permission error is permanent, so it is not retried
+        assert runs.read_text().split() == ["First", "Second"]
+        
+        fixed.touch()
+        result = runner.invoke(cli, ['resume'] + args)
+        assert result.exit_code == 0
+        assert "continuing from step 2" in result.output
+        assert runs.read_text().split() == ["First", "Second", "Second"]
+        assert (Path(self.temp_dir) / "plan.checkpoint.jsonl").read_text().count('"COMPLETED"') == 2
+    
+    def test_run_plan_applies_limits_to_concurrent_steps(self, monkeypatch):
+        """Test that parallel plan steps each start under their subagent's memory and CPU limits."""
+        bin_dir = Path(self.temp_dir) / "bin"
+        bin_dir.mkdir()
+        copilot = bin_dir / "copilot"
+        copilot.write_text(f"#!{sys.executable}\nimport resource, time\ntime.sleep(0.2)\n"
+                           "print('cpu', *resource.getrlimit(resource.RLIMIT_CPU))\n")
+        copilot.chmod(0o755)
+        monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ.get('PATH', '')}")
+        (self.subagents_dir / "limited.md").write_text(
+            '---\nname: "limited"\nmax_memory_mb: 4096\nmax_cpu_seconds: 60\n---\n\nLimited.\n')
+        plan_file = Path(self.temp_dir) / "plan.md"
+        plan_file.write_text("".join(f"### Step {number}: Part {number}\n- **Subagent**: `limited`\n"
+                                     f"- **Purpose**: Part {number}\n- **Dependencies**: None\n\n"
+                                     for number in range(1, 7)))
+        
+        runner = CliRunner()
+        result = runner.invoke(cli, ['run-plan', str(plan_file), '--max-workers', '6', '--retries', '0',
+                                     '--skip-verification', '--subagents-dir', str(self.subagents_dir)])
+        assert result.exit_code == 0, result.output
+        assert plan_file.read_text().count("**Status**: COMPLETED") == 6
+        logs = list((self.subagents_dir / "state" / "logs").glob("*-limited-*.log"))
+        assert len(logs) == 6
+        assert all("cpu 60 65" in log.read_text() for log in logs)
+    
+    def test_invoke_yolo_flag(self):
+        """Test that the --yolo flag overrides the configured YOLO mode."""
+        runner = CliRunner()
+        args = ['invoke', 'test-agent', '--prompt', 'Test prompt', '--dry-run',
+                '--subagents-dir', str(self.subagents_dir)]
+        
+        result = runner.invoke(cli, ['--yolo'] + args)
+        assert result.exit_code == 0
+        assert "--allow-all-tools" in result.output
+        
+        result = runner.invoke(cli, ['--no-yolo'] + args)
+        assert result.exit_code == 0
+        assert "--allow-all-tools" not in result.output
+        assert "--allow-tool" in result.output
+
+class TestDaemon:
+    """Tests for serving CLI commands through the resident daemon."""
+    
+    def setup_method(self):
+        """Start a daemon on a temporary socket."""
+        import threading
+        from daemon import SubagentDaemon
+        
+        self.temp_dir = tempfile.mkdtemp()
+        self.subagents_dir = Path(self.temp_dir) / "subagents"
+        self.subagents_dir.mkdir()
+        (self.subagents_dir / "served-agent.md").write_text("""---
+description: "Served by the daemon"
+allowed_tools: ["write"]
+---
+
+Prompt.
+""")
+        self.socket_path = Path(self.temp_dir) / "daemon.sock"
+        os.environ['COPILOT_SUBAGENTS_DAEMON_SOCKET'] = str(self.socket_path)
+        
+        self.daemon = SubagentDaemon(self.socket_path, self.subagents_dir,
+                                     poll_interval=0.1, use_inotify=False)
+        self.thread = threading.Thread(target=self.daemon.serve_forever, daemon=True)
+        self.thread.start()
+        
+        from daemon import wait_for_daemon
+        assert wait_for_daemon(self.socket_path)
+    
+    def teardown_method(self):
+        """Stop the daemon and clean up temporary files."""
+        import shutil
+        self.daemon.shutdown()
+        self.thread.join(timeout=5)
+        del os.environ['COPILOT_SUBAGENTS_DAEMON_SOCKET']
+        shutil.rmtree(self.temp_dir)
+    
+    def test_list_served_by_daemon(self, capsys):
+        """Test that eligible commands are answered by the daemon."""
+        from daemon import run_via_daemon
+        
+        exit_code = run_via_daemon(['list', '--subagents-dir', str(self.subagents_dir)])
+        
+        assert exit_code == 0
+        assert "served-agent" in capsys.readouterr().out
+        assert self.daemon.requests_served == 1
+    
+    def test_client_width_does_not_leak(self, monkeypatch):
+        """Test that a request's terminal width is only set while it runs."""
+        monkeypatch.delenv('COLUMNS', raising=False)
+        request = {'command': 'run', 'argv': ['list', '--subagents-dir', str(self.subagents_dir)],
+                   'cwd': self.daemon.cwd, 'env': self.daemon.env, 'columns': 123}
+        
+        assert self.daemon.handle_request(request)['exit_code'] == 0
+        assert 'COLUMNS' not in os.environ
+        monkeypatch.setenv('COLUMNS', '80')
+        assert self.daemon.handle_request(request)['exit_code'] == 0
+        assert os.environ['COLUMNS'] == '80'
+    
+    def test_ineligible_commands_run_in_process(self):
+        """Test that real invocations never go through the daemon."""
+        from daemon import run_via_daemon
+        
+        assert run_via_daemon(['invoke', 'served-agent', '--prompt', 'Go']) is None
+        assert self.daemon.requests_served == 0
+    
+    def test_socket_directory_must_be_private(self):
+        """Test that sockets in shared, foreign or symlinked directories are neither served nor used."""
+        from daemon import SubagentDaemon, run_via_daemon
+        
+        args = ['list', '--subagents-dir', str(self.subagents_dir)]
+        os.chmod(self.temp_dir, 0o755)
+        try:
+            assert run_via_daemon(args) is None
+        finally:
+            os.chmod(self.temp_dir, 0o700)
+        
+        link = Path(tempfile.mkdtemp()) / "link"
+        link.symlink_to(self.temp_dir, target_is_directory=True)
+        try:
+            os.environ['COPILOT_SUBAGENTS_DAEMON_SOCKET'] = str(link / "daemon.sock")
+            assert run_via_daemon(args) is None
+            with pytest.raises(PermissionError):
+                SubagentDaemon(link / "other.sock", self.subagents_dir).serve_forever()
+        finally:
+            os.environ['COPILOT_SUBAGENTS_DAEMON_SOCKET'] = str(self.socket_path)
+            link.unlink()
+            link.parent.rmdir()
+        
+        assert self.daemon.requests_served == 0
+        assert run_via_daemon(args) == 0
+    
+    def test_changes_invalidate_registry(self, capsys):
+        """Test that the watcher drops cached entries when files change."""
+        import time
+        from daemon import run_via_daemon
+        
+        run_via_daemon(['list', '--subagents-dir', str(self.subagents_dir)])
+        (self.subagents_dir / "new-agent.md").write_text("""---
+description: "Added later"
+---
+
+Prompt.
+""")
+        
+        deadline = time.monotonic() + 5
+        while self.daemon.invalidations == 0 and time.monotonic() < deadline:
+            time.sleep(0.05)
+        
+        capsys.readouterr()
+        run_via_daemon(['list', '--subagents-dir', str(self.subagents_dir)])
+        assert "new-agent" in capsys.readouterr().out
@@ -4,12 +4,34 @@ import pytest
 from pathlib import Path
 import tempfile
 import yaml
+import json
 
 # Import from the source directory  
 import sys
 sys.path.insert(0, str(Path(__file__).parent.parent.parent / "src" / "copilot_subagents" / "src"))
 
-from core import SubagentParser, ToolVerifier, format_copilot_tools
+from batch import MapTask, ResultWriter, completed_indices, read_tasks, run_map
+from checkpoint import Checkpoint, get_checkpoint_path, step_digests
+from config import resolve_config
+from context import (DROPPED, INCLUDED, SKIPPED, TRUNCATED, assemble_context, expand_context_paths,
+                     get_context_budget)
+from core import (CopilotCLIVerifier, SubagentParser, ToolVerifier, format_copilot_tools,
+                  get_ai_tool_verifier, get_supported_ai_tools, load_subagent_file,
+                  _decode_flat_frontmatter)
+from invocation import (Invocation, ToolVerificationError, build_full_prompt, invoke_subagent, prepare_subagent,
+                        run_command, split_context_argument)
+from jobqueue import CANCELLED, FAILED, QUEUED, RUNNING, SUCCEEDED, JobQueue, JobWorker
+from limits import ResourceLimits, parse_duration
+from plan import Plan, PlanExecutor, parse_dependencies
+from ratelimit import ModelLimit, RateLimiter, parse_rate_limits
+from registry import SubagentIndex
+from resultcache import ResultCache, result_cache_key
+from retry import RetryPolicy
+from runlog import RunLog, new_run_log, prune_run_logs
+from tools import (ToolCatalog, ToolMatcher, ToolPolicy, ToolSpec, load_tool_catalog,
+                   parse_tool_spec)
+from tracing import Tracer, span, start_tracing, stop_tracing
+from verification import VerificationCache
 
 class TestSubagentParser:
     """Tests for SubagentParser."""
@@ -96,6 +118,200 @@ Content here
         
         with pytest.raises(ValueError, match="No YAML frontmatter found"):
             self.parser.parse_subagent_file("no-frontmatter")
+    
+    def test_parsed_record_is_cached(self):
+        """Test that repeated lookups share one parsed record."""
+        record = self.parser.load_subagent("test-agent")
+        other_parser = SubagentParser(self.subagents_dir)
+        
+        assert other_parser.load_subagent("test-agent") is record
+        assert load_subagent_file(self.test_subagent) is record
+    
+    def test_cache_invalidated_on_change(self):
+        """Test that editing a subagent file invalidates its cached record."""
+        record = self.parser.load_subagent("test-agent")
+        self.test_subagent.write_text("""---
+name: "test-agent"
+allowed_tools: ["write"]
+---
+
+Updated prompt.
+""")
+        
+        updated = self.parser.load_subagent("test-agent")
+        assert updated is not record
+        assert updated.allowed_tools == ["write"]
+        assert updated.prompt == "Updated prompt."
+    
+    def test_resource_limits_from_frontmatter(self):
+        """Test the timeout, max_memory_mb and max_cpu_seconds fields."""
+        assert self.parser.parse_file(str(self.test_subagent))['limits'] == {
+            'timeout': None, 'max_memory_mb': None, 'max_cpu_seconds': None}
+        self.test_subagent.write_text('---\nname: "test-agent"\ntimeout: 15m\nmax_memory_mb: 512\n'
+                                      'max_cpu_seconds: 60\n---\n\nLimited.\n')
+        assert self.parser.parse_file(str(self.test_subagent))['limits'] == {
+            'timeout': 900.0, 'max_memory_mb': 512, 'max_cpu_seconds': 60}
+        assert [parse_duration(value) for value in (90, '30s', '1.5h')] == [90.0, 30.0, 5400.0]
+        
+        self.test_subagent.write_text('---\nname: "test-agent"\nmax_memory_mb: lots\n---\n\nBad.\n')
+        with pytest.raises(ValueError, match="max_memory_mb"):
+            self.parser.parse_file(str(self.test_subagent))
+        with pytest.raises(ValueError):
+            parse_duration('-5s')
+    
+    def test_prompt_body_loaded_lazily(self):
+        """Test that only the frontmatter is read until the prompt is needed."""
+        record = self.parser.load_subagent("test-agent")
+        
+        assert record.allowed_tools == ["create_file", "read_file"]
+        assert record._prompt is None
+        assert record.prompt.startswith("You are a test subagent")
+    
+    def test_listing_ignores_body(self):
+        """Test that listing works without decoding the prompt body."""
+        body_only = self.subagents_dir / "binary-body.md"
+        body_only.write_bytes(b'---\ndescription: "Header only"\n---\n' + b'\xff' * 4096)
+        
+        record = self.parser.load_subagent("binary-body")
+        assert record.frontmatter["description"] == "Header only"
+        assert "binary-body" in self.parser.list_subagents()
+    
+    def test_verifier_shares_parser_records(self):
+        """Test that ToolVerifier resolves subagents through the shared cache."""
+        verifier = ToolVerifier(parser=self.parser)
+        result = verifier.verify_allowed_tools(str(self.test_subagent))
+        
+        assert result['invalid_tools'] == ["create_file", "read_file"]
+        assert verifier.parser is self.parser
+
+class TestFlatFrontmatterDecoder:
+    """Tests for the restricted frontmatter fast path."""
+    
+    @pytest.mark.parametrize("text", [
+        'name: "agent"\ndescription: "Reviews code"\nallowed_tools: ["write", "shell(*)"]\ndeny_tools: []',
+        "name: 'it''s'\nmodel: gpt-4.1\ntimeout: 300",
+        'allowed_tools:\n  - "write"\n  - shell(git push)\ntags: [a, b]',
+        'model: gpt-4:latest\n# comment\nempty:',
+    ])
+    def test_flat_headers_match_yaml(self, text):
+        """Test that flat headers decode exactly as YAML would."""
+        assert _decode_flat_frontmatter(text) == yaml.safe_load(text)
+    
+    @pytest.mark.parametrize("text", [
+        'created: 2025-10-08',
+        'version: 1.0',
+        'enabled: yes',
+        'description: "escaped \\" quote"',
+        'nested:\n  key: value',
+        'description: text # trailing comment',
+        'tools: [1, 2]',
+        'description: >\n  folded text',
+    ])
+    def test_exotic_headers_fall_back_to_yaml(self, text):
+        """Test that anything outside the flat shape is left to the YAML parser."""
+        assert _decode_flat_frontmatter(text) is None
+    
+    def test_exotic_file_still_parses(self):
+        """Test that files needing full YAML parse correctly."""
+        temp_dir = Path(tempfile.mkdtemp())
+        (temp_dir / "exotic.md").write_text("""---
+name: exotic
+created: 2025-10-08
+options:
+  retries: 3
+---
+
+Prompt.
+""")
+        frontmatter, _ = SubagentParser(temp_dir).parse_subagent_file("exotic")
+        assert frontmatter["options"] == {"retries": 3}
+        assert str(frontmatter["created"]) == "2025-10-08"
+
+class TestSubagentIndex:
+    """Tests for the persisted registry index."""
+    
+    def setup_method(self):
+        """Set up temporary directory with test files."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.subagents_dir = Path(self.temp_dir)
+        self.agent_file = self.subagents_dir / "indexed-agent.md"
+        self.agent_file.write_text("""---
+name: "indexed-agent"
+description: "Indexed"
+allowed_tools: ["write"]
+---
+
+Prompt.
+""")
+        (self.subagents_dir / "broken.md").write_text("No frontmatter")
+    
+    def teardown_method(self):
+        """Clean up temporary files."""
+        import shutil
+        shutil.rmtree(self.temp_dir)
+    
+    def test_refresh_writes_index(self):
+        """Test that refreshing persists parsed frontmatter and errors."""
+        index = SubagentIndex(self.subagents_dir)
+        entries = {entry.name: entry for entry in index.refresh()}
+        
+        assert index.index_path.exists()
+        assert entries["indexed-agent"].allowed_tools == ["write"]
+        assert "No YAML frontmatter found" in entries["broken"].error
+    
+    def test_unchanged_files_are_not_reparsed(self):
+        """Test that entries with matching mtime and size come from the index."""
+        index = SubagentIndex(self.subagents_dir)
+        index.refresh()
+        
+        data = json.loads(index.index_path.read_text())
+        data['entries']['indexed-agent']['frontmatter']['description'] = "From index"
+        index.index_path.write_text(json.dumps(data))
+        
+        entries = {entry.name: entry for entry in SubagentIndex(self.subagents_dir).refresh()}
+        assert entries["indexed-agent"].description == "From index"
+    
+    def test_changed_files_are_reparsed(self):
+        """Test that edited files are re-parsed and removed files dropped."""
+        index = SubagentIndex(self.subagents_dir)
+        index.refresh()
+        
+        self.agent_file.write_text("""---
+name: "indexed-agent"
+description: "Edited description"
+---
+
+Prompt.
+""")
+        (self.subagents_dir / "broken.md").unlink()
+        
+        entries = SubagentIndex(self.subagents_dir).refresh()
+        assert [entry.name for entry in entries] == ["indexed-agent"]
+        assert entries[0].description == "Edited description"
+    
+    def test_nested_subagents_are_namespaced(self):
+        """Test recursive discovery with team/agent names in deterministic order."""
+        team_dir = self.subagents_dir / "platform"
+        team_dir.mkdir()
+        (team_dir / "deployer.md").write_text("""---
+description: "Deploys things"
+---
+
+Prompt.
+""")
+        (team_dir / "README.md").write_text("Team readme")
+        state_dir = self.subagents_dir / "state"
+        state_dir.mkdir()
+        (state_dir / "plan.md").write_text("# Plan")
+        
+        entries = SubagentIndex(self.subagents_dir, workers=4).refresh()
+        
+        assert [entry.name for entry in entries] == ["broken", "indexed-agent", "platform/deployer"]
+        assert entries[2].description == "Deploys things"
+        assert "No YAML frontmatter found" in entries[0].error
+        
+        parser = SubagentParser(self.subagents_dir)
+        assert parser.get_subagent_prompt("platform/deployer") == "Prompt."
 
 class TestToolVerifier:
     """Tests for ToolVerifier."""
@@ -133,6 +349,13 @@ class TestToolVerifier:
         assert "shell(*)" in valid
         assert "invalid_tool" in invalid
     
+    def test_wildcard_catalog_entries(self):
+        """Test that shell(*) in the catalog accepts any shell command."""
+        valid, invalid = self.verifier.verify_tools(["shell(npm)", "shell(git push)", "write(notes.md)"])
+        
+        assert valid == ["shell(npm)", "shell(git push)", "write(notes.md)"]
+        assert invalid == []
+    
     def test_add_valid_tool(self):
         """Test adding a new valid tool."""
         self.verifier.add_valid_tool("custom_tool")
@@ -162,7 +385,7 @@ class TestFormatCopilotTools:
     
         expected = '--allow-tool write --allow-tool shell(*)'
         assert result == expected
-
+    
     def test_format_deny_tools(self):
         """Test formatting denied tools."""
         tools = ["shell(*)", "shell(git)"]
@@ -170,7 +393,7 @@ class TestFormatCopilotTools:
     
         expected = '--deny-tool shell(*) --deny-tool shell(git)'
         assert result == expected
-
+    
     def test_format_empty_tools(self):
         """Test formatting empty tools list."""
         result = format_copilot_tools([], "allow")
@@ -179,4 +402,1320 @@ class TestFormatCopilotTools:
     def test_format_single_tool(self):
         """Test formatting single tool."""
         result = format_copilot_tools(["write"], "deny")
-        assert result == '--deny-tool write'
\ No newline at end of file
+        assert result == '--deny-tool write'
+
+class TestToolMatcher:
+    """Tests for tool specifications and compiled matchers."""
+    
+    @pytest.mark.parametrize("tool,expected", [
+        ("write", ToolSpec("write")),
+        ("shell(*)", ToolSpec("shell")),
+        ("shell(git)", ToolSpec("shell", ("git",), False)),
+        ("shell( git   push )", ToolSpec("shell", ("git", "push"), False)),
+        ("shell(git:*)", ToolSpec("shell", ("git",), False)),
+        ("shell(git *)", ToolSpec("shell", ("git",), False)),
+    ])
+    def test_parse_tool_spec(self, tool, expected):
+        """Test parsing tool entries into structured specs."""
+        assert parse_tool_spec(tool) == expected
+    
+    @pytest.mark.parametrize("tool", ["", "shell(", "shell(a(b))", "two words", None])
+    def test_parse_invalid_tool_spec(self, tool):
+        """Test that malformed entries are rejected."""
+        with pytest.raises(ValueError):
+            parse_tool_spec(tool)
+    
+    def test_prefix_matching(self):
+        """Test that arguments match on whole command words."""
+        matcher = ToolMatcher(["write", "shell(git)", "shell(npm test)"])
+        
+        assert matcher.matches("write")
+        assert matcher.matches("write(README.md)")
+        assert matcher.matches("shell(git push origin)")
+        assert matcher.matches("shell(npm test --watch)")
+        assert not matcher.matches("shell(gitk)")
+        assert not matcher.matches("shell(npm install)")
+        assert not matcher.matches("shell(*)")
+        assert not matcher.matches("shell(")
+        assert matcher.matching_rule("shell(git status)") == "shell(git)"
+    
+    def test_invalid_rules_are_reported(self):
+        """Test that malformed rules are kept out of the index."""
+        matcher = ToolMatcher(["write", "shell("])
+        
+        assert matcher.rules == ["write"]
+        assert matcher.invalid_rules == ["shell("]
+    
+    def test_policy_queries(self):
+        """Test allowed/denied queries and shadow detection."""
+        policy = ToolPolicy(["shell(*)", "shell(git push)", "write"], ["shell(git)"])
+        
+        assert policy.is_allowed("shell(ls)")
+        assert policy.is_allowed("write")
+        assert not policy.is_allowed("shell(git status)")
+        assert policy.is_denied("shell(git push --force)")
+        assert policy.shadowed() == [("shell(git push)", "shell(git)")]
+        assert policy.overlaps() == [("shell(*)", "shell(git)")]
+
+class TestToolCatalogs:
+    """Tests for the packaged per-backend tool catalogs."""
+    
+    def test_every_supported_tool_has_a_catalog(self):
+        """Test that each advertised backend loads a well-formed catalog."""
+        supported = get_supported_ai_tools()
+        
+        assert supported[0] == "copilot-cli"
+        assert set(supported) == {"copilot-cli", "claude-code", "codex", "gemini-cli"}
+        for ai_tool in supported:
+            catalog = load_tool_catalog(ai_tool)
+            assert catalog.name == ai_tool
+            assert catalog.tools and catalog.binary
+            assert not catalog.matcher.invalid_rules
+    
+    def test_catalogs_are_cached(self):
+        """Test that a catalog and its matcher are built once per process."""
+        assert load_tool_catalog("claude-code") is load_tool_catalog("claude-code")
+        assert load_tool_catalog("claude-code").matcher is load_tool_catalog("claude-code").matcher
+    
+    def test_unknown_tool_is_rejected(self):
+        """Test that unknown backends no longer fall back to Copilot."""
+        with pytest.raises(ValueError, match="Unsupported AI tool"):
+            get_ai_tool_verifier("not-a-tool")
+    
+    def test_backend_flag_formats(self):
+        """Test that verifiers format flags from their catalogs."""
+        config = resolve_config(Path(tempfile.mkdtemp()))
+        claude = get_ai_tool_verifier("claude-code", config)
+        codex = get_ai_tool_verifier("codex", config)
+        
+        assert claude.format_tools(["Read", "Bash(git log)"], "allow") == ["--allowedTools", "Read,Bash(git log)"]
+        assert claude.format_model("opus") == ["--model", "opus"]
+        assert codex.format_tools(["shell(ls)"], "allow") == []
+        assert codex.supports_yolo_mode()
+        assert claude.unenforced_rules(["Read"], ["Bash(rm)"]) == []
+        assert [issue.split(":")[0] for issue in codex.unenforced_rules(["shell(ls)"], ["shell(rm)"])] == [
+            "OpenAI Codex CLI cannot enforce allowed tools", "OpenAI Codex CLI cannot enforce denied tools"]
+        assert get_ai_tool_verifier("codex", config.with_overrides(yolo_mode=True)).unenforced_rules(
+            ["shell(ls)"], ["shell(rm)"]) == []
+        
+        yolo = get_ai_tool_verifier("gemini-cli", config.with_overrides(yolo_mode=True))
+        assert yolo.format_tools(["read_file"], "allow") == ["--yolo"]
+    
+    def test_verify_against_other_backend(self):
+        """Test that verification switches catalogs with the AI tool."""
+        verifier = ToolVerifier("claude-code")
+        valid, invalid = verifier.verify_tools(["Read", "Bash(npm test)", "write"])
+        
+        assert valid == ["Read", "Bash(npm test)"]
+        assert invalid == ["write"]
+
+class TestVerificationCache:
+    """Tests for the content-hash keyed verification cache."""
+    
+    def setup_method(self):
+        """Set up a subagents directory with one agent."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.subagents_dir = Path(self.temp_dir)
+        self.agent_file = self.subagents_dir / "agent.md"
+        self.agent_file.write_text('---\nname: "agent"\nallowed_tools: ["write"]\n---\n\nPrompt.\n')
+        self.catalog = load_tool_catalog("copilot-cli")
+    
+    def teardown_method(self):
+        """Clean up temporary directory."""
+        import shutil
+        shutil.rmtree(self.temp_dir)
+    
+    def test_recorded_entries_persist(self):
+        """Test that a recorded verification is found by a later process."""
+        key = VerificationCache.key(self.agent_file, self.catalog)
+        VerificationCache(self.subagents_dir).record("agent", key)
+        
+        assert (self.subagents_dir / "state" / "verified.json").exists()
+        assert VerificationCache(self.subagents_dir).is_verified("agent", key)
+    
+    def test_agent_edit_invalidates(self):
+        """Test that editing the frontmatter changes the key and editing the prompt body does not."""
+        key = VerificationCache.key(self.agent_file, self.catalog)
+        self.agent_file.write_text(self.agent_file.read_text() + "More prompt.\n" * 10000)
+        assert VerificationCache.key(self.agent_file, self.catalog) == key
+        
+        self.agent_file.write_text(self.agent_file.read_text().replace('["write"]', '["write", "read"]'))
+        assert VerificationCache.key(self.agent_file, self.catalog) != key
+    
+    def test_catalog_upgrade_invalidates(self):
+        """Test that a new catalog version or tool list changes the key."""
+        catalog = self.catalog
+        upgraded = ToolCatalog(catalog.name, catalog.display_name, "2", catalog.binary,
+                               catalog.flags, catalog.flag_style, catalog.tools)
+        extended = ToolCatalog(catalog.name, catalog.display_name, catalog.version, catalog.binary,
+                               catalog.flags, catalog.flag_style, {**catalog.tools, "read": "Read"})
+        
+        keys = {VerificationCache.key(self.agent_file, c) for c in (catalog, upgraded, extended)}
+        assert len(keys) == 3
+
+SAMPLE_PLAN = """# Subagent Execution Plan
+
+## Request Summary
+**Status**: PLANNED
+
+## Execution Workflow
+
+### Step 1: Implement
+- **Subagent**: `developer`
+- **CLI Command**: 
+  ```bash
+  uv run subagents invoke developer --prompt "Context: auth
+
+Task: build it"
+  ```
+- **Dependencies**: None
+- **Status**: PENDING
+
+### Step 2: Document
+- **Subagent**: `doc-writer`
+- **Purpose**: Write docs
+- **Input**: The spec
+- **Dependencies**: None
+- **Status**: PENDING
+
+### Step 3: Review
+- **Subagent**: `code-reviewer`
+- **CLI Command**: `uv run subagents invoke code-reviewer --prompt "Review"`
+- **Dependencies**: Steps 1-2
+
+### Step 4: Release
+- **Subagent**: `developer`
+- **Purpose**: Release
+- **Dependencies**: Step 3
+- **Status**: PENDING
+
+## Success Criteria
+- [ ] Done
+"""
+
+class TestPlan:
+    """Tests for plan parsing and dependency-aware execution."""
+    
+    def setup_method(self):
+        """Set up a temporary plan file."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.plan_file = Path(self.temp_dir) / "plan.md"
+        self.plan_file.write_text(SAMPLE_PLAN)
+    
+    def teardown_method(self):
+        """Clean up temporary directory."""
+        import shutil
+        shutil.rmtree(self.temp_dir)
+    
+    @pytest.mark.parametrize("text,expected", [
+        ("None", []),
+        ("None - first step", []),
+        ("Step 1", [1]),
+        ("Step 1, Step 3", [1, 3]),
+        ("Steps 1-3", [1, 2, 3]),
+        ("Step 2 and Steps 4-5", [2, 4, 5]),
+    ])
+    def test_parse_dependencies(self, text, expected):
+        """Test the Dependencies field formats used by plans."""
+        assert parse_dependencies(text) == expected
+    
+    def test_parse_steps(self):
+        """Test extracting subagents, prompts and dependencies."""
+        plan = Plan.load(self.plan_file)
+        steps = plan.by_number
+        
+        assert [step.subagent for step in plan.steps] == ["developer", "doc-writer", "code-reviewer", "developer"]
+        assert steps[1].prompt == "Context: auth\n\nTask: build it"
+        assert steps[2].prompt == "Write docs" and steps[2].context == "The spec"
+        assert steps[3].prompt == "Review" and steps[3].dependencies == [1, 2]
+    
+    def test_cycles_are_rejected(self):
+        """Test that circular and unknown dependencies are reported."""
+        self.plan_file.write_text(SAMPLE_PLAN.replace("- **Dependencies**: None\n- **Status**: PENDING\n\n### Step 2",
+                                                      "- **Dependencies**: Step 4\n- **Status**: PENDING\n\n### Step 2"))
+        with pytest.raises(ValueError, match="Circular"):
+            Plan.load(self.plan_file)
+        
+        self.plan_file.write_text(SAMPLE_PLAN.replace("Dependencies**: Step 3", "Dependencies**: Step 9"))
+        with pytest.raises(ValueError, match="unknown step"):
+            Plan.load(self.plan_file)
+    
+    def test_independent_steps_run_in_parallel(self):
+        """Test that ready steps overlap and dependents wait for them."""
+        import threading
+        import time
+        barrier = threading.Barrier(2, timeout=5)
+        order = []
+        
+        def runner(step):
+            if step.number in (1, 2):
+                # Both independent steps must be running at the same time
+                barrier.wait()
+            time.sleep(0.01)
+            order.append(step.number)
+            return 0
+        
+        plan = Plan.load(self.plan_file)
+        assert PlanExecutor(plan, runner, max_workers=4).run()
+        assert sorted(order[:2]) == [1, 2] and order[2:] == [3, 4]
+    
+    def test_failure_blocks_dependents_and_writes_back(self):
+        """Test continue-on-error marks dependents BLOCKED and records status and durations."""
+        plan = Plan.load(self.plan_file)
+        assert not PlanExecutor(plan, lambda step: 1 if step.number == 1 else 0).run()
+        
+        statuses = {step.number: step.status for step in Plan.load(self.plan_file).steps}
+        assert statuses == {1: "FAILED", 2: "COMPLETED", 3: "BLOCKED", 4: "BLOCKED"}
+        
+        text = self.plan_file.read_text()
+        assert "**Status**: FAILED" in text.split("## Execution Workflow")[0]
+        assert text.count("- **Duration**:") == 2
+        assert "## Success Criteria" in text
+    
+    def test_log_paths_are_written_back(self):
+        """Test that a runner's log path is recorded instead of the step output."""
+        def runner(step):
+            step.log = f"state/logs/step{step.number}.log"
+            return 0
+        
+        PlanExecutor(Plan.load(self.plan_file), runner).run()
+        plan = Plan.load(self.plan_file)
+        assert plan.by_number[3].log == "state/logs/step3.log"
+        assert self.plan_file.read_text().count("- **Log**:") == 4
+        
+        # Re-running replaces the Log lines rather than adding more
+        PlanExecutor(plan, runner).run()
+        assert self.plan_file.read_text().count("- **Log**:") == 4
+    
+    def test_fail_fast_cancels_pending_steps(self):
+        """Test that fail-fast starts nothing after the first failure."""
+        started = []
+        
+        def runner(step):
+            started.append(step.number)
+            return 1
+        
+        plan = Plan.load(self.plan_file)
+        assert not PlanExecutor(plan, runner, max_workers=1, fail_fast=True).run()
+        assert started == [1]
+        assert plan.by_number[2].status == "CANCELLED"
+    
+    def test_rerun_resumes_completed_steps(self):
+        """Test that steps already COMPLETED in the plan file are skipped."""
+        PlanExecutor(Plan.load(self.plan_file), lambda step: 1 if step.number == 4 else 0).run()
+        started = []
+        
+        def runner(step):
+            started.append(step.number)
+            return 0
+        
+        assert PlanExecutor(Plan.load(self.plan_file), runner).run()
+        assert started == [4]
+        assert self.plan_file.read_text().count("- **Duration**:") == 4
+    
+    def test_transient_failures_are_retried_with_backoff(self):
+        """Test that a rate-limited step is retried and a permission error is not."""
+        import random
+        attempts = {1: 0, 2: 0}
+        delays = []
+        
+        def runner(step):
+            if step.number in attempts:
+                attempts[step.number] += 1
+                if step.number == 1 and attempts[1] < 3:
+                    step.stderr = "Error: rate limit exceeded, try later"
+                    return 1
+                if step.number == 2:
+                    step.stderr = "Error: permission denied for repository"
+                    return 1
+            return 0
+        
+        plan = Plan.load(self.plan_file)
+        retry = RetryPolicy(retries=3, base_delay=1.0, rng=random.Random(7))
+        assert not PlanExecutor(plan, runner, retry=retry, sleep=delays.append).run()
+        assert attempts == {1: 3, 2: 1}
+        assert plan.by_number[1].status == "COMPLETED" and plan.by_number[1].attempts == 3
+        assert plan.by_number[2].status == "FAILED"
+        assert 0.5 <= delays[0] <= 1.0 and 1.0 <= delays[1] <= 2.0
+    
+    def test_checkpoint_skips_completed_steps_unless_inputs_change(self):
+        """Test that checkpointed steps are not re-run, even from a regenerated plan."""
+        plan = Plan.load(self.plan_file)
+        with Checkpoint(get_checkpoint_path(self.plan_file), step_digests(plan)) as checkpoint:
+            PlanExecutor(plan, lambda step: 1 if step.number == 4 else 0, on_finish=checkpoint.record).run()
+        records = [json.loads(line) for line in get_checkpoint_path(self.plan_file).read_text().splitlines()]
+        assert sorted(record['step'] for record in records) == [1, 2, 3, 4]
+        
+        # The planner rewrites the plan with every step PENDING and a new prompt for step 2
+        self.plan_file.write_text(SAMPLE_PLAN.replace("Write docs", "Write better docs"))
+        plan = Plan.load(self.plan_file)
+        checkpoint = Checkpoint(get_checkpoint_path(self.plan_file), step_digests(plan))
+        done = checkpoint.apply(plan)
+        assert [step.number for step in done] == [1]
+        assert plan.by_number[1].duration is not None
+        
+        started = []
+        
+        def runner(step):
+            started.append(step.number)
+            return 0
+        
+        with checkpoint:
+            assert PlanExecutor(plan, runner, on_finish=checkpoint.record).run()
+        assert sorted(started) == [2, 3, 4]
+        assert Checkpoint(get_checkpoint_path(self.plan_file), step_digests(plan)).apply(Plan.load(self.plan_file))
+
+class TestRetryPolicy:
+    """Tests for classifying failures and backoff delays."""
+    
+    @pytest.mark.parametrize("returncode,output,expected", [
+        (1, "HTTP 503 Service Unavailable", True),
+        (1, "request timed out", True),
+        (1, "Error: Permission denied (publickey)", False),
+        (1, "rate limit hit, then: not authorized", False),
+        (1, "assertion failed on line 500", False),
+        (-9, "", True),
+        (75, "", True),
+        (None, "Connection reset by peer", True),
+        (None, "Tool verification failed", False),
+    ])
+    def test_classification(self, returncode, output, expected):
+        """Test that permanent messages win over transient ones and exit codes."""
+        assert RetryPolicy().is_transient(returncode, output) is expected
+    
+    def test_retries_and_delays_are_bounded(self):
+        """Test the retry count and the capped, jittered exponential delay."""
+        import random
+        retry = RetryPolicy(retries=2, base_delay=10.0, max_delay=30.0, rng=random.Random(1))
+        assert retry.should_retry(2, -9) and not retry.should_retry(3, -9)
+        for attempt, ceiling in [(1, 10.0), (2, 20.0), (3, 30.0), (8, 30.0)]:
+            assert ceiling / 2 <= retry.delay(attempt) <= ceiling
+
+class TestRateLimiter:
+    """Tests for per-model token buckets and concurrency caps."""
+    
+    def setup_method(self):
+        """Set up a limiter database and a controllable clock."""
+        self.temp_dir = Path(tempfile.mkdtemp())
+        self.path = self.temp_dir / "state" / "ratelimit.sqlite"
+        self.now = 1000.0
+    
+    def teardown_method(self):
+        """Clean up temporary directory."""
+        import shutil
+        shutil.rmtree(self.temp_dir)
+    
+    def _limiter(self, **limits):
+        return RateLimiter(self.path, limits, clock=lambda: self.now)
+    
+    def test_parse_rate_limits(self):
+        """Test parsing model=rpm[/concurrency] entries."""
+        assert parse_rate_limits("gpt-5=60/4, claude-sonnet-4.5=30,") == {
+            "gpt-5": ModelLimit(60, 4), "claude-sonnet-4.5": ModelLimit(30, 0)}
+        for invalid in ("gpt-5", "gpt-5=fast", "=60", "gpt-5=60/-1"):
+            with pytest.raises(ValueError, match="Invalid rate limit"):
+                parse_rate_limits(invalid)
+    
+    def test_from_config(self, monkeypatch):
+        """Test that the limiter is only created when some model is limited."""
+        assert RateLimiter.from_config(self.temp_dir, resolve_config(self.temp_dir)) is None
+        monkeypatch.setenv("COPILOT_SUBAGENTS_RATE_LIMITS", "gpt-5=60")
+        monkeypatch.setenv("COPILOT_SUBAGENTS_RATE_LIMIT_CONCURRENCY", "2")
+        limiter = RateLimiter.from_config(self.temp_dir, resolve_config(self.temp_dir))
+        assert limiter.path == self.path
+        assert limiter.limit_for("gpt-5") == ModelLimit(60, 0) and limiter.limit_for(None) == ModelLimit(0, 2)
+    
+    def test_token_bucket_is_shared_across_limiters(self):
+        """Test that separate limiters on one database draw from one refilling budget."""
+        limits = {"gpt-5": ModelLimit(60, 0, burst=2)}
+        first, second = self._limiter(**limits), self._limiter(**limits)
+        
+        assert first.try_acquire("gpt-5") == (0, 0.0)
+        assert second.try_acquire("gpt-5") == (0, 0.0)
+        lease, delay = first.try_acquire("gpt-5")
+        assert lease is None and delay == pytest.approx(1.0)
+        # Other models have their own bucket
+        assert second.try_acquire(None) == (0, 0.0)
+        
+        self.now += 0.5
+        assert second.try_acquire("gpt-5")[1] == pytest.approx(0.5)
+        self.now += 0.5
+        assert second.try_acquire("gpt-5") == (0, 0.0)
+    
+    def test_concurrency_cap_and_dead_leases(self):
+        """Test that leases cap running invocations and leases of dead processes are reclaimed."""
+        import sqlite3
+        import subprocess
+        limiter = self._limiter(**{"gpt-5": ModelLimit(0, 2)})
+        first, _ = limiter.try_acquire("gpt-5")
+        second, _ = limiter.try_acquire("gpt-5")
+        assert first and second
+        assert limiter.try_acquire("gpt-5")[0] is None
+        
+        limiter.release(first)
+        third, _ = limiter.try_acquire("gpt-5")
+        assert third
+        
+        dead = subprocess.Popen([sys.executable, "-c", "pass"])
+        dead.wait()
+        with sqlite3.connect(self.path) as connection:
+            connection.execute("UPDATE leases SET pid = ? WHERE id = ?", (dead.pid, second))
+        assert limiter.try_acquire("gpt-5")[0] is not None
+    
+    def test_slot_serializes_invocations(self):
+        """Test that run_command holds a slot for the whole backend run."""
+        import asyncio
+        limiter = self._limiter(**{"gpt-5": ModelLimit(0, 1)})
+        code = "import time\nprint(time.time())\ntime.sleep(0.3)\nprint(time.time())"
+        
+        async def run():
+            return await asyncio.gather(*(run_command([sys.executable, "-c", code], rate_limiter=limiter,
+                                                      model="gpt-5") for _ in range(2)))
+        
+        spans = sorted([float(value) for value in result.stdout.split()] for result in asyncio.run(run()))
+        assert spans[1][0] >= spans[0][1]
+
+class TestSubagentsConfig:
+    """Tests for the resolved configuration snapshot."""
+    
+    def setup_method(self):
+        """Set up a working directory with a .env file."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.cwd = Path(self.temp_dir)
+        (self.cwd / ".env").write_text(
+            "COPILOT_SUBAGENTS_SUBAGENTS_DIR=agents\n"
+            "COPILOT_SUBAGENTS_YOLO_MODE=true\n"
+            "GITHUB_TOKEN=from-dotenv\n"
+        )
+    
+    def teardown_method(self):
+        """Clean up temporary directory."""
+        import shutil
+        shutil.rmtree(self.temp_dir)
+    
+    def test_dotenv_overrides_environment(self, monkeypatch):
+        """Test that .env values win over the process environment."""
+        monkeypatch.setenv("COPILOT_SUBAGENTS_YOLO_MODE", "false")
+        config = resolve_config(self.cwd)
+        
+        assert config.yolo_mode is True
+        assert config.get_subagents_dir() == self.cwd / "agents"
+    
+    def test_cli_flags_override_dotenv(self):
+        """Test that CLI flag overrides win and None means not given."""
+        config = resolve_config(self.cwd, yolo_mode=False, subagents_dir="custom", workers=None)
+        
+        assert config.yolo_mode is False
+        assert config.get_subagents_dir() == self.cwd / "custom"
+        assert config.workers > 0
+    
+    def test_resolving_does_not_touch_environment(self, monkeypatch):
+        """Test that .env values reach backend processes without changing os.environ."""
+        import os
+        monkeypatch.delenv("GITHUB_TOKEN", raising=False)
+        config = resolve_config(self.cwd)
+        
+        assert "GITHUB_TOKEN" not in os.environ
+        assert config.subprocess_env()["GITHUB_TOKEN"] == "from-dotenv"
+    
+    def test_config_is_immutable(self):
+        """Test that the snapshot cannot be changed after resolution."""
+        import dataclasses
+        config = resolve_config(self.cwd)
+        
+        with pytest.raises(dataclasses.FrozenInstanceError):
+            config.yolo_mode = False
+        with pytest.raises(TypeError):
+            config.env["COPILOT_SUBAGENTS_YOLO_MODE"] = "false"
+    
+    def test_verifiers_use_passed_config(self):
+        """Test that the config is threaded through the parser and verifiers."""
+        config = resolve_config(self.cwd)
+        verifier = ToolVerifier(config=config)
+        
+        assert verifier.parser.config is config
+        assert verifier.parser.subagents_dir == self.cwd / "agents" / "copilot-cli"
+        assert verifier.ai_verifier.format_tools(["write"], "allow") == ["--allow-all-tools"]
+        
+        quiet = CopilotCLIVerifier(config.with_overrides(yolo_mode=False))
+        assert quiet.format_tools(["write", "shell(git push)"], "allow") == [
+            "--allow-tool", "write", "--allow-tool", "shell(git push)"]
+
+class TestTracing:
+    """Tests for phase spans and trace export."""
+    
+    def setup_method(self):
+        """Set up a directory for trace files."""
+        self.temp_dir = Path(tempfile.mkdtemp())
+    
+    def teardown_method(self):
+        """Leave tracing off for other tests and clean up."""
+        import shutil
+        stop_tracing()
+        shutil.rmtree(self.temp_dir)
+    
+    def test_spans_are_noops_while_tracing_is_off(self):
+        """Test that spans record nothing and share one object when tracing is off."""
+        assert span('load') is span('parse', path='x')
+        with span('load') as phase:
+            phase.set(bytes=1)
+        assert stop_tracing() is None
+    
+    def test_summary_separates_own_time_of_nested_phases(self):
+        """Test that calls, total and own time are aggregated per phase."""
+        import time
+        tracer = start_tracing()
+        assert start_tracing() is tracer
+        with span('invoke'):
+            for _ in range(2):
+                with span('load'):
+                    time.sleep(0.02)
+            with span('subprocess') as phase:
+                phase.set(returncode=0)
+                time.sleep(0.05)
+        assert stop_tracing() is tracer
+        
+        summary = {phase.name: phase for phase in tracer.summary()}
+        assert list(summary) == ['invoke', 'load', 'subprocess']
+        assert summary['load'].calls == 2 and summary['load'].total >= 0.04
+        assert summary['invoke'].total >= summary['load'].total + summary['subprocess'].total
+        assert summary['invoke'].own < 0.02
+        assert tracer.spans[-2].name == 'subprocess' and tracer.spans[-2].attributes == {'returncode': 0}
+    
+    def test_spans_of_concurrent_tasks_keep_their_parents(self):
+        """Test that spans opened by asyncio tasks nest under the span of their own task."""
+        import asyncio
+        
+        async def task(name):
+            with span(name):
+                await asyncio.sleep(0.01)
+                with span('subprocess'):
+                    await asyncio.sleep(0.01)
+        
+        async def run():
+            await asyncio.gather(task('first'), task('second'))
+        
+        tracer = start_tracing()
+        asyncio.run(run())
+        stop_tracing()
+        by_id = {recorded.span_id: recorded for recorded in tracer.spans}
+        parents = sorted(by_id[recorded.parent_id].name for recorded in tracer.spans if recorded.name == 'subprocess')
+        assert parents == ['first', 'second']
+    
+    def test_chrome_and_otlp_export(self):
+        """Test that traces are written in the format named or implied by the file name."""
+        tracer = Tracer()
+        with tracer.span('invoke', subagent='helper'):
+            with pytest.raises(OSError):
+                with tracer.span('load'):
+                    raise OSError("gone")
+        
+        chrome = json.loads(tracer.write(self.temp_dir / "trace.json").read_text())
+        assert [event['name'] for event in chrome['traceEvents']] == ['invoke', 'load']
+        assert chrome['traceEvents'][0]['args'] == {'subagent': 'helper'}
+        assert chrome['traceEvents'][0]['ts'] == 0 and chrome['traceEvents'][1]['args'] == {'error': 'OSError'}
+        
+        otlp = json.loads(tracer.write(self.temp_dir / "trace.otlp.json").read_text())
+        resource_spans = otlp['resourceSpans'][0]
+        assert {'key': 'service.name', 'value': {'stringValue': 'copilot-subagents'}} in \
+            resource_spans['resource']['attributes']
+        root, load = resource_spans['scopeSpans'][0]['spans']
+        assert len(root['traceId']) == 32 and len(root['spanId']) == 16 and 'parentSpanId' not in root
+        assert load['parentSpanId'] == root['spanId'] and load['status']['code'] == 2
+        assert int(root['endTimeUnixNano']) >= int(load['endTimeUnixNano']) > int(root['startTimeUnixNano'])
+        
+        assert 'resourceSpans' in json.loads(tracer.write(self.temp_dir / "other.json", 'otlp').read_text())
+        with pytest.raises(ValueError, match="Unknown trace format"):
+            tracer.write(self.temp_dir / "trace.json", 'zipkin')
+
+class TestInvocation:
+    """Tests for the asynchronous invocation API."""
+    
+    def setup_method(self):
+        """Set up a subagent and a stand-in copilot binary."""
+        import os
+        self.temp_dir = Path(tempfile.mkdtemp())
+        self.subagents_dir = self.temp_dir / "subagents"
+        self.subagents_dir.mkdir()
+        (self.subagents_dir / "helper.md").write_text(
+            '---\nname: "helper"\nallowed_tools: ["write"]\n---\n\nYou help.\n')
+        bin_dir = self.temp_dir / "bin"
+        bin_dir.mkdir()
+        copilot = bin_dir / "copilot"
+        copilot.write_text(f"#!{sys.executable}\nimport sys\nprint('args', len(sys.argv))\n"
+                           f"print('oops', file=sys.stderr)\nsys.exit(3)\n")
+        copilot.chmod(0o755)
+        self.path = f"{bin_dir}{os.pathsep}{os.environ.get('PATH', '')}"
+    
+    def teardown_method(self):
+        """Clean up temporary directory."""
+        import shutil
+        shutil.rmtree(self.temp_dir)
+    
+    def _python(self, code):
+        return [sys.executable, "-c", code]
+    
+    def test_lines_are_streamed_before_exit(self):
+        """Test that output arrives while the process is still running."""
+        import asyncio
+        import time
+        code = "import sys, time\nprint('first', flush=True)\ntime.sleep(0.5)\nprint('second')"
+        
+        async def run():
+            arrivals = []
+            async with Invocation(self._python(code)) as invocation:
+                async for line in invocation:
+                    arrivals.append((line.text, time.monotonic()))
+                result = await invocation.wait()
+            return arrivals, result
+        
+        arrivals, result = asyncio.run(run())
+        assert [text for text, _ in arrivals] == ["first", "second"]
+        assert arrivals[1][1] - arrivals[0][1] > 0.3
+        assert result.success and result.stdout == "first\nsecond"
+        assert result.first_output < 0.5 <= result.duration
+    
+    def test_result_captures_both_streams(self):
+        """Test exit code and per-stream capture without iterating."""
+        import asyncio
+        code = "import sys\nprint('out')\nprint('err', file=sys.stderr)\nsys.exit(2)"
+        lines = []
+        
+        result = asyncio.run(run_command(self._python(code), on_output=lines.append))
+        assert result.returncode == 2 and not result.success
+        assert (result.stdout, result.stderr) == ("out", "err")
+        assert sorted(line.stream for line in lines) == ["stderr", "stdout"]
+    
+    def test_cancellation_terminates_process(self):
+        """Test that cancelling the waiting task stops the backend."""
+        import asyncio
+        
+        async def run():
+            invocation = Invocation(self._python("import time\ntime.sleep(30)"))
+            task = asyncio.ensure_future(invocation.wait())
+            await asyncio.sleep(0.2)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+            return invocation
+        
+        invocation = asyncio.run(run())
+        assert invocation.process.returncode is not None
+    
+    def test_missing_binary(self):
+        """Test that a missing backend raises FileNotFoundError."""
+        import asyncio
+        with pytest.raises(FileNotFoundError):
+            asyncio.run(run_command(["definitely-not-a-copilot-binary"]))
+    
+    def test_tail_is_bounded_and_log_is_complete(self):
+        """Test that only the tail stays in memory while the run log has everything."""
+        import asyncio
+        code = "for i in range(5000):\n    print('line', i)"
+        log = RunLog(self.temp_dir / "run.log")
+        
+        result = asyncio.run(Invocation(self._python(code), log=log, tail_lines=10).wait())
+        assert result.stdout.splitlines() == [f"line {i}" for i in range(4990, 5000)]
+        assert result.log_path == log.path and log.closed
+        assert len(log.path.read_text().splitlines()) == 5000
+    
+    def test_invoke_subagent(self, monkeypatch):
+        """Test running a subagent end to end with a stand-in backend."""
+        import asyncio
+        monkeypatch.setenv("PATH", self.path)
+        
+        result = asyncio.run(invoke_subagent(self.subagents_dir, "helper", "Do it"))
+        assert result.returncode == 3
+        assert result.command[:2] == ("copilot", "-p")
+        assert result.stdout.startswith("args") and result.stderr == "oops"
+        assert result.log_path.parent == self.subagents_dir / "state" / "logs"
+        assert "stderr: oops" in result.log_path.read_text()
+    
+    def test_invoke_subagent_with_configured_backend(self, monkeypatch):
+        """Test that COPILOT_SUBAGENTS_BACKEND_BIN replaces the copilot binary."""
+        import asyncio
+        import shlex
+        fake_backend = Path(__file__).parent.parent.parent / "src" / "copilot_subagents" / "src" / "fake_backend.py"
+        monkeypatch.setenv("COPILOT_SUBAGENTS_BACKEND_BIN",
+                           f"{shlex.quote(sys.executable)} {shlex.quote(str(fake_backend))} --lines 3")
+        
+        result = asyncio.run(invoke_subagent(self.subagents_dir, "helper", "Do it",
+                                             config=resolve_config(self.temp_dir)))
+        assert result.success
+        assert result.command[:5] == (sys.executable, str(fake_backend), "--lines", "3", "-p")
+        assert result.stdout.splitlines()[0].startswith("fake-copilot: ")
+        assert len(result.stdout.splitlines()) == 4
+        
+        monkeypatch.setenv("COPILOT_SUBAGENTS_BACKEND_BIN",
+                           f"{shlex.quote(sys.executable)} {shlex.quote(str(fake_backend))} --failure-rate 1")
+        result = asyncio.run(invoke_subagent(self.subagents_dir, "helper", "Do it",
+                                             config=resolve_config(self.temp_dir)))
+        assert result.returncode == 1 and "rate limit" in result.stderr
+    
+    def test_multi_word_tool_specs_stay_single_arguments(self, monkeypatch):
+        """Test that tool specs with spaces reach the backend as one argument each."""
+        import asyncio
+        monkeypatch.setenv("PATH", self.path)
+        (self.subagents_dir / "pusher.md").write_text(
+            '---\nname: "pusher"\nallowed_tools: ["shell(git push)", "write"]\n'
+            'deny_tools: ["shell(rm -rf)"]\n---\n\nYou push.\n')
+        
+        result = asyncio.run(invoke_subagent(self.subagents_dir, "pusher", "Do it", write_log=False,
+                                             use_cache=False))
+        argv = list(result.command)
+        assert argv[argv.index("shell(git push)") - 1] == "--allow-tool"
+        assert argv[argv.index("shell(rm -rf)") - 1] == "--deny-tool"
+        assert "push)" not in argv
+        assert result.stdout == f"args {len(argv)}"
+        
+        (self.subagents_dir / "pusher.md").write_text(
+            '---\nname: "pusher"\nallowed_tools: ["Read", "Bash(npm test)"]\n---\n\nYou test.\n')
+        agent = prepare_subagent(SubagentParser(self.subagents_dir), self.subagents_dir, "pusher",
+                                 ai_tool="claude-code")
+        argv = agent.command("Do it").argv
+        assert argv[argv.index("--allowedTools") + 1] == "Read,Bash(npm test)"
+    
+    def test_backend_command_run_applies_limits_and_cache(self):
+        """Test that a backend command runs with its own limits, and through a cache when given one."""
+        import asyncio
+        from invocation import BackendCommand
+        command = BackendCommand(self._python("import time\ntime.sleep(30)"), limits=ResourceLimits(timeout=0.5))
+        assert asyncio.run(command.run()).timed_out
+        
+        cache = ResultCache(self.temp_dir)
+        command = BackendCommand(self._python("print('done')"))
+        first = asyncio.run(command.run(cache=cache, cache_key="k"))
+        second = asyncio.run(command.run(cache=cache, cache_key="k"))
+        assert not first.cached and second.cached and second.stdout == "done"
+    
+    def test_invoke_subagent_verification_error(self):
+        """Test that invalid tools fail before anything is run."""
+        import asyncio
+        (self.subagents_dir / "bad.md").write_text('---\nname: "bad"\nallowed_tools: ["teleport"]\n---\n\nBad.\n')
+        
+        with pytest.raises(ToolVerificationError) as excinfo:
+            asyncio.run(invoke_subagent(self.subagents_dir, "bad", "Do it"))
+        assert excinfo.value.issues == ["Invalid allowed tool: teleport"]
+    
+    def test_ai_tool_selects_catalog(self, monkeypatch):
+        """Test that the selected AI tool's catalog verifies and runs the subagent."""
+        parser = SubagentParser(self.subagents_dir)
+        assert prepare_subagent(parser, self.subagents_dir, "helper").catalog.name == "copilot-cli"
+        
+        # write is a copilot tool, not a codex one, and the copilot verification is not reused
+        monkeypatch.setenv("COPILOT_SUBAGENTS_AI_TOOL", "codex")
+        parser = SubagentParser(self.subagents_dir, config=resolve_config(self.temp_dir))
+        with pytest.raises(ToolVerificationError) as excinfo:
+            prepare_subagent(parser, self.subagents_dir, "helper")
+        assert excinfo.value.issues == ["Invalid allowed tool: write"]
+        # codex has no allow flag, so even unverified the rule cannot be dropped silently
+        with pytest.raises(ToolVerificationError, match="cannot enforce allowed tools: write"):
+            prepare_subagent(parser, self.subagents_dir, "helper", verify_tools=False)
+        yolo_parser = SubagentParser(self.subagents_dir, config=parser.config.with_overrides(yolo_mode=True))
+        agent = prepare_subagent(yolo_parser, self.subagents_dir, "helper", verify_tools=False)
+        assert agent.catalog.name == "codex" and agent.backend == ("codex", "exec")
+        assert "--dangerously-bypass-approvals-and-sandbox" in agent.command("Do it").argv
+        
+        agent = prepare_subagent(parser, self.subagents_dir, "helper", verify_tools=False, ai_tool="claude-code")
+        assert agent.catalog.name == "claude-code" and agent.backend == ("claude",)
+        with pytest.raises(ValueError, match="Unsupported AI tool"):
+            prepare_subagent(parser, self.subagents_dir, "helper", ai_tool="teletype")
+    
+    def test_prompt_transport_selection(self):
+        """Test that prompts over the argv limit go through stdin or a prompt file."""
+        agent = prepare_subagent(SubagentParser(self.subagents_dir), self.subagents_dir, "helper")
+        prompt = "x" * 100
+        
+        command = agent.command("short")
+        assert command.transport == "argv" and command.prompt_file is None
+        assert command.argv[command.argv.index("-p") + 1] == build_full_prompt("You help.", "short")
+        
+        # copilot cannot read prompts from stdin, so it is pointed at a file
+        command = agent._replace(argv_limit=64).command(prompt)
+        assert command.transport == "file" and command.stdin_file is None
+        assert f"@{command.prompt_file}" in command.argv[command.argv.index("-p") + 1]
+        assert command.prompt_file.read_text() == build_full_prompt("You help.", prompt)
+        assert command.prompt_file.parent == self.subagents_dir / "state" / "prompts"
+        assert str(command.prompt_file) not in json.dumps(command.cache_parts())
+        command.cleanup()
+        assert not command.prompt_file.exists()
+        
+        command = agent._replace(argv_limit=64, catalog=load_tool_catalog("claude-code")).command(prompt)
+        assert command.transport == "stdin" and command.stdin_file == command.prompt_file
+        assert "-p" not in command.argv
+        command.cleanup()
+        
+        with pytest.raises(ValueError, match="cannot read prompts"):
+            # Without a catalog only argv is assumed to work
+            agent._replace(argv_limit=64, catalog=None).command(prompt)
+    
+    def test_prompt_flag_comes_from_catalog(self):
+        """Test that the prompt follows the catalog's prompt flag, or ends the argv without one."""
+        agent = prepare_subagent(SubagentParser(self.subagents_dir), self.subagents_dir, "helper")
+        full_prompt = build_full_prompt("You help.", "short")
+        
+        assert load_tool_catalog("copilot-cli").prompt_flag == "-p"
+        assert load_tool_catalog("codex").prompt_flag is None
+        
+        command = agent._replace(catalog=load_tool_catalog("codex"), backend=("codex", "exec")).command("short")
+        assert command.argv[:2] == ["codex", "exec"]
+        assert command.argv[-1] == full_prompt and "-p" not in command.argv
+        assert command.cache_parts()[-1] == command.prompt_digest
+    
+    def test_small_context_file_goes_through_argv(self):
+        """Test that an @file context that fits the argv limit is passed inline like any prompt."""
+        context_file = self.temp_dir / "context.txt"
+        context_file.write_text("Use tabs.\n")
+        agent = prepare_subagent(SubagentParser(self.subagents_dir), self.subagents_dir, "helper")
+        
+        command = agent.command("Do it", context_file=context_file)
+        assert command.transport == "argv" and command.prompt_file is None
+        assert command.argv[command.argv.index("-p") + 1] == build_full_prompt("You help.", "Do it", "Use tabs.\n")
+        
+        command = agent._replace(argv_limit=8, catalog=load_tool_catalog("claude-code")).command(
+            "Do it", context_file=context_file)
+        assert command.transport == "stdin"
+        command.cleanup()
+    
+    def test_context_file_is_streamed_to_stdin(self):
+        """Test that an @file context is copied into the prompt and piped to the backend."""
+        import asyncio
+        context_file = self.temp_dir / "context.txt"
+        context_file.write_text("line\n" * 50000)
+        assert split_context_argument(f"@{context_file}") == (None, context_file)
+        assert split_context_argument("@@handle") == ("@handle", None)
+        with pytest.raises(FileNotFoundError):
+            split_context_argument("@missing.txt")
+        
+        agent = prepare_subagent(SubagentParser(self.subagents_dir), self.subagents_dir, "helper")
+        agent = agent._replace(catalog=load_tool_catalog("claude-code"))
+        command = agent.command("Do it", context_file=context_file)
+        assert command.transport == "stdin"
+        
+        code = "import sys\ndata = sys.stdin.read()\nprint(data.count('line'), data.endswith('Task: Do it'))"
+        result = asyncio.run(run_command(self._python(code), stdin=command.stdin_file))
+        command.cleanup()
+        assert result.stdout == "50000 True"
+    
+    def test_timeout_terminates_process_group(self):
+        """Test that an expired timeout kills the backend and the processes it spawned."""
+        import asyncio
+        import os
+        import signal
+        import time
+        code = ("import subprocess, sys, time\n"
+                "child = subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(30)'])\n"
+                "print(child.pid, flush=True)\ntime.sleep(30)")
+        
+        result = asyncio.run(run_command(self._python(code), limits=ResourceLimits(timeout=0.5)))
+        assert result.timed_out and result.cancelled and not result.success
+        assert result.duration < 10
+        
+        # Killed, though possibly not yet reaped by whatever inherited it
+        stat = Path(f"/proc/{int(result.stdout)}/stat")
+        for _ in range(50):
+            try:
+                if stat.read_text().rsplit(')', 1)[1].split()[0] == 'Z':
+                    break
+            except FileNotFoundError:
+                break
+            time.sleep(0.1)
+        else:
+            os.kill(int(result.stdout), signal.SIGKILL)
+            pytest.fail("The backend's child outlived the timeout")
+    
+    def test_resource_limits_apply_to_backend(self):
+        """Test that memory and CPU limits are set in the backend process only."""
+        import asyncio
+        import resource
+        code = ("import resource\n"
+                "limit = getattr(resource, 'RLIMIT_DATA', resource.RLIMIT_AS)\n"
+                "print(resource.getrlimit(limit)[0], *resource.getrlimit(resource.RLIMIT_CPU))")
+        before = resource.getrlimit(resource.RLIMIT_CPU)
+        
+        limits = ResourceLimits(max_memory_mb=4096, max_cpu_seconds=60)
+        result = asyncio.run(run_command(self._python(code), limits=limits))
+        assert result.success and not result.timed_out
+        assert result.stdout == f"{4096 * 1024 * 1024} 60 65"
+        assert result.command == tuple(self._python(code))
+        assert resource.getrlimit(resource.RLIMIT_CPU) == before
+        
+        with pytest.raises(FileNotFoundError):
+            asyncio.run(run_command(["no-such-backend-binary"], limits=limits))
+
+class TestContextAssembly:
+    """Tests for assembling context files under a budget."""
+    
+    def setup_method(self):
+        """Create a directory of context files."""
+        self.temp_dir = Path(tempfile.mkdtemp())
+        self.src = self.temp_dir / "src"
+        (self.src / "pkg").mkdir(parents=True)
+        (self.src / "a.py").write_text("print('a')\n")
+        (self.src / "pkg" / "b.py").write_text("".join(f"line {i}\n" for i in range(200)))
+        (self.src / "pkg" / "copy.py").write_text("print('a')\n")
+        (self.src / "empty.py").write_text("")
+        (self.src / "image.py").write_bytes(b"\x89PNG\x00\x01")
+        self.out = self.temp_dir / "out"
+    
+    def teardown_method(self):
+        """Clean up temporary directory."""
+        import shutil
+        shutil.rmtree(self.temp_dir)
+    
+    def test_expand_paths_orders_and_deduplicates(self):
+        """Test that explicit files come first and glob matches are sorted and unique."""
+        paths = expand_context_paths([self.src / "pkg" / "b.py"], [f"{self.src}/**/*.py", str(self.src / "a.py")])
+        assert paths[0] == self.src / "pkg" / "b.py"
+        assert [path.name for path in paths[1:]] == ["a.py", "empty.py", "image.py", "copy.py"]
+    
+    def test_binary_empty_oversized_and_duplicates_are_skipped(self):
+        """Test that only readable, new text content is included."""
+        (self.src / "big.py").write_text("x" * 5000)
+        paths = expand_context_paths(patterns=[f"{self.src}/**/*.py"])
+        report = assemble_context(paths, self.out, max_bytes=100000, max_file_bytes=4096)
+        
+        statuses = {entry.path.name: (entry.status, entry.detail) for entry in report.entries}
+        assert statuses["a.py"][0] == statuses["b.py"][0] == INCLUDED
+        assert statuses["empty.py"] == (SKIPPED, "empty")
+        assert statuses["image.py"] == (SKIPPED, "binary")
+        assert statuses["big.py"][0] == SKIPPED and "larger than" in statuses["big.py"][1]
+        assert statuses["copy.py"][0] == SKIPPED and "duplicate of" in statuses["copy.py"][1]
+        
+        text = report.path.read_text()
+        assert text.startswith(f'<file path="{self.src / "a.py"}">\nprint(\'a\')\n</file>')
+        assert text.count("<file ") == 2 and report.total_bytes == len(text.encode())
+    
+    def test_budget_truncates_at_a_line_and_drops_the_rest(self):
+        """Test that the context stays within budget and is cut the same way every time."""
+        paths = [self.src / "a.py", self.src / "pkg" / "b.py", self.src / "pkg" / "copy.py"]
+        budget = get_context_budget(max_bytes=100000, max_tokens=200)
+        assert budget == 800
+        
+        first = assemble_context(paths, self.out, budget, preamble="Fix the bug")
+        second = assemble_context(paths, self.out, budget, preamble="Fix the bug")
+        text = first.path.read_text()
+        assert text == second.path.read_text()
+        assert first.total_bytes == len(text.encode()) <= budget
+        assert text.startswith("Fix the bug\n\n")
+        assert [entry.status for entry in first.entries] == [INCLUDED, TRUNCATED, DROPPED]
+        
+        block = text.split('b.py">\n', 1)[1]
+        kept, marker = block.split("[... truncated ", 1)
+        assert kept.endswith("\n") and kept.splitlines()[-1].startswith("line ")
+        assert marker.startswith(f"{first.entries[1].size - len(kept.encode())} bytes]")
+
+class TestRunLog:
+    """Tests for per-run log files."""
+    
+    def setup_method(self):
+        """Set up a temporary log directory."""
+        self.temp_dir = Path(tempfile.mkdtemp())
+    
+    def teardown_method(self):
+        """Clean up temporary directory."""
+        import shutil
+        shutil.rmtree(self.temp_dir)
+    
+    def test_rotation_bounds_disk_use(self):
+        """Test that a log rotates by size and keeps a fixed number of backups."""
+        path = self.temp_dir / "run.log"
+        with RunLog(path, max_bytes=1000, backups=2) as log:
+            for i in range(500):
+                log.write("stdout", f"line {i}", 0.0)
+        
+        files = sorted(path.parent.iterdir())
+        assert [file.name for file in files] == ["run.log", "run.log.1", "run.log.2"]
+        assert all(file.stat().st_size <= 1000 for file in files)
+        assert "line 499" in path.read_text()
+    
+    def test_prune_keeps_most_recent_runs(self):
+        """Test that pruning removes the oldest runs with their rotations."""
+        for name in ["20250101-000000-a", "20250102-000000-b", "20250103-000000-c"]:
+            (self.temp_dir / f"{name}.log").write_text("x")
+            (self.temp_dir / f"{name}.log.1").write_text("x")
+        
+        removed = prune_run_logs(self.temp_dir, keep=1)
+        assert len(removed) == 4
+        assert sorted(path.name for path in self.temp_dir.iterdir()) == [
+            "20250103-000000-c.log", "20250103-000000-c.log.1"]
+    
+    def test_new_run_log_uses_settings(self):
+        """Test log placement, naming of nested subagents and retention settings."""
+        import os
+        (self.temp_dir / ".env").write_text("COPILOT_SUBAGENTS_LOG_RETENTION=2\n")
+        config = resolve_config(self.temp_dir)
+        
+        paths = []
+        for _ in range(3):
+            with new_run_log(self.temp_dir, "team/reviewer", config) as log:
+                paths.append(log.path)
+        
+        assert paths[0].parent == self.temp_dir / "state" / "logs"
+        assert "team__reviewer" in paths[0].name
+        assert len(os.listdir(paths[0].parent)) == 2
+
+class TestBatch:
+    """Tests for mapping one subagent over a batch of tasks."""
+    
+    def setup_method(self):
+        """Set up a subagent and a stand-in copilot that echoes its task."""
+        import os
+        self.temp_dir = Path(tempfile.mkdtemp())
+        self.subagents_dir = self.temp_dir / "subagents"
+        self.subagents_dir.mkdir()
+        (self.subagents_dir / "helper.md").write_text(
+            '---\nname: "helper"\nallowed_tools: ["write"]\n---\n\nYou help.\n')
+        bin_dir = self.temp_dir / "bin"
+        bin_dir.mkdir()
+        copilot = bin_dir / "copilot"
+        # Sleeps less for later tasks, so completion order differs from input order
+        copilot.write_text(f"#!{sys.executable}\nimport sys, time\n"
+                           f"task = sys.argv[sys.argv.index('-p') + 1].rsplit('Task: ', 1)[1]\n"
+                           f"time.sleep(0.3 - 0.1 * int(task))\nprint('done', task)\n")
+        copilot.chmod(0o755)
+        self.path = f"{bin_dir}{os.pathsep}{os.environ.get('PATH', '')}"
+    
+    def teardown_method(self):
+        """Clean up temporary directory."""
+        import shutil
+        shutil.rmtree(self.temp_dir)
+    
+    def test_read_tasks(self):
+        """Test task numbering, context handling and invalid lines."""
+        input_file = self.temp_dir / "tasks.jsonl"
+        input_file.write_text('{"prompt": "a", "id": "x"}\n\nnot json\n{"context": "c"}\n'
+                              '{"prompt": "b", "context": {"file": "f.py"}}\n')
+        
+        tasks = list(read_tasks(input_file))
+        assert [task.index for task in tasks] == [0, 1, 2, 3]
+        assert tasks[0] == MapTask(0, "a", None, "x")
+        assert tasks[1].error.startswith("Invalid JSON") and tasks[2].error == "Missing 'prompt' field"
+        assert tasks[3].context == '{"file": "f.py"}'
+    
+    def test_completed_indices_tolerate_cut_records(self):
+        """Test that a partially written last line is ignored and terminated on append."""
+        output_file = self.temp_dir / "out.jsonl"
+        output_file.write_text('{"index": 0, "success": true}\n{"index": 2, "succ')
+        assert completed_indices(output_file) == {0}
+        
+        with ResultWriter(output_file) as writer:
+            writer.write({"index": 1, "success": True})
+        assert completed_indices(output_file) == {0, 1}
+    
+    def test_run_map_streams_in_completion_order(self, monkeypatch):
+        """Test concurrent execution, completion-order results and skipped indices."""
+        import asyncio
+        monkeypatch.setenv("PATH", self.path)
+        agent = prepare_subagent(SubagentParser(self.subagents_dir), self.subagents_dir, "helper")
+        tasks = [MapTask(index, str(index)) for index in range(3)] + [MapTask(3, '', error="bad")]
+        records = []
+        
+        counts = asyncio.run(run_map(agent, tasks, self.subagents_dir, records.append,
+                                     concurrency=3, skip={1}))
+        assert counts == {'succeeded': 2, 'failed': 1, 'skipped': 1}
+        assert [record['index'] for record in records] == [3, 2, 0]
+        assert records[1]['output'] == "done 2" and records[1]['log'].endswith(".log")
+        assert records[0] == {'index': 3, 'success': False, 'error': "bad"}
+
+class TestJobQueue:
+    """Tests for the durable job queue and its workers."""
+    
+    def setup_method(self):
+        """Set up a queue, a subagent and a stand-in copilot that fails on request."""
+        import os
+        self.temp_dir = Path(tempfile.mkdtemp())
+        self.subagents_dir = self.temp_dir / "subagents"
+        self.subagents_dir.mkdir()
+        (self.subagents_dir / "helper.md").write_text(
+            '---\nname: "helper"\nallowed_tools: ["write"]\n---\n\nYou help.\n')
+        bin_dir = self.temp_dir / "bin"
+        bin_dir.mkdir()
+        copilot = bin_dir / "copilot"
+        copilot.write_text(f"#!{sys.executable}\nimport sys, time\n"
+                           f"task = sys.argv[sys.argv.index('-p') + 1].rsplit('Task: ', 1)[1]\n"
+                           f"if task == 'hang':\n    time.sleep(30)\n"
+                           f"if task == 'fail':\n    print('Permission denied', file=sys.stderr)\n    sys.exit(1)\n"
+                           f"print('done', task)\n")
+        copilot.chmod(0o755)
+        self.path = f"{bin_dir}{os.pathsep}{os.environ.get('PATH', '')}"
+        self.now = 1000.0
+        self.queue = JobQueue(self.temp_dir / "jobs.sqlite", clock=lambda: self.now)
+    
+    def teardown_method(self):
+        """Clean up temporary directory."""
+        import shutil
+        shutil.rmtree(self.temp_dir)
+    
+    def test_claims_by_priority_then_submission_order(self):
+        """Test that each job is claimed once, highest priority first."""
+        low = self.queue.enqueue("helper", "low")
+        high = self.queue.enqueue("helper", "high", priority=5)
+        later = self.queue.enqueue("helper", "later", priority=5)
+        
+        claimed = [self.queue.claim("w1").id, self.queue.claim("w2").id, self.queue.claim("w1").id]
+        assert claimed == [high, later, low]
+        assert self.queue.claim("w2") is None
+        assert self.queue.get(high).status == RUNNING and self.queue.get(high).worker == "w1"
+        assert self.queue.counts()[RUNNING] == 3
+    
+    def test_expired_lease_is_redelivered_until_attempts_run_out(self):
+        """Test crash recovery: a job whose worker stops heartbeating goes to another worker."""
+        job_id = self.queue.enqueue("helper", "task", max_attempts=2)
+        assert self.queue.claim("crashed", lease_seconds=10).attempts == 1
+        self.now += 5
+        assert self.queue.heartbeat(job_id, "crashed", lease_seconds=10)
+        self.now += 11
+        
+        job = self.queue.claim("other", lease_seconds=10)
+        assert (job.id, job.worker, job.attempts) == (job_id, "other", 2)
+        # The old worker can no longer renew or finish the job
+        assert not self.queue.heartbeat(job_id, "crashed")
+        assert not self.queue.finish(job_id, "crashed", SUCCEEDED)
+        
+        self.now += 11
+        assert self.queue.claim("third") is None
+        assert self.queue.get(job_id).status == FAILED
+        assert "Lease expired after 2 attempt(s)" in self.queue.get(job_id).error
+    
+    def test_cancel(self):
+        """Test that queued jobs are cancelled at once and running ones at their next heartbeat."""
+        queued = self.queue.enqueue("helper", "queued")
+        running = self.queue.enqueue("helper", "running")
+        
+        assert self.queue.cancel(queued) == QUEUED
+        assert self.queue.get(queued).status == CANCELLED
+        assert self.queue.claim("w1").id == running
+        assert self.queue.cancel(running) == RUNNING
+        assert not self.queue.heartbeat(running, "w1")
+        assert self.queue.cancel(12345) is None
+    
+    def test_worker_runs_jobs_through_invoke(self, monkeypatch):
+        """Test a worker draining jobs, failing permanent errors and stopping cancelled jobs."""
+        import asyncio
+        import threading
+        monkeypatch.setenv("PATH", self.path)
+        queue = JobQueue(self.temp_dir / "jobs.sqlite")
+        ok = queue.enqueue("helper", "ok")
+        fail = queue.enqueue("helper", "fail")
+        missing = queue.enqueue("nobody", "ok")
+        hang = queue.enqueue("helper", "hang")
+        events = []
+        
+        def on_event(event, job):
+            events.append((event, job.id))
+            if (event, job.id) == ('started', hang):
+                threading.Timer(0.3, queue.cancel, (hang,)).start()
+        
+        worker = JobWorker(queue, self.subagents_dir, concurrency=2, lease_seconds=1.5, poll_interval=0.1,
+                           retry=RetryPolicy(), on_event=on_event)
+        counts = asyncio.run(worker.run(drain=True))
+        
+        assert counts == {SUCCEEDED: 1, FAILED: 2, CANCELLED: 1}
+        assert queue.get(ok).status == SUCCEEDED and "done ok" in Path(queue.get(ok).log).read_text()
+        assert queue.get(fail).attempts == 1 and "Permission denied" in queue.get(fail).error
+        assert "not found" in queue.get(missing).error.lower()
+        assert queue.get(hang).status == CANCELLED
+        assert events.index(('started', ok)) < events.index((SUCCEEDED, ok))
+
+class TestResultCache:
+    """Tests for the invocation result cache."""
+    
+    def setup_method(self):
+        """Set up a temporary cache and a counter of backend runs."""
+        self.temp_dir = Path(tempfile.mkdtemp())
+        self.cache = ResultCache(self.temp_dir, max_bytes=1 << 20)
+        self.counter = self.temp_dir / "runs.txt"
+        self.agent = {"name": "helper", "prompt": "You help."}
+    
+    def teardown_method(self):
+        """Clean up temporary directory."""
+        import shutil
+        shutil.rmtree(self.temp_dir)
+    
+    def _command(self, text, exit_code=0):
+        code = (f"import sys, time\nopen({str(self.counter)!r}, 'a').write('x')\ntime.sleep(0.2)\n"
+                f"print({text!r})\nsys.exit({exit_code})")
+        return [sys.executable, "-c", code]
+    
+    def _runs(self):
+        return len(self.counter.read_text()) if self.counter.exists() else 0
+    
+    def test_key_covers_agent_command_and_input_files(self):
+        """Test that any input that can change the output changes the key."""
+        source = self.temp_dir / "source.py"
+        source.write_text("a = 1\n")
+        key = result_cache_key(self.agent, ["copilot", "-p", "x"], [source])
+        
+        assert key == result_cache_key(self.agent, ["copilot", "-p", "x"], [source])
+        assert key != result_cache_key({**self.agent, "prompt": "Other."}, ["copilot", "-p", "x"], [source])
+        assert key != result_cache_key(self.agent, ["copilot", "-p", "y"], [source])
+        source.write_text("a = 2\n")
+        assert key != result_cache_key(self.agent, ["copilot", "-p", "x"], [source])
+    
+    def test_hit_replays_output(self):
+        """Test that a second run replays the stored output without running the backend."""
+        import asyncio
+        lines = []
+        
+        first = asyncio.run(self.cache.run("k", self._command("answer")))
+        log = RunLog(self.temp_dir / "second.log")
+        second = asyncio.run(self.cache.run("k", self._command("answer"), on_output=lines.append, log=log))
+        
+        assert self._runs() == 1
+        assert not first.cached and second.cached
+        assert [line.text for line in lines] == ["answer"]
+        assert second.log_path == log.path and "stdout: answer" in log.path.read_text()
+    
+    def test_failures_are_not_cached(self):
+        """Test that failed invocations run again."""
+        import asyncio
+        for _ in range(2):
+            asyncio.run(self.cache.run("k", self._command("broken", exit_code=1)))
+        assert self._runs() == 2
+    
+    def test_failed_put_leaves_no_temporary_files(self, monkeypatch):
+        """Test that a store that fails after creating its temporary files cleans them up."""
+        import time
+        from invocation import InvocationResult
+        result = InvocationResult(("cmd",), 0, time.time(), 0.1, stdout="out")
+        
+        def fail(*args, **kwargs):
+            raise TypeError("not serializable")
+        
+        monkeypatch.setattr("resultcache.json.dump", fail)
+        self.cache.put("k", result)
+        monkeypatch.undo()
+        monkeypatch.setattr("resultcache.os.replace", fail)
+        self.cache.put("k", result)
+        
+        assert self.cache.get("k") is None
+        assert list(self.cache.cache_dir.glob("*.tmp")) == []
+    
+    def test_concurrent_identical_invocations_are_coalesced(self):
+        """Test that only one backend runs for identical concurrent invocations."""
+        import asyncio
+        
+        async def run():
+            return await asyncio.gather(*(self.cache.run("k", self._command("shared")) for _ in range(4)))
+        
+        results = asyncio.run(run())
+        assert self._runs() == 1
+        assert sum(result.cached for result in results) == 3
+        assert {result.stdout for result in results} == {"shared"}
+    
+    def test_lru_eviction(self):
+        """Test that the least recently used entries are evicted first."""
+        import os
+        import time
+        from invocation import InvocationResult
+        
+        for index, key in enumerate(["a", "b", "c"]):
+            result = InvocationResult(("cmd",), 0, time.time(), 0.1, stdout="x" * 400)
+            self.cache.put(key, result)
+            os.utime(self.cache.cache_dir / f"{key}.json", (index, index))
+        assert self.cache.get("a") is not None
+        
+        self.cache.max_bytes = 2000
+        assert self.cache.evict() == ["b"]
+        assert self.cache.get("b") is None and self.cache.get("c") is not None